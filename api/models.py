@@ -4,9 +4,11 @@ SQLAlchemy ORM models — mirrors the Star Schema from sql/ddl_schema.sql.
 Tables:
   - dim_operadoras: Dimension table with operator info (reg_ans PK, cnpj, razao_social, uf, modalidade)
   - fact_despesas_eventos: Fact table with quarterly expenses (id PK, data_trimestre, reg_ans FK, conta_contabil, descricao, vl_saldo_final)
+  - agg_despesas_operadora: Leaf-account totals per quarter and operator (built at load time)
+  - agg_despesas_uf: Leaf-account totals per quarter, UF and modalidade (built at load time)
 """
 
-from sqlalchemy import String, Numeric, Date, Integer, ForeignKey
+from sqlalchemy import String, Numeric, Date, Integer, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .database import Base
@@ -14,6 +16,7 @@ from .database import Base
 
 class Operadora(Base):
     __tablename__ = "dim_operadoras"
+    __table_args__ = (Index("idx_operadoras_cnpj", "cnpj"),)
 
     reg_ans: Mapped[str] = mapped_column(String(20), primary_key=True)
     cnpj: Mapped[str | None] = mapped_column(String(14))
@@ -26,6 +29,10 @@ class Operadora(Base):
 
 class Despesa(Base):
     __tablename__ = "fact_despesas_eventos"
+    __table_args__ = (
+        Index("idx_despesas_data", "data_trimestre"),
+        Index("idx_despesas_reg", "reg_ans"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     data_trimestre: Mapped[str] = mapped_column(Date, nullable=False)
@@ -36,3 +43,30 @@ class Despesa(Base):
     vl_saldo_final: Mapped[float | None] = mapped_column(Numeric(18, 2))
 
     operadora: Mapped["Operadora"] = relationship(back_populates="despesas")
+
+
+class ResumoOperadora(Base):
+    """Per-quarter, per-operator total of the leaf accounts (CHAR_LENGTH(conta_contabil) = 9)."""
+
+    __tablename__ = "agg_despesas_operadora"
+    __table_args__ = (Index("idx_agg_operadora_total", "data_trimestre", "total_despesas"),)
+
+    data_trimestre: Mapped[str] = mapped_column(Date, primary_key=True)
+    reg_ans: Mapped[str] = mapped_column(
+        String(20), ForeignKey("dim_operadoras.reg_ans", ondelete="CASCADE"), primary_key=True
+    )
+    total_despesas: Mapped[float] = mapped_column(Numeric(18, 2), nullable=False)
+
+
+class ResumoUF(Base):
+    """Per-quarter total of the leaf accounts by the operators' UF and modalidade."""
+
+    __tablename__ = "agg_despesas_uf"
+    __table_args__ = (Index("idx_agg_uf_data", "data_trimestre", "uf", "modalidade"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    data_trimestre: Mapped[str] = mapped_column(Date, nullable=False)
+    uf: Mapped[str | None] = mapped_column(String(2))
+    modalidade: Mapped[str | None] = mapped_column(String(100))
+    total_despesas: Mapped[float] = mapped_column(Numeric(18, 2), nullable=False)
+    num_operadoras: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -1,11 +1,12 @@
 import math
+from datetime import date
 
 from fastapi import FastAPI, Depends, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 
 from .database import get_db
-from .models import Operadora, Despesa
+from .models import Operadora, Despesa, ResumoOperadora, ResumoUF
 from .schemas import (
     OperatorResponse, ExpenseResponse,
     PaginatedOperators, PaginationMeta,
@@ -100,46 +101,51 @@ def get_operator_expenses(cnpj: str, db: Session = Depends(get_db)):
 
 
 @app.get("/api/estatisticas", response_model=StatisticsResponse)
-def get_statistics(db: Session = Depends(get_db)):
-    """Returns aggregated statistics: total, average, top 5 operators, expenses by UF."""
-    from sqlalchemy import func
+def get_statistics(
+    trimestre: date = Query(None, description="Quarter (first day, e.g. 2024-07-01); default: the latest"),
+    uf: str = Query(None, description="Only operators of this UF"),
+    modalidade: str = Query(None, description="Only operators of this modalidade"),
+    db: Session = Depends(get_db),
+):
+    """
+    Returns aggregated statistics: total, average, top 5 operators, expenses by UF.
 
-    # Only use the latest quarter (YTD — same logic as queries_analytics.sql)
-    latest_quarter = db.query(func.max(Despesa.data_trimestre)).scalar()
+    Reads the summary tables built at load time (see DatabaseLoader.refresh_summaries)
+    instead of the fact table: leaf accounts (9 chars) only, one quarter at a time.
+    """
+    from sqlalchemy import func
 
-    # Base filter: leaf-level accounts (9 chars) + latest quarter
-    base_filter = (
-        (func.char_length(Despesa.conta_contabil) == 9)
-        & (Despesa.data_trimestre == latest_quarter)
+    # Latest quarter by default (YTD — same logic as queries_analytics.sql)
+    quarter = trimestre or db.query(func.max(ResumoUF.data_trimestre)).scalar()
+
+    uf_filter = ResumoUF.data_trimestre == quarter
+    operator_filter = ResumoOperadora.data_trimestre == quarter
+    if uf:
+        uf_filter &= ResumoUF.uf == uf.upper()
+        operator_filter &= Operadora.uf == uf.upper()
+    if modalidade:
+        uf_filter &= ResumoUF.modalidade == modalidade
+        operator_filter &= Operadora.modalidade == modalidade
+
+    # Total expenses and operator count (for the average): one row per UF/modalidade
+    total_expenses, num_operators = (
+        db.query(func.sum(ResumoUF.total_despesas), func.sum(ResumoUF.num_operadoras))
+        .filter(uf_filter)
+        .one()
     )
-
-    # Total expenses
-    total_expenses = (
-        db.query(func.sum(Despesa.vl_saldo_final))
-        .filter(base_filter)
-        .scalar()
-    ) or 0
-
-    # Count distinct operators for average calculation
-    num_operators = (
-        db.query(func.count(func.distinct(Despesa.reg_ans)))
-        .filter(base_filter)
-        .scalar()
-    ) or 1
-
-    average_expenses = total_expenses / num_operators
+    total_expenses = total_expenses or 0
+    average_expenses = total_expenses / (num_operators or 1)
 
     # Top 5 operators by total expenses
     top_5_rows = (
         db.query(
-            Despesa.reg_ans,
+            ResumoOperadora.reg_ans,
             Operadora.razao_social,
-            func.sum(Despesa.vl_saldo_final).label("total_expenses"),
+            ResumoOperadora.total_despesas.label("total_expenses"),
         )
-        .join(Operadora, Despesa.reg_ans == Operadora.reg_ans)
-        .filter(base_filter)
-        .group_by(Despesa.reg_ans, Operadora.razao_social)
-        .order_by(func.sum(Despesa.vl_saldo_final).desc())
+        .join(Operadora, ResumoOperadora.reg_ans == Operadora.reg_ans)
+        .filter(operator_filter)
+        .order_by(ResumoOperadora.total_despesas.desc())
         .limit(5)
         .all()
     )
@@ -152,13 +158,12 @@ def get_statistics(db: Session = Depends(get_db)):
     # Distribution by UF
     uf_rows = (
         db.query(
-            Operadora.uf,
-            func.sum(Despesa.vl_saldo_final).label("total_expenses"),
+            ResumoUF.uf,
+            func.sum(ResumoUF.total_despesas).label("total_expenses"),
         )
-        .join(Operadora, Despesa.reg_ans == Operadora.reg_ans)
-        .filter(base_filter)
-        .group_by(Operadora.uf)
-        .order_by(func.sum(Despesa.vl_saldo_final).desc())
+        .filter(uf_filter)
+        .group_by(ResumoUF.uf)
+        .order_by(func.sum(ResumoUF.total_despesas).desc())
         .all()
     )
 
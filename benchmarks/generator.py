@@ -0,0 +1,184 @@
+import csv
+import hashlib
+import json
+import logging
+import os
+import zipfile
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple
+from src.utils.validators import CNPJ_WEIGHTS_1, CNPJ_WEIGHTS_2
+from src import config
+
+logger = logging.getLogger(__name__)
+
+MODALIDADES = ['Medicina de Grupo', 'Cooperativa Médica', 'Odontologia de Grupo', 'Seguradora Especializada em Saúde',
+               'Autogestão', 'Cooperativa Odontológica', 'Filantropia', 'Administradora de Benefícios']
+UFS = ['SP', 'RJ', 'MG', 'RS', 'PR', 'SC', 'BA', 'PE', 'CE', 'GO', 'DF', 'ES', 'PA', 'MT', 'MS', 'AM', 'RN', 'PB',
+       'AL', 'SE', 'PI', 'MA', 'TO', 'RO', 'AC', 'AP', 'RR']
+OTHER_DESCRIPTIONS = ['Contraprestações Efetivas de Operações de Planos de Assistência à Saúde',
+                      'Despesas Administrativas', 'Despesas de Comercialização', 'Receitas Financeiras',
+                      'Provisões Técnicas de Operações de Assistência à Saúde', 'Tributos Diretos',
+                      'Outras Despesas Operacionais', 'Créditos de Operações com Planos']
+CADASTRE_COLUMNS = ['REGISTRO_OPERADORA', 'CNPJ', 'Razao_Social', 'Nome_Fantasia', 'Modalidade', 'Logradouro',
+                    'Numero', 'Complemento', 'Bairro', 'Cidade', 'UF', 'CEP', 'DDD', 'Telefone', 'Fax',
+                    'Endereco_eletronico', 'Representante', 'Cargo_Representante', 'Regiao_de_Comercializacao',
+                    'Data_Registro_ANS']
+
+def cnpj_check_digits(bodies: np.ndarray) -> np.ndarray:
+    """Appends the two check digits to 12-digit CNPJ bodies (digit matrix of shape (n, 12))."""
+    first = (bodies @ np.array(CNPJ_WEIGHTS_1)) % 11
+    first = np.where(first < 2, 0, 11 - first)
+    with_first = np.column_stack([bodies, first])
+    second = (with_first @ np.array(CNPJ_WEIGHTS_2)) % 11
+    second = np.where(second < 2, 0, 11 - second)
+    return np.column_stack([with_first, second])
+
+def format_br_decimal(values: np.ndarray) -> pd.Series:
+    """Floats as the ANS files write them: '1234567,89'."""
+    return pd.Series(values).map('{:.2f}'.format).str.replace('.', ',', regex=False)
+
+class SyntheticAnsData:
+    """
+    Seeded generator of ANS-shaped inputs: one ZIP per quarter ("1T2024.zip" with a quoted,
+    ';'-separated CSV inside) and a Relatorio_Cadop.csv with the cadastre layout.
+
+    The same seed always gives the same files. Besides the target expense rows the quarters
+    carry the noise the pipeline has to handle: other accounts, zero balances, reversals
+    (negative values), exact duplicate rows, operators missing from the cadastre, invalid
+    CNPJs and repeated cadastre registrations.
+
+    Args:
+        operators: Operators in the market (ANS has ~1,100 active ones).
+        accounts: Distinct accounting accounts (CD_CONTA_CONTABIL).
+        quarters: Number of quarters, ending at `last_quarter`.
+        rows_per_quarter: Rows of each quarter CSV (before the injected duplicates).
+        target_share: Share of rows whose DESCRICAO is the target expense.
+    """
+
+    def __init__(self, seed: int = 42, operators: int = 1100, accounts: int = 700, quarters: int = 3,
+                 rows_per_quarter: int = 10_000, last_quarter: Tuple[int, int] = (2024, 4),
+                 target_share: float = 0.25, zero_share: float = 0.03, negative_share: float = 0.01,
+                 duplicate_share: float = 0.01, missing_cadastre_share: float = 0.02,
+                 invalid_cnpj_share: float = 0.02, duplicate_cadastre_share: float = 0.005):
+        self.seed = seed
+        self.operators = operators
+        self.accounts = accounts
+        self.quarters = quarters
+        self.rows_per_quarter = rows_per_quarter
+        self.last_quarter = last_quarter
+        self.target_share = target_share
+        self.zero_share = zero_share
+        self.negative_share = negative_share
+        self.duplicate_share = duplicate_share
+        self.missing_cadastre_share = missing_cadastre_share
+        self.invalid_cnpj_share = invalid_cnpj_share
+        self.duplicate_cadastre_share = duplicate_cadastre_share
+
+        rng = np.random.default_rng(seed)
+        self.reg_ans = np.sort(rng.choice(np.arange(300_000, 430_000), size=operators, replace=False)).astype(str)
+        # Few large operators report most of the rows (Zipf-like weights)
+        weights = 1.0 / np.arange(1, operators + 1) ** 0.8
+        self.operator_weights = rng.permutation(weights / weights.sum())
+        self.account_codes = np.sort(rng.choice(np.arange(311_111_111, 499_999_999), size=accounts, replace=False)).astype(str)
+
+    def quarter_list(self) -> List[Tuple[int, int]]:
+        year, quarter = self.last_quarter
+        index = year * 4 + quarter - 1
+        return [(i // 4, i % 4 + 1) for i in range(index - self.quarters + 1, index + 1)]
+
+    def quarter_frame(self, year: int, quarter: int) -> pd.DataFrame:
+        """Rows of one quarter CSV, as text (the layout of the ANS files)."""
+        rng = np.random.default_rng([self.seed, year, quarter])
+        n = self.rows_per_quarter
+
+        operators = rng.choice(self.reg_ans, size=n, p=self.operator_weights)
+        accounts = rng.choice(self.account_codes, size=n)
+        target = rng.random(n) < self.target_share
+        descriptions = np.where(target, config.TARGET_EXPENSE_DESCRIPTION,
+                                rng.choice(OTHER_DESCRIPTIONS, size=n))
+
+        initial = np.round(rng.lognormal(mean=11, sigma=2.2, size=n), 2)
+        final = np.round(initial * rng.uniform(0.8, 1.6, size=n), 2)
+        final[rng.random(n) < self.negative_share] *= -1
+        final[rng.random(n) < self.zero_share] = 0.0
+
+        df = pd.DataFrame({
+            'DATA': f"{year}-{(quarter - 1) * 3 + 1:02d}-01",
+            'REG_ANS': operators,
+            'CD_CONTA_CONTABIL': accounts,
+            'DESCRICAO': descriptions,
+            'VL_SALDO_INICIAL': format_br_decimal(initial),
+            'VL_SALDO_FINAL': format_br_decimal(final),
+        })
+
+        # Re-sent lines: exact copies of some rows, scattered over the file
+        duplicates = df.sample(frac=self.duplicate_share, random_state=int(rng.integers(2 ** 31)))
+        positions = rng.permutation(len(df) + len(duplicates))
+        return pd.concat([df, duplicates], ignore_index=True).iloc[positions].reset_index(drop=True)
+
+    def cadastre_frame(self) -> pd.DataFrame:
+        rng = np.random.default_rng([self.seed, 0])
+        registered = self.reg_ans[rng.random(self.operators) >= self.missing_cadastre_share]
+        n = len(registered)
+
+        digits = cnpj_check_digits(rng.integers(0, 10, size=(n, 12)))
+        invalid = rng.random(n) < self.invalid_cnpj_share
+        digits[invalid, -1] = (digits[invalid, -1] + 1) % 10
+        cnpjs = pd.Series([''.join(row) for row in digits.astype(str)])
+
+        df = pd.DataFrame({column: '' for column in CADASTRE_COLUMNS}, index=range(n))
+        df['REGISTRO_OPERADORA'] = registered
+        df['CNPJ'] = cnpjs
+        df['Razao_Social'] = [f"OPERADORA DE SAÚDE {reg} LTDA" for reg in registered]
+        df['Nome_Fantasia'] = [f"SAÚDE {reg}" for reg in registered]
+        df['Modalidade'] = rng.choice(MODALIDADES, size=n)
+        df['UF'] = rng.choice(UFS, size=n, p=self._uf_weights())
+        df['Cidade'] = 'Cidade ' + df['UF']
+        df['Data_Registro_ANS'] = '2000-01-01'
+
+        # Re-registrations: the same REGISTRO_OPERADORA appears again with other data
+        repeated = df.sample(frac=self.duplicate_cadastre_share, random_state=int(rng.integers(2 ** 31))).copy()
+        repeated['Razao_Social'] = repeated['Razao_Social'] + ' (ANTIGA)'
+        return pd.concat([df, repeated], ignore_index=True)
+
+    def _uf_weights(self) -> np.ndarray:
+        weights = 1.0 / np.arange(1, len(UFS) + 1)
+        return weights / weights.sum()
+
+    def write(self, target_dir: str) -> Dict:
+        """
+        Writes the quarter ZIPs and the cadastre into `target_dir`.
+        Returns {'zips': [paths, oldest first], 'cadastre': path, 'rows': total quarter rows}.
+        """
+        os.makedirs(target_dir, exist_ok=True)
+        zips, rows = [], 0
+        for year, quarter in self.quarter_list():
+            name = f"{quarter}T{year}"
+            df = self.quarter_frame(year, quarter)
+            rows += len(df)
+            text = df.to_csv(sep=config.CSV_SEP, index=False, quoting=csv.QUOTE_ALL)
+            path = os.path.join(target_dir, f"{name}.zip")
+            with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as z:
+                z.writestr(f"{name}.csv", text.encode(config.CSV_ENCODING))
+            zips.append(path)
+
+        cadastre = os.path.join(target_dir, "Relatorio_Cadop.csv")
+        self.cadastre_frame().to_csv(cadastre, sep=config.CSV_SEP, index=False, quoting=csv.QUOTE_ALL,
+                                     encoding='utf-8')
+        logger.info(f"Synthetic data: {len(zips)} quarters, {rows} rows -> {target_dir}")
+        return {'zips': zips, 'cadastre': cadastre, 'rows': rows}
+
+def data_version(scale: int = 1, seed: int = 42, **options) -> str:
+    """Short hash of the generator code and of the arguments of generate (names the cached data sets)."""
+    digest = hashlib.sha256()
+    with open(__file__, 'rb') as f:
+        digest.update(f.read())
+    digest.update(json.dumps({'scale': scale, 'seed': seed, **options}, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()[:12]
+
+def generate(target_dir: str, scale: int = 1, seed: int = 42, **options) -> Dict:
+    """Data set of `scale` times the base size (rows per quarter grow, the market stays the same)."""
+    options.setdefault('rows_per_quarter', 10_000)
+    options['rows_per_quarter'] *= scale
+    return SyntheticAnsData(seed=seed, **options).write(target_dir)
@@ -0,0 +1,174 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.generator import data_version, generate
+from src.services.cadastre import CadastreDimension
+from src.services.data_aggregator import DataAggregator
+from src.services.data_consolidator import DataConsolidator
+from src.services.data_enricher import DataEnricher
+from src.services.data_validator import DataValidator
+from src.services.ingestion import IngestionService
+from src.services.zip_processor import ZipProcessor
+from src.utils.telemetry import RunTelemetry
+from src import config
+
+logger = logging.getLogger(__name__)
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINES_FILE = os.path.join(BENCH_DIR, "baselines.json")
+RESULTS_FILE = os.path.join(config.OUTPUT_DIR, "benchmark_results.json")
+DATA_DIR = os.path.join(config.CACHE_DIR, "benchmarks")
+
+DEFAULT_SCALES = [1, 10, 100]
+# A service regresses when it is this much slower than its baseline...
+REGRESSION_THRESHOLD = 0.25
+# ...and at least this many seconds slower (timer noise on the small scales)
+MIN_REGRESSION_SECONDS = 0.05
+
+def measure(name: str, fn: Callable[[], object], repeat: int) -> Dict:
+    """Best of `repeat` runs of fn, as recorded by the telemetry hook of the service."""
+    best = None
+    for _ in range(repeat):
+        with RunTelemetry() as run:
+            fn()
+        stage = run.stages[name]
+        if best is None or stage['wall_s'] < best['wall_s']:
+            best = stage
+    return {
+        'wall_s': round(best['wall_s'], 4),
+        'cpu_s': round(best['cpu_s'], 4),
+        'peak_rss_bytes': best['peak_rss_bytes'],
+        'rows_in': best['rows_in'],
+        'rows_out': best['rows_out'],
+        'frame_bytes_out': best['frame_bytes_out'],
+    }
+
+def bench_scale(scale: int, seed: int, repeat: int, data_dir: str = DATA_DIR) -> Dict[str, Dict]:
+    """Times every service on the synthetic data of one scale, each one on the output of the previous."""
+    # The version changes with the generator code/options: stale data sets are never reused
+    target = os.path.join(data_dir, f"seed{seed}-{scale}x-{data_version(scale=scale, seed=seed)}")
+    manifest = os.path.join(target, "manifest.json")
+    if os.path.exists(manifest):
+        with open(manifest, 'r', encoding='utf-8') as f:
+            files = json.load(f)
+    else:
+        files = generate(target, scale=scale, seed=seed)
+        with open(manifest, 'w', encoding='utf-8') as f:
+            json.dump(files, f, indent=2)
+
+    results = {}
+    processor = ZipProcessor()
+    results['ZipProcessor'] = measure(
+        'ZipProcessor.process_zip', lambda: [processor.process_zip(path) for path in files['zips']], repeat)
+
+    ingestion = IngestionService(cache=None, workers=1)
+    raw = ingestion.ingest_from_files(files['zips'])
+    results['IngestionService'] = measure('IngestionService.ingest_each',
+                                          lambda: ingestion.ingest_each(files['zips']), repeat)
+
+    # consolidate_frame rewrites columns of its input: every run gets its own copy
+    consolidator = DataConsolidator()
+    results['DataConsolidator'] = measure('DataConsolidator.consolidate_frame',
+                                          lambda: consolidator.consolidate_frame(raw.copy()), repeat)
+    consolidated = consolidator.consolidate_frame(raw.copy())
+
+    enricher = DataEnricher(dimension=CadastreDimension(os.path.join(target, "cadastre_cache")))
+    dimension = enricher.load_cadastre(files['cadastre'])
+    results['DataEnricher'] = measure('DataEnricher.enrich_frame',
+                                      lambda: enricher.enrich_frame(consolidated.copy(), dimension), repeat)
+    enriched = enricher.enrich_frame(consolidated.copy(), dimension)
+
+    validator = DataValidator()
+    results['DataValidator'] = measure('DataValidator.validate_frame',
+                                       lambda: validator.validate_frame(enriched.copy()), repeat)
+    clean, _ = validator.validate_frame(enriched.copy())
+
+    aggregator = DataAggregator()
+    results['DataAggregator'] = measure('DataAggregator.aggregate_frame',
+                                        lambda: aggregator.aggregate_frame(clean.copy()), repeat)
+
+    for service, result in results.items():
+        rows = result['rows_in'] or files['rows']
+        result['rows_per_s'] = round(rows / result['wall_s']) if result['wall_s'] else None
+    return results
+
+def load_baselines(path: str = BASELINES_FILE) -> Dict:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def find_regressions(results: Dict[str, Dict[str, Dict]], baselines: Dict,
+                     threshold: float = REGRESSION_THRESHOLD,
+                     min_seconds: float = MIN_REGRESSION_SECONDS) -> List[str]:
+    """Services slower than baseline * (1 + threshold) (and by more than min_seconds)."""
+    regressions = []
+    for scale, services in results.items():
+        for service, result in services.items():
+            baseline = baselines.get('scales', {}).get(str(scale), {}).get(service)
+            if not baseline:
+                continue
+            limit = baseline['wall_s'] * (1 + threshold)
+            if result['wall_s'] > limit and result['wall_s'] - baseline['wall_s'] > min_seconds:
+                regressions.append(f"{service} @ {scale}x: {result['wall_s']:.3f}s "
+                                   f"(baseline {baseline['wall_s']:.3f}s, limit {limit:.3f}s)")
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of the ETL services on synthetic ANS data")
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES,
+                        help="Data set sizes, in multiples of 10k rows per quarter (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per service; the best one counts")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="Allowed slowdown over the baseline (default: %(default)s = +25%%)")
+    parser.add_argument('--update-baselines', action='store_true',
+                        help="Store these results as the new baselines instead of comparing")
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    # The services log every step; only the benchmark output is wanted here
+    logging.getLogger('src').setLevel(logging.WARNING)
+
+    results = {}
+    for scale in args.scales:
+        logger.info(f"--- {scale}x ---")
+        results[scale] = bench_scale(scale, args.seed, args.repeat)
+        for service, result in results[scale].items():
+            logger.info(f"{service:<18} {result['wall_s']:>8.3f}s  {result['rows_per_s'] or 0:>12,} rows/s  "
+                        f"peak RSS {result['peak_rss_bytes'] / 1024 ** 2:,.0f} MiB  "
+                        f"output {result['frame_bytes_out'] / 1024 ** 2:,.1f} MiB")
+
+    os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+    with open(RESULTS_FILE, 'w', encoding='utf-8') as f:
+        json.dump({'scales': results}, f, indent=2)
+
+    if args.update_baselines:
+        baselines = load_baselines()
+        baselines.setdefault('scales', {}).update({str(scale): services for scale, services in results.items()})
+        baselines['machine'] = f"{platform.machine()} / Python {platform.python_version()}"
+        baselines['seed'] = args.seed
+        with open(BASELINES_FILE, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=2)
+        logger.info(f"Baselines updated: {BASELINES_FILE}")
+        return 0
+
+    regressions = find_regressions(results, load_baselines(), args.threshold)
+    if regressions:
+        logger.error("PERFORMANCE REGRESSION:\n  " + "\n  ".join(regressions))
+        return 1
+    logger.info("No regressions against the baselines.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
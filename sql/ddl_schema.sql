@@ -26,3 +26,33 @@ CREATE TABLE IF NOT EXISTS fact_despesas_eventos (
         REFERENCES dim_operadoras(reg_ans)
         ON DELETE CASCADE
 );
+
+-- Table: agg_despesas_operadora (Summary)
+-- Leaf-account totals (CHAR_LENGTH(conta_contabil) = 9) per quarter and operator.
+-- Rebuilt at import time; read by /api/estatisticas instead of the fact table.
+CREATE TABLE IF NOT EXISTS agg_despesas_operadora (
+    data_trimestre DATE NOT NULL,
+    reg_ans VARCHAR(20) NOT NULL,
+    total_despesas DECIMAL(18,2) NOT NULL,
+
+    PRIMARY KEY (data_trimestre, reg_ans),
+    INDEX idx_agg_operadora_total (data_trimestre, total_despesas),
+
+    CONSTRAINT fk_agg_operadora
+        FOREIGN KEY (reg_ans)
+        REFERENCES dim_operadoras(reg_ans)
+        ON DELETE CASCADE
+);
+
+-- Table: agg_despesas_uf (Summary)
+-- Leaf-account totals per quarter, UF and modalidade of the operators.
+CREATE TABLE IF NOT EXISTS agg_despesas_uf (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    data_trimestre DATE NOT NULL,
+    uf VARCHAR(2),
+    modalidade VARCHAR(100),
+    total_despesas DECIMAL(18,2) NOT NULL,
+    num_operadoras INT NOT NULL,
+
+    INDEX idx_agg_uf_data (data_trimestre, uf, modalidade)
+);
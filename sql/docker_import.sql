@@ -76,3 +76,23 @@ FROM temp_despesas
 WHERE reg_ans IN (SELECT reg_ans FROM dim_operadoras);
 
 DROP TEMPORARY TABLE temp_despesas;
+
+-- ============================================================
+-- 3. Build the statistics summaries (read by /api/estatisticas)
+-- Same rules as DatabaseLoader.refresh_summaries: leaf accounts only.
+-- ============================================================
+DELETE FROM agg_despesas_operadora;
+
+INSERT INTO agg_despesas_operadora (data_trimestre, reg_ans, total_despesas)
+SELECT data_trimestre, reg_ans, SUM(vl_saldo_final)
+FROM fact_despesas_eventos
+WHERE CHAR_LENGTH(conta_contabil) = 9
+GROUP BY data_trimestre, reg_ans;
+
+DELETE FROM agg_despesas_uf;
+
+INSERT INTO agg_despesas_uf (data_trimestre, uf, modalidade, total_despesas, num_operadoras)
+SELECT a.data_trimestre, o.uf, o.modalidade, SUM(a.total_despesas), COUNT(*)
+FROM agg_despesas_operadora a
+JOIN dim_operadoras o ON o.reg_ans = a.reg_ans
+GROUP BY a.data_trimestre, o.uf, o.modalidade;
@@ -6,15 +6,87 @@ PROJECT_ROOT = os.path.dirname(BASE_DIR)
 
 DOWNLOAD_DIR = os.path.join(PROJECT_ROOT, "downloads")
 OUTPUT_DIR = os.path.join(PROJECT_ROOT, "output")
+CACHE_DIR = os.path.join(PROJECT_ROOT, "cache")
+
+# Ingested DataFrame of every processed quarter (see QuarterStore)
+QUARTER_STORE_DIR = os.path.join(CACHE_DIR, "quarters")
+
+# Parsed ZIP cache (Parquet, keyed by ZIP content hash + filter config)
+PARSE_CACHE_DIR = os.path.join(CACHE_DIR, "parsed")
+PARSE_CACHE_MAX_BYTES = 2 * 1024 ** 3
+PARSE_CACHE_MAX_AGE_DAYS = 90
+
+# Deduplicated operator dimension built from the cadastre (rebuilt per cadastre release)
+CADASTRE_CACHE_DIR = os.path.join(CACHE_DIR, "cadastre")
+
+# Partial statistics per (operator, DATA) kept by the incremental aggregation (--incremental)
+AGGREGATION_STATE_FILE = os.path.join(CACHE_DIR, "aggregation_state.parquet")
+# Fingerprints of the records already consolidated by --incremental runs (see FingerprintDeduplicator)
+DEDUP_SEEN_FILE = os.path.join(CACHE_DIR, "dedup_seen.npy")
+
+# Stage outputs + fingerprints of the DAG runner (--dag / --from / --until)
+STAGE_CACHE_DIR = os.path.join(CACHE_DIR, "stages")
+
+# Out-of-core mode (--memory-budget): stage outputs spilled here during the run
+SPILL_DIR = os.path.join(CACHE_DIR, "spill")
+# Peak working memory of a slice, as a multiple of its in-memory size (copies along the stages)
+PARTITION_WORKING_FACTOR = 6
+MIN_PARTITION_ROWS = 10_000
+
+# Per-stage telemetry of each run (time, CPU, peak RSS, rows, bytes); --profile adds the
+# cProfile dump of the slowest stage next to it
+RUN_REPORT_FILE = os.path.join(OUTPUT_DIR, "run_report.json")
 
 # --- URLs ---
 ANS_BASE_URL = "https://dadosabertos.ans.gov.br/FTP/PDA/demonstracoes_contabeis/"
 CADASTRE_URL = "https://dadosabertos.ans.gov.br/FTP/PDA/operadoras_de_plano_de_saude_ativas/Relatorio_cadop.csv"
 
+# --- Rede ---
+# Number of year folders listed in parallel (also the keep-alive pool size)
+SCAN_MAX_WORKERS = 8
+# Files downloaded in parallel (quarter ZIPs + cadastre)
+DOWNLOAD_MAX_WORKERS = 4
+
+# Listing manifest (cached directory listings of the ANS portal)
+LISTING_MANIFEST_FILE = "listing_manifest.json"
+LISTING_TTL_CLOSED = 30 * 24 * 3600  # Closed years: 30 days
+LISTING_TTL_OPEN = 6 * 3600          # Root listing and current year: 6 hours
+
 # --- Processamento ---
 CSV_SEP = ";"
 CSV_ENCODING = "utf-8"
 
 CONSOLIDATED_FILE = "consolidado_despesas.zip"
 
+# Typed (Parquet) hand-offs between stages; CSV/ZIP is only written for final exports
+CONSOLIDATED_INTERMEDIATE = "consolidado_despesas.parquet"
+ENRICHED_FILE = "enriched_data.parquet"
+CLEAN_FILE = "data_clean.parquet"
+# Stages hand DataFrames over in memory; checkpoints write the files above as well
+PIPELINE_CHECKPOINTS = False
+
+# Quarters processed by default (override with --quarters N or --years 2019-2024)
+DEFAULT_QUARTER_WINDOW = 3
+
+# Overlapped download/parse: finished downloads wait in a bounded queue for the parse workers
+PIPELINE_OVERLAP = True
+PIPELINE_QUEUE_SIZE = 2
+PIPELINE_PARSE_WORKERS = 1
+
+# Worker processes used to parse ZIPs (1 = parse in the main process)
+INGEST_WORKERS = 1
+
 TARGET_EXPENSE_DESCRIPTION = "Despesas com Eventos / Sinistros"
+
+# Streaming ZIP reader: quarterly CSVs are read in chunks, keeping only these columns
+ZIP_STREAMING = True
+ZIP_CHUNK_ROWS = 200_000
+INGEST_COLUMNS = ['DATA', 'REG_ANS', 'CD_CONTA_CONTABIL', 'DESCRICAO', 'VL_SALDO_INICIAL', 'VL_SALDO_FINAL']
+
+# --- Banco de dados ---
+# Bulk loader (--load-db): rows per multi-row INSERT batch and batches sent in parallel over
+# the connection pool (SQLite always loads with one writer)
+DB_LOAD_BATCH_ROWS = 5_000
+DB_LOAD_WORKERS = 4
+# Rows of consolidado_despesas.csv read at a time when loading from the export
+DB_LOAD_READ_ROWS = 200_000
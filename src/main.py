@@ -1,14 +1,36 @@
 import os
 import sys
+import argparse
 import logging
+import pandas as pd
+from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
 from src.services.ans_client import AnsDataClient
 from src.services.ingestion import IngestionService
+from src.services.backfill import QuarterBackfill
+from src.services.quarter_store import QuarterStore
+from src.services.parse_cache import ParsedZipCache
 from src.services.data_consolidator import DataConsolidator
 from src.services.data_validator import DataValidator
 from src.services.data_enricher import DataEnricher
 from src.services.data_aggregator import DataAggregator
+from src.services.dag_runner import DagRunner, Stage
+from src.services.deduplicator import FingerprintDeduplicator
+from src.services.cadastre import CadastreDimension
+from src.services.validation_rules import RuleEngine
+from src.services.aggregation_cube import AggregationCube
+from src.services.zip_processor import ZipProcessor
+from src.services.partitioned_pipeline import PartitionedPipeline
+from src.services.db_loader import DatabaseLoader
+from src.utils.parsers import parse_br_decimal
+from src.utils.validators import validate_cnpj_series
+from src.utils.columnar import write_frame
+from src.utils.schema import compact_facts
+from src.utils.telemetry import RunTelemetry
 from src import config
 
+STAGES = ['ingest', 'cadastre', 'consolidate', 'enrich', 'validate', 'aggregate', 'load']
+
 def setup_logging():
     logging.basicConfig(
         level=logging.INFO,
@@ -19,61 +41,290 @@ def setup_logging():
         ]
     )
 
-def main():
+def parse_year_range(value: str):
+    """Parses '2019-2024' (or a single year '2024') into an inclusive (first, last) tuple."""
+    try:
+        parts = [int(p) for p in value.split('-')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid year range '{value}'. Use YYYY or YYYY-YYYY.")
+    if len(parts) == 1:
+        parts = parts * 2
+    if len(parts) != 2 or parts[0] > parts[1]:
+        raise argparse.ArgumentTypeError(f"Invalid year range '{value}'. Use YYYY or YYYY-YYYY.")
+    return parts[0], parts[1]
+
+def parse_size(value: str) -> int:
+    """Parses a memory size like '8G', '512M' or a plain number of bytes."""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    text = value.strip().upper().rstrip('B')
+    try:
+        if text and text[-1] in units:
+            return int(float(text[:-1]) * units[text[-1]])
+        return int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid size '{value}'. Use e.g. 6G, 512M or bytes.")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="ANS Healthcare Analytics ETL pipeline")
+    window = parser.add_mutually_exclusive_group()
+    window.add_argument('--quarters', type=int, default=config.DEFAULT_QUARTER_WINDOW,
+                        help="Process the newest N quarters (default: %(default)s)")
+    window.add_argument('--years', type=parse_year_range,
+                        help="Backfill every quarter of a year range, e.g. 2019-2024")
+    parser.add_argument('--workers', type=int, default=config.INGEST_WORKERS,
+                        help="Worker processes used to parse the ZIPs (default: %(default)s)")
+    parser.add_argument('--checkpoint', action='store_true', default=config.PIPELINE_CHECKPOINTS,
+                        help="Also write each stage's output to output/*.parquet (debugging/restart)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only process quarters not yet folded into the saved aggregation state; "
+                             "the consolidated and quarantine exports then cover those quarters only")
+    parser.add_argument('--profile', action='store_true',
+                        help="Also run the stages under cProfile and save the profile of the slowest one "
+                             "(see the run report)")
+    parser.add_argument('--memory-budget', type=parse_size,
+                        help="Out-of-core mode: process the quarters in slices that fit this much memory "
+                             "(e.g. 6G), spilling stage outputs to cache/spill; same outputs as in memory. "
+                             "Each quarter is still loaded whole: the peak is the largest quarter + one slice, "
+                             "so the budget must fit the largest quarter")
+    parser.add_argument('--load-db', action='store_true',
+                        help="Also bulk load the operators and the consolidated expenses into the database "
+                             "(DATABASE_URL); the loaded quarters are replaced")
+    dag = parser.add_argument_group("stage DAG (outputs cached in cache/stages, unchanged stages are skipped)")
+    dag.add_argument('--dag', action='store_true',
+                     help="Run the stages through the DAG runner")
+    dag.add_argument('--from', dest='from_stage', choices=STAGES,
+                     help="First stage to run; earlier stages reuse their saved outputs (implies --dag)")
+    dag.add_argument('--until', choices=STAGES,
+                     help="Last stage to run (implies --dag)")
+    dag.add_argument('--force', action='store_true',
+                     help="Re-run the selected stages even if unchanged")
+    args = parser.parse_args(argv)
+    args.dag = args.dag or bool(args.from_stage or args.until)
+    args.load_db = args.load_db or 'load' in (args.from_stage, args.until)
+    if args.dag and args.incremental:
+        parser.error("--incremental cannot be combined with the stage DAG")
+    if args.memory_budget and (args.dag or args.incremental or args.checkpoint):
+        parser.error("--memory-budget cannot be combined with --dag, --incremental or --checkpoint")
+    return args
+
+def build_stages(args, client: AnsDataClient, backfill: QuarterBackfill) -> List[Stage]:
+    """The ETL as a DAG: each stage declares its inputs, code and config (see DagRunner)."""
+    consolidator = DataConsolidator()
+    enricher = DataEnricher()
+    validator = DataValidator(output_dir=config.OUTPUT_DIR)
+    aggregator = DataAggregator()
+
+    def listing():
+        # Source of the ingestion: the published ZIPs of the window (listing is cached)
+        items = client.select_quarters(args.quarters, args.years)
+        return [(item['filename'], item.get('size'), item.get('modified')) for item in items]
+
+    def download_cadastre(_):
+        path = client.download_cadastral_data()
+        return path if path and os.path.exists(path) else None
+
+    def consolidate(inputs):
+        df = consolidator.consolidate_frame(inputs['ingest'])
+        consolidator.export(df)
+        return df
+
+    def enrich(inputs):
+        return enricher.enrich_frame(inputs['consolidate'], enricher.load_cadastre(inputs['cadastre']))
+
+    def validate(inputs):
+        clean_df, quarantine_df = validator.validate_frame(inputs['enrich'])
+        validator.save_quarantine(quarantine_df)
+        return clean_df
+
+    def aggregate(inputs):
+        summary = aggregator.aggregate_frame(inputs['validate'])
+        aggregator.export(summary)
+        return summary
+
+    def load(inputs):
+        loader = DatabaseLoader()
+        stats = loader.load(enricher.load_cadastre(inputs['cadastre']), [inputs['consolidate']])
+        return pd.DataFrame([stats])
+
+    stages = [
+        Stage('ingest', lambda _: backfill.run(count=args.quarters, year_range=args.years),
+              code=[IngestionService, ZipProcessor, parse_br_decimal, compact_facts],
+              params={'quarters': args.quarters, 'years': args.years,
+                      'columns': config.INGEST_COLUMNS, 'description': config.TARGET_EXPENSE_DESCRIPTION},
+              source=listing),
+        Stage('cadastre', download_cadastre, code=[AnsDataClient], volatile=True),
+        Stage('consolidate', consolidate, deps=['ingest'], code=[DataConsolidator, FingerprintDeduplicator, compact_facts]),
+        Stage('enrich', enrich, deps=['consolidate', 'cadastre'], code=[DataEnricher, CadastreDimension, compact_facts]),
+        Stage('validate', validate, deps=['enrich'],
+              code=[DataValidator, RuleEngine, validate_cnpj_series, parse_br_decimal, compact_facts]),
+        Stage('aggregate', aggregate, deps=['validate'], code=[DataAggregator, AggregationCube, compact_facts]),
+    ]
+    if args.load_db:
+        # Writes to the database (an outside system): never skipped as unchanged
+        stages.append(Stage('load', load, deps=['consolidate', 'cadastre'], code=[DatabaseLoader], volatile=True))
+    return stages
+
+def main(argv=None):
+    args = parse_args(argv)
     setup_logging()
     logger = logging.getLogger(__name__)
-    
+
+    # Every instrumented stage call of the run is recorded in output/run_report.json
+    telemetry = RunTelemetry(profile=args.profile)
+    try:
+        with telemetry:
+            export = run_pipeline(args, logger)
+            # Only what this run exported: never a leftover export of an earlier (or aborted) run
+            if args.load_db and export:
+                load_database(logger, AnsDataClient(), export)
+    finally:
+        # Also (above all) for a run that failed: the stages up to the failure are in the report
+        telemetry.write_report(config.RUN_REPORT_FILE)
+
+def run_pipeline(args, logger) -> Optional[str]:
+    """Runs the ETL. Returns the path of the consolidated export written by this run (None if none was)."""
     logger.info("--- STARTING ETL PIPELINE ---")
     
-    # 1. DOWNLOAD
     client = AnsDataClient()
-    downloaded_files = client.download_last_3_quarters()
-    
-    if not downloaded_files:
-        logger.error("No files downloaded. Aborting.")
-        return
+    ingestion = IngestionService(cache=ParsedZipCache(), workers=args.workers)
+    backfill = QuarterBackfill(client, ingestion)
+
+    if args.dag:
+        runner = DagRunner(build_stages(args, client, backfill))
+        try:
+            report = runner.run(start=args.from_stage, until=args.until, force=args.force)
+        except ValueError as e:
+            # An unreadable cadastre in 'enrich'/'load', or a DagError: a --from without saved
+            # outputs, a stage without output (e.g. the cadastre download failed)
+            logger.error(f"{e}. Aborting.")
+            return None
+        logger.info("--- STAGES: " + ", ".join(f"{name}={status}" for name, status in report.items()) + " ---")
+        return None  # the DAG loads through its own 'load' stage
+
+    if args.memory_budget:
+        return run_partitioned(args, logger, client, backfill)
+
+    aggregator = DataAggregator()
+
+    # Incremental: quarters already folded into the aggregation state are not reprocessed
+    skip_keys = aggregator.folded_quarters() if args.incremental else None
 
-    # 2. INGESTION (Processing + Concatenation)
-    ingestion = IngestionService()
-    full_df = ingestion.ingest_from_files(downloaded_files)
+    # 1+2. DOWNLOAD + INGESTION of the quarter window (stored quarters are reused),
+    # while the cadastre downloads on the side
+    with ThreadPoolExecutor(max_workers=1) as side:
+        cadastre_future = side.submit(client.download_cadastral_data)
+        full_df = backfill.run(count=args.quarters, year_range=args.years, skip_keys=skip_keys)
+        cadastral_path = cadastre_future.result()
     
     if full_df is None or full_df.empty:
+        if args.incremental and backfill.last_window_keys:
+            logger.info("No new quarters to process.")
+            aggregator.export(aggregator.aggregate_incremental(None, [], window=backfill.last_window_keys))
+            return None
         logger.error("No data available after ingestion. Aborting.")
-        return
+        return None
+
+    # 3..6 run in memory: each stage hands its DataFrame straight to the next one.
+    # Only the final exports (and the quarantine) are written, unless --checkpoint is set.
+    def checkpoint(df, filename):
+        if args.checkpoint:
+            logger.info(f"    Checkpoint: {write_frame(df, os.path.join(config.OUTPUT_DIR, filename))}")
 
     # 3. CONSOLIDATION
     logger.info("\n--- AGGREGATING DATA ---")
-    consolidator = DataConsolidator()
-    consolidator.consolidate(full_df)
+    deduplicator = None
+    if args.incremental:
+        # New quarters are deduplicated against the records of the earlier runs
+        deduplicator = FingerprintDeduplicator(seen_path=config.DEDUP_SEEN_FILE)
+        deduplicator.forget(backfill.last_keys)
+    consolidator = DataConsolidator(deduplicator=deduplicator)
+    consolidated_df = consolidator.consolidate_frame(full_df)
+    export = consolidator.export(consolidated_df)
+    checkpoint(consolidated_df, config.CONSOLIDATED_INTERMEDIATE)
+    del full_df
 
     # 4. ENRICHMENT
     logger.info("\n--- Data Enrichment (Cadastral Join) ---")
-    
-    logger.info("Downloading Cadastral Data...")
-    cadastral_path = client.download_cadastral_data()
-    
-    enricher = DataEnricher()
-    input_for_enricher = os.path.join(config.OUTPUT_DIR, config.CONSOLIDATED_FILE)
-    
-    if not os.path.exists(input_for_enricher):
-        logger.error("Consolidated file not found. Aborting.")
-        return
 
-    enriched_path = enricher.enrich_data(input_for_enricher, cadastral_path)
+    if not cadastral_path:
+        logger.error("Cadastral data not available. Aborting.")
+        return None
+
+    enricher = DataEnricher()
+    dimension = load_dimension(logger, enricher, cadastral_path)
+    if dimension is None:
+        return None
+    enriched_df = enricher.enrich_frame(consolidated_df, dimension)
+    checkpoint(enriched_df, config.ENRICHED_FILE)
+    del consolidated_df
 
     # 5. VALIDATION
     logger.info("\n--- Data Validation ---")
     validator = DataValidator(output_dir=config.OUTPUT_DIR)
-    clean_path, quarantine_path = validator.validate_and_split(enriched_path)
+    clean_df, quarantine_df = validator.validate_frame(enriched_df)
+    validator.save_quarantine(quarantine_df)
+    checkpoint(clean_df, config.CLEAN_FILE)
+    del enriched_df, quarantine_df
     
     # 6. AGGREGATION
     logger.info("\n--- Aggregation Strategy ---")
-    aggregator = DataAggregator()
     
-    if clean_path and os.path.exists(clean_path):
-        aggregator.aggregate_data(clean_path)
+    if args.incremental:
+        summary = aggregator.aggregate_incremental(clean_df, backfill.last_keys, window=backfill.last_window_keys)
+        aggregator.export(summary)
+        # Saved with the aggregation state: both cover the same quarters
+        deduplicator.save(backfill.last_keys)
+    elif not clean_df.empty:
+        aggregator.export(aggregator.aggregate_frame(clean_df))
     else:
         logger.error("No clean data available for aggregation.")
+    return export
+
+def run_partitioned(args, logger, client: AnsDataClient, backfill: QuarterBackfill) -> Optional[str]:
+    """Out-of-core run: quarters are stored, then read back and processed one at a time. Returns the export path."""
+    with ThreadPoolExecutor(max_workers=1) as side:
+        cadastre_future = side.submit(client.download_cadastral_data)
+        items = backfill.store_window(count=args.quarters, year_range=args.years)
+        cadastral_path = cadastre_future.result()
+
+    if not items:
+        logger.error("No data available after ingestion. Aborting.")
+        return None
+    if not cadastral_path:
+        logger.error("Cadastral data not available. Aborting.")
+        return None
+
+    enricher = DataEnricher()
+    pipeline = PartitionedPipeline(args.memory_budget)
+    pipeline.check_budget({QuarterStore.key(item): backfill.store.memory_estimate(item) for item in items})
+    dimension = load_dimension(logger, enricher, cadastral_path)
+    if dimension is None:
+        return None
+    if pipeline.run(backfill.iter_stored(items), dimension) is None:
+        return None
+    return pipeline.last_stats['export']
+
+def load_dimension(logger, enricher: DataEnricher, cadastral_path: str) -> Optional[pd.DataFrame]:
+    """The operator dimension of the cadastre, or None (logged) when the file cannot be read."""
+    try:
+        return enricher.load_cadastre(cadastral_path)
+    except ValueError as e:
+        logger.error(f"{e}. Aborting.")
+        return None
+
+def load_database(logger, client: AnsDataClient, export: str):
+    """7. DATABASE LOAD: the consolidated export of this run (streamed in chunks) + the operator cadastre."""
+    logger.info("\n--- Database Load ---")
+    cadastral_path = client.download_cadastral_data()
+    if not os.path.exists(export) or not cadastral_path or not os.path.exists(cadastral_path):
+        logger.error("Consolidated export or cadastral data not available. Skipping the database load.")
+        return
+
+    dimension = load_dimension(logger, DataEnricher(), cadastral_path)
+    if dimension is None:
+        return
+    loader = DatabaseLoader()
+    loader.load(dimension, DatabaseLoader.read_export(export))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
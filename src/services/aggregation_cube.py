@@ -0,0 +1,193 @@
+import logging
+import os
+import numpy as np
+import pandas as pd
+from typing import Iterable, List, Set
+from src.utils.columnar import read_frame, write_frame
+from src.utils.schema import to_reg_ans
+
+logger = logging.getLogger(__name__)
+
+class AggregationCube:
+    """
+    Mergeable partial statistics of ValorDespesas per (operator, DATA):
+    count, sum, m2 (sum of squared deviations from the mean), min and max.
+
+    The partials are computed in a single groupby over categorical keys. Every rollup
+    (operator, UF, Modalidade, quarter, grand total) is then derived from them, merging the
+    moments with Chan's parallel formula, without going back to the rows.
+
+    The partials are also the persisted state of the incremental mode: new quarters are
+    folded into it, so only the new rows are ever scanned.
+    """
+
+    OPERATOR_KEYS = ['REG_ANS', 'RazaoSocial', 'UF', 'Modalidade']
+    PERIOD = 'DATA'
+    STATS = ['count', 'sum', 'm2', 'min', 'max']
+
+    def __init__(self, partials: pd.DataFrame):
+        self.partials = partials
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'AggregationCube':
+        """One pass over the rows (DATA already datetime, ValorDespesas numeric)."""
+        data = df[cls.OPERATOR_KEYS + [cls.PERIOD, 'ValorDespesas']]
+        # Rows without a complete operator key never make it into a group
+        data = data[data[cls.OPERATOR_KEYS].notna().all(axis=1)]
+        data = data.astype({key: 'category' for key in cls.OPERATOR_KEYS})
+
+        grouped = data.groupby(cls.OPERATOR_KEYS + [cls.PERIOD], observed=True, dropna=False, sort=False)
+        partials = grouped['ValorDespesas'].agg(['count', 'sum', 'var', 'min', 'max']).reset_index()
+        partials['m2'] = (partials['var'] * (partials['count'] - 1)).fillna(0.0)
+        partials = partials.drop(columns=['var'])
+
+        for key in cls.OPERATOR_KEYS:
+            partials[key] = partials[key].astype(partials[key].cat.categories.dtype)
+        logger.info(f"    Cube: {len(data)} rows -> {len(partials)} (operator, period) partials.")
+        return cls(partials[cls.OPERATOR_KEYS + [cls.PERIOD] + cls.STATS])
+
+    @classmethod
+    def empty(cls) -> 'AggregationCube':
+        partials = pd.DataFrame({key: pd.Series(dtype='str') for key in cls.OPERATOR_KEYS})
+        partials[cls.PERIOD] = pd.Series(dtype='datetime64[ns]')
+        for stat in cls.STATS:
+            partials[stat] = pd.Series(dtype='int64' if stat == 'count' else 'float64')
+        return cls(partials)
+
+    @classmethod
+    def combine(cls, cubes: Iterable['AggregationCube']) -> 'AggregationCube':
+        """Partials of several disjoint row sets (e.g. the partitions of the out-of-core mode)."""
+        parts = [cube.partials for cube in cubes if not cube.partials.empty]
+        if not parts:
+            return cls.empty()
+        return cls(pd.concat(parts, ignore_index=True))
+
+    # --- Persisted state (incremental aggregation) ---
+
+    @classmethod
+    def load(cls, path: str) -> 'AggregationCube':
+        """Loads saved partials; an empty cube if there is no (readable) state yet."""
+        if not os.path.exists(path):
+            return cls.empty()
+        try:
+            return cls(read_frame(path))
+        except Exception as e:
+            logger.warning(f"Discarding unreadable aggregation state {path}: {e}")
+            return cls.empty()
+
+    def save(self, path: str) -> str:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        return write_frame(self.partials, path)
+
+    def quarter_keys(self) -> pd.Series:
+        """Quarter of each partial as "YYYYQn" (the QuarterStore key format)."""
+        period = self.partials[self.PERIOD]
+        keys = period.dt.year.astype('Int64').astype(str) + 'Q' + period.dt.quarter.astype('Int64').astype(str)
+        return keys.where(period.notna())
+
+    def quarters(self) -> Set[str]:
+        return set(self.quarter_keys().dropna().unique())
+
+    def fold(self, new: 'AggregationCube', quarters: Iterable[str]) -> 'AggregationCube':
+        """
+        Folds freshly computed partials into this state. Partials of the reprocessed
+        `quarters` are replaced (a republished quarter never counts twice); the cost is
+        the size of the new partials, never the size of the row history.
+        """
+        keep = ~self.quarter_keys().isin(set(quarters))
+        kept = self.partials[keep.to_numpy(dtype=bool)]
+        if not new.partials.empty and pd.api.types.is_integer_dtype(new.partials['REG_ANS']) \
+                and not pd.api.types.is_integer_dtype(kept['REG_ANS']):
+            # State saved before REG_ANS became an integer (see utils.schema)
+            kept = kept.assign(REG_ANS=to_reg_ans(kept['REG_ANS']))
+        parts = [frame for frame in (kept, new.partials) if not frame.empty]
+        if not parts:
+            return AggregationCube.empty()
+        return AggregationCube(pd.concat(parts, ignore_index=True))
+
+    def select_quarters(self, quarters: Iterable[str]) -> 'AggregationCube':
+        """Sub-cube restricted to some quarters (e.g. the requested window)."""
+        selected = self.quarter_keys().isin(set(quarters)).to_numpy(dtype=bool)
+        return AggregationCube(self.partials[selected].reset_index(drop=True))
+
+    @staticmethod
+    def quarter_of(period: pd.Series) -> pd.Series:
+        # e.g. "2025Q3" (missing dates become "NaT", as in the row-level code)
+        return period.dt.to_period('Q').astype(str)
+
+    @staticmethod
+    def merge_stats(partials: pd.DataFrame, by: List[str]) -> pd.DataFrame:
+        """
+        Combines partials into one row per `by` group (count, sum, m2, min, max, std).
+        m2 = sum of the partial m2 + sum(n_i * (mean_i - mean)^2)  (Chan et al.)
+        """
+        grouped = partials.groupby(by, sort=True, dropna=False)
+        merged = grouped.agg(count=('count', 'sum'), sum=('sum', 'sum'), min=('min', 'min'), max=('max', 'max'))
+
+        group_mean = grouped['sum'].transform('sum') / grouped['count'].transform('sum')
+        spread = (partials['count'] * (partials['sum'] / partials['count'] - group_mean) ** 2).fillna(0.0)
+        merged['m2'] = grouped['m2'].sum() + spread.groupby([partials[k] for k in by], sort=True, dropna=False).sum()
+
+        # Sample std (ddof=1); a single value (or none) has no dispersion
+        merged['std'] = np.sqrt(merged['m2'] / (merged['count'] - 1)).where(merged['count'] > 1, 0.0)
+        return merged
+
+    def latest_snapshot(self) -> pd.DataFrame:
+        """Partials of the latest DATA: balances are cumulative, so only the last one is summed."""
+        return self.partials[self.partials[self.PERIOD] == self.partials[self.PERIOD].max()]
+
+    def by_operator(self) -> pd.DataFrame:
+        """
+        Operator table of despesas_agregadas.csv: total and std over the latest snapshot,
+        active quarters over the whole history, average per active quarter.
+        """
+        stats = self.merge_stats(self.latest_snapshot(), self.OPERATOR_KEYS)
+        summary = pd.DataFrame({
+            'Valor_total_Despesas': stats['sum'],
+            'Desvio_padrao_Despesas': stats['std'],
+        })
+
+        quarters = self.partials.assign(Quarter=self.quarter_of(self.partials[self.PERIOD]))
+        active = quarters.groupby(self.OPERATOR_KEYS, sort=True)['Quarter'].nunique()
+        summary['Qtd_Trimestres_Ativos'] = active.reindex(summary.index)
+
+        summary['Media_Despesas_Por_Trimestre'] = summary['Valor_total_Despesas'] / summary['Qtd_Trimestres_Ativos']
+        return summary.reset_index()
+
+    def _rollup(self, key: str) -> pd.DataFrame:
+        snapshot = self.latest_snapshot()
+        stats = self.merge_stats(snapshot, [key])
+        rollup = pd.DataFrame({
+            'Qtd_Operadoras': snapshot.groupby(key, sort=True)['REG_ANS'].nunique(),
+            'Valor_total_Despesas': stats['sum'],
+            'Desvio_padrao_Despesas': stats['std'],
+        })
+        rollup['Media_Despesas_Por_Operadora'] = rollup['Valor_total_Despesas'] / rollup['Qtd_Operadoras']
+        return rollup.reset_index().sort_values(by='Valor_total_Despesas', ascending=False)
+
+    def by_uf(self) -> pd.DataFrame:
+        return self._rollup('UF')
+
+    def by_modalidade(self) -> pd.DataFrame:
+        return self._rollup('Modalidade')
+
+    def by_quarter(self) -> pd.DataFrame:
+        """Totals per quarter over the whole history (one balance date per quarter), oldest first."""
+        partials = self.partials.assign(Trimestre=self.quarter_of(self.partials[self.PERIOD]))
+        stats = self.merge_stats(partials, ['Trimestre'])
+        rollup = pd.DataFrame({
+            'Qtd_Operadoras': partials.groupby('Trimestre', sort=True)['REG_ANS'].nunique(),
+            'Qtd_Registros': stats['count'].astype('int64'),
+            'Valor_total_Despesas': stats['sum'],
+            'Desvio_padrao_Despesas': stats['std'],
+        })
+        rollup['Media_Despesas_Por_Operadora'] = rollup['Valor_total_Despesas'] / rollup['Qtd_Operadoras']
+        return rollup.reset_index()
+
+    def grand_total(self) -> pd.Series:
+        """Totals of the latest snapshot."""
+        snapshot = self.latest_snapshot().assign(_all=0)
+        stats = self.merge_stats(snapshot, ['_all'])
+        if stats.empty:
+            return pd.Series({stat: 0.0 for stat in ['count', 'sum', 'm2', 'min', 'max', 'std']})
+        return stats.iloc[0]
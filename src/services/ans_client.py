@@ -1,34 +1,86 @@
 import shutil
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 import re
 import os
-from typing import List, Dict
+import json
+import zipfile
+from email.utils import formatdate
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Optional, Iterator, Tuple
 
 import logging
 
 from src import config
+from src.services.listing_manifest import ListingManifest
+from src.utils.telemetry import instrumented
 
 logger = logging.getLogger(__name__)
 
 class AnsDataClient:
-    def __init__(self, download_dir=config.DOWNLOAD_DIR):
+    # "2024-03-05 10:21   12M" (ISO) or "05-Mar-2024 10:21  12M" (classic Apache)
+    LISTING_DETAILS = re.compile(
+        r'(\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}|\d{2}-[A-Za-z]{3}-\d{4}\s+\d{2}:\d{2})\s+(\S+)?'
+    )
+
+    def __init__(self, download_dir=config.DOWNLOAD_DIR, max_workers=config.SCAN_MAX_WORKERS, manifest=None):
         self.download_dir = download_dir
+        self.max_workers = max_workers
+        self._session = None
         os.makedirs(download_dir, exist_ok=True)
+        self.manifest = manifest or ListingManifest(os.path.join(download_dir, config.LISTING_MANIFEST_FILE))
 
-    def _get_links(self, url: str) -> List[str]:
-        """Helper to get all href links from a page."""
+    def _get_session(self) -> requests.Session:
+        """
+        Lazily builds a keep-alive Session shared by all scan workers.
+        The connection pool is sized to the worker count so no thread waits for a socket.
+        """
+        if self._session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self._session = session
+        return self._session
+
+    def _get_entries(self, url: str, session: Optional[requests.Session] = None) -> List[Dict]:
+        """
+        Helper to get all links from a directory listing, with the modification date and
+        size columns when the server shows them (Apache table or <pre> layouts).
+        """
+        http = session or requests
         try:
-            response = requests.get(url)
+            response = http.get(url)
             response.raise_for_status()
             soup = BeautifulSoup(response.text, 'html.parser')
-            # Extract hrefs, ignoring 'Parent Directory'
-            links = [a.get('href') for a in soup.find_all('a') if a.get('href') and 'Parent' not in a.text]
-            return links
+
+            entries = []
+            for a in soup.find_all('a'):
+                href = a.get('href')
+                # Ignore 'Parent Directory'
+                if not href or 'Parent' in a.text:
+                    continue
+
+                row = a.find_parent('tr')
+                details = row.get_text(' ') if row else str(a.next_sibling or '')
+                match = self.LISTING_DETAILS.search(details)
+
+                entries.append({
+                    'href': href,
+                    'modified': match.group(1) if match else None,
+                    'size': match.group(2) if match and match.group(2) != '-' else None,
+                })
+            return entries
         except Exception as e:
             logger.error(f"Error accessing {url}: {e}")
             return []
 
+    def _get_links(self, url: str, session: Optional[requests.Session] = None) -> List[str]:
+        """Helper to get all href links from a page."""
+        return [entry['href'] for entry in self._get_entries(url, session)]
+
     def _detect_quarter(self, text: str) -> int:
         r"""
         Uses Regex to find 1T, 2T, 3T, 4T in filenames.
@@ -53,99 +105,331 @@ class AnsDataClient:
 
 
 
-    def get_available_quarters(self):
+    def _scan_year(self, year: str, session: Optional[requests.Session] = None,
+                   refresh: bool = False) -> List[Dict]:
+        """
+        Lists one year folder and returns the quarterly ZIPs found in it.
+        Served from the listing manifest while the folder's TTL has not expired.
+        """
+        year_url = f"{config.ANS_BASE_URL}{year}/"
+
+        cached = None if refresh else self.manifest.get(year_url)
+        if cached is not None:
+            return cached
+
+        # Get all files inside that year
+        files_in_year = self._get_entries(year_url, session)
+
+        found_files = []
+        for entry in files_in_year:
+            file_link = entry['href']
+            if file_link.lower().endswith('.zip'):
+                quarter = self._detect_quarter(file_link)
+
+                if quarter > 0:
+                    found_files.append({
+                        "year": int(year),
+                        "quarter": quarter,
+                        "filename": file_link,
+                        "url": f"{year_url}{file_link}",
+                        "size": entry['size'],
+                        "modified": entry['modified']
+                    })
+
+        # Empty results are not cached: they usually mean the request failed
+        if found_files:
+            self.manifest.put(year_url, found_files, closed=self.manifest.is_closed_year(int(year), found_files))
+        return found_files
+
+    def _scan_years_concurrent(self, year_folders: List[str], session: requests.Session,
+                               max_workers: int, target_count: Optional[int],
+                               refresh: bool = False) -> List[Dict]:
+        """
+        Lists year folders through a bounded thread pool.
+        Without a target every folder is submitted at once; with a target the years are
+        scanned in waves (newest first) so we can stop as soon as enough quarters are known.
+        """
+        found_files = []
+        wave_size = max_workers if target_count else max(len(year_folders), 1)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for start in range(0, len(year_folders), wave_size):
+                wave = year_folders[start:start + wave_size]
+                # map() yields in submission order, so an early stop only ever cuts older years
+                for files in executor.map(lambda year: self._scan_year(year, session, refresh), wave):
+                    found_files.extend(files)
+
+                if target_count and len(found_files) >= target_count:
+                    logger.info(f"Found {len(found_files)} files (target {target_count}). Stopping scan at {wave[-1]}.")
+                    break
+
+        return found_files
+
+    @instrumented
+    def get_available_quarters(self, concurrent: bool = False, max_workers: Optional[int] = None,
+                               target_count: Optional[int] = None, refresh: bool = False):
         """
         Scans years and files to build a list of all available data.
         Returns sorted list: Newest first.
+
+        Args:
+            concurrent: Lists the year folders in parallel over a shared keep-alive Session.
+            max_workers: Thread pool size for the concurrent scan (defaults to the client setting).
+            target_count: Stops walking older years once this many quarters were found.
+            refresh: Ignores the listing manifest and re-scrapes every folder.
         """
         logger.info(f"Scanning {config.ANS_BASE_URL}...")
-        root_links = self._get_links(config.ANS_BASE_URL)
+        session = self._get_session() if concurrent else None
 
-        found_files = []
+        year_folders = None if refresh else self.manifest.get(config.ANS_BASE_URL)
+        if year_folders is None:
+            root_links = self._get_links(config.ANS_BASE_URL, session)
 
-        year_folders = []
-        for link in root_links:
-            clean_name = link.strip('/')
-            if clean_name.isdigit() and len(clean_name) == 4:
-                year_folders.append(clean_name)
+            year_folders = []
+            for link in root_links:
+                clean_name = link.strip('/')
+                if clean_name.isdigit() and len(clean_name) == 4:
+                    year_folders.append(clean_name)
 
-        year_folders.sort(reverse=True)
+            if year_folders:
+                self.manifest.put(config.ANS_BASE_URL, year_folders)
+        else:
+            logger.info(f"Using cached listing ({len(year_folders)} year folders).")
 
-        
-        for year in year_folders:
-            year_url = f"{config.ANS_BASE_URL}{year}/"
-            # Get all files inside that year
-            files_in_year = self._get_links(year_url)
-        
-            for file_link in files_in_year:
-                if file_link.lower().endswith('.zip'):
-                    quarter = self._detect_quarter(file_link)
-
-                    if quarter > 0:
-                        found_files.append({
-                            "year": int(year),
-                            "quarter": quarter,
-                            "filename": file_link,
-                            "url": f"{year_url}{file_link}"
-                        })
+        year_folders = sorted(year_folders, reverse=True)
+
+        if concurrent:
+            found_files = self._scan_years_concurrent(
+                year_folders, session, max_workers or self.max_workers, target_count, refresh
+            )
+        else:
+            found_files = []
+            for year in year_folders:
+                found_files.extend(self._scan_year(year, refresh=refresh))
+
+                if target_count and len(found_files) >= target_count:
+                    logger.info(f"Found {len(found_files)} files (target {target_count}). Stopping scan at {year}.")
+                    break
+
+        self.manifest.save()
         
         # Sort by Year (Descending) first, then Quarter (Descending).
         found_files.sort(key=lambda x: (x['year'], x['quarter']), reverse=True)
         return found_files
 
-    def _download_file(self, url: str, filename: str):
+    def _meta_path(self, path: str) -> str:
+        """Sidecar file holding the HTTP validators (ETag/Last-Modified) of a local file."""
+        return f"{path}.meta.json"
+
+    def _load_meta(self, path: str) -> Dict:
+        try:
+            with open(self._meta_path(path), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_meta(self, path: str, response) -> None:
+        # Only keep the validators the server actually sent
+        meta = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+        meta = {k: v for k, v in meta.items() if isinstance(v, str)}
+        with open(self._meta_path(path), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+    def _remove(self, path: str) -> None:
+        """Deletes a file and its validator sidecar (if any)."""
+        for target in (path, self._meta_path(path)):
+            if os.path.exists(target):
+                os.remove(target)
+
+    def _is_intact(self, path: str, deep: bool = False) -> bool:
+        """
+        Integrity check for downloaded files.
+        Non-ZIP files only need to exist. For ZIPs, opening the central directory catches
+        truncated files (cheap); deep=True also CRC-checks every member.
+        """
+        if not path.lower().removesuffix('.part').endswith('.zip'):
+            return os.path.exists(path)
+        try:
+            with zipfile.ZipFile(path, 'r') as z:
+                return z.testzip() is None if deep else True
+        except (zipfile.BadZipFile, OSError):
+            return False
+
+    @instrumented
+    def _download_file(self, url: str, filename: str, session: Optional[requests.Session] = None):
         """
         INTERNAL: Downloads a file using streams (Memory Efficient).
+
+        - Cached files are revalidated with If-None-Match/If-Modified-Since (a 304 costs one request).
+        - Bytes are written to '<file>.part' and renamed only after the integrity check passes.
+        - A leftover '.part' from a crashed run is resumed with a Range request.
         """
         local_path = os.path.join(self.download_dir, filename)
+        part_path = f"{local_path}.part"
+        headers = {}
 
         if os.path.exists(local_path):
-            logger.info(f"File {filename} already exists. Skipping...")
-            return local_path
-        
-        logger.info(f"Downloading {filename}...")
+            if self._is_intact(local_path):
+                meta = self._load_meta(local_path)
+                if meta.get('etag'):
+                    headers['If-None-Match'] = meta['etag']
+                headers['If-Modified-Since'] = meta.get('last_modified') or formatdate(
+                    os.path.getmtime(local_path), usegmt=True
+                )
+            else:
+                logger.warning(f"File {filename} is corrupted. Downloading again...")
+                self._remove(local_path)
+
+        if not headers and os.path.exists(part_path):
+            offset = os.path.getsize(part_path)
+            headers['Range'] = f"bytes={offset}-"
+            # If-Range: the server only honours the Range if the file did not change meanwhile
+            part_meta = self._load_meta(part_path)
+            validator = part_meta.get('etag') or part_meta.get('last_modified')
+            if validator:
+                headers['If-Range'] = validator
+            logger.info(f"Resuming {filename} from byte {offset}...")
+        else:
+            logger.info(f"Downloading {filename}...")
+
+        http = session or requests
         try:
             # stream=True tells requests NOT to download everything at once
-            with requests.get(url, stream=True) as r:
+            with http.get(url, stream=True, headers=headers) as r:
+                if r.status_code == 304:
+                    logger.info(f"File {filename} not modified. Using cached copy.")
+                    return local_path
+
+                if r.status_code == 416:
+                    # Partial is stale or already complete: start over from scratch
+                    logger.warning(f"Range not satisfiable for {filename}. Restarting download...")
+                    self._remove(part_path)
+                    return self._download_file(url, filename, session)
+
                 r.raise_for_status()
-                with open(local_path, 'wb') as f:
+
+                resumed = r.status_code == 206
+                if not resumed:
+                    self._save_meta(part_path, r)
+
+                with open(part_path, 'ab' if resumed else 'wb') as f:
                     # shutil.copyfileobj writes chunks of data to disk as they arrive
                     shutil.copyfileobj(r.raw, f)
-            logger.info(f"Success {local_path}")
-            return local_path
         except Exception as e:
+            # The '.part' file is kept so the next run can resume it
             logger.error(f"Failed to download {url}: {e}")
+            if os.path.exists(local_path):
+                logger.warning(f"Falling back to cached copy of {filename}.")
+                return local_path
             return None
-    
-    def download_last_3_quarters(self) -> List[str]:
+
+        if not self._is_intact(part_path, deep=True):
+            logger.error(f"Downloaded {filename} failed the integrity check. Discarding it.")
+            self._remove(part_path)
+            return None
+
+        # Atomic swap: readers never see a half-written file
+        os.replace(part_path, local_path)
+        if os.path.exists(self._meta_path(part_path)):
+            os.replace(self._meta_path(part_path), self._meta_path(local_path))
+
+        logger.info(f"Success {local_path}")
+        return local_path
+
+    def download_files(self, items: List[Dict], max_workers: Optional[int] = None) -> List[Optional[str]]:
         """
-        Main method to orchestrate the process.
-        Returns:
-            List[str]: List of absolute paths of the downloaded files.
+        Downloads several files in parallel over the shared keep-alive Session.
+        Each item needs 'url' and 'filename'. Paths come back in the same order as the items
+        (None for failures).
         """
-        #  Get the list
-        candidates = self.get_available_quarters()
-        
-        if not candidates:
-            logger.warning("No files found.")
+        if not items:
             return []
 
-        # Slice the top 3 (since it's already sorted)
-        targets = candidates[:3]
-        downloaded_paths = []
+        session = self._get_session()
+        workers = min(max_workers or config.DOWNLOAD_MAX_WORKERS, len(items))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(
+                lambda item: self._download_file(item['url'], item['filename'], session), items
+            ))
+
+    def iter_downloads(self, items: List[Dict], max_workers: Optional[int] = None) -> Iterator[Tuple[int, Optional[str], float]]:
+        """
+        Downloads items in parallel and yields each one as soon as it finishes
+        (completion order, not item order), so consumers can start working early.
+        Yields:
+            (item index, local path or None, seconds spent downloading)
+        """
+        if not items:
+            return
+
+        session = self._get_session()
+        workers = min(max_workers or config.DOWNLOAD_MAX_WORKERS, len(items))
+
+        def timed_download(item):
+            start = time.perf_counter()
+            path = self._download_file(item['url'], item['filename'], session)
+            return path, time.perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(timed_download, item): i for i, item in enumerate(items)}
+            for future in as_completed(futures):
+                path, elapsed = future.result()
+                yield futures[future], path, elapsed
 
-        logger.info(f"Targeting top 3 files:")
+    def select_quarters(self, count: Optional[int] = 3, year_range: Optional[Tuple[int, int]] = None) -> List[Dict]:
+        """
+        Returns the listing entries of the quarters to process (newest first).
+        Args:
+            count: Newest N quarters (ignored when year_range is given).
+            year_range: Inclusive (first_year, last_year) window for historical backfills.
+        """
+        if year_range:
+            first_year, last_year = year_range
+            candidates = [
+                c for c in self.get_available_quarters(concurrent=True)
+                if first_year <= c['year'] <= last_year
+            ]
+            targets = candidates
+            label = f"{first_year}-{last_year}"
+        else:
+            #  Get the list (only the newest years are needed to find the quarters)
+            candidates = self.get_available_quarters(concurrent=True, target_count=count)
+            # Slice the top N (since it's already sorted)
+            targets = candidates[:count]
+            label = f"top {count}"
+
+        if not targets:
+            logger.warning("No files found.")
+            return []
+
+        logger.info(f"Targeting {len(targets)} files ({label}):")
         for t in targets:
             logger.info(f" - {t['year']} Q{t['quarter']}: {t['filename']}")
 
-        # Download them
-        for item in targets:
-            path = self._download_file(item['url'], item['filename'])
-            if path:
-                downloaded_paths.append(path)
-        
-        return downloaded_paths
+        return targets
+
+    def download_quarters(self, count: Optional[int] = 3, year_range: Optional[Tuple[int, int]] = None) -> List[str]:
+        """
+        Downloads a configurable quarter window (see select_quarters).
+        Returns:
+            List[str]: List of absolute paths of the downloaded files.
+        """
+        targets = self.select_quarters(count, year_range)
+        return [path for path in self.download_files(targets) if path]
 
+    def download_last_3_quarters(self) -> List[str]:
+        """
+        Main method to orchestrate the process.
+        Returns:
+            List[str]: List of absolute paths of the downloaded files.
+        """
+        return self.download_quarters(3)
+
+    @instrumented
     def download_cadastral_data(self):
         """
         Downloads the Active Operators Cadastre (Relatorio_Cadop).
@@ -154,4 +438,17 @@ class AnsDataClient:
         filename = "Relatorio_Cadop.csv"
         
         self._download_file(config.CADASTRE_URL, filename)
-        return os.path.join(self.download_dir, filename)
\ No newline at end of file
+        return os.path.join(self.download_dir, filename)
+
+    def download_quarters_and_cadastre(self, count: int = 3):
+        """
+        Downloads the last N quarter ZIPs and the cadastre in one parallel batch.
+        Returns:
+            Tuple[List[str], Optional[str]]: ZIP paths and the cadastre path (None if it failed).
+        """
+        targets = self.select_quarters(count)
+        cadastre = {'url': config.CADASTRE_URL, 'filename': "Relatorio_Cadop.csv"}
+
+        paths = self.download_files(targets + [cadastre])
+        zip_paths = [path for path in paths[:-1] if path]
+        return zip_paths, paths[-1]
@@ -0,0 +1,136 @@
+import logging
+import pandas as pd
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from src.services.ans_client import AnsDataClient
+from src.services.ingestion import IngestionService
+from src.services.quarter_store import QuarterStore
+from src.utils.schema import concat_facts
+from src import config
+
+logger = logging.getLogger(__name__)
+
+class QuarterBackfill:
+    """
+    Downloads and ingests a configurable quarter window (last N quarters or a year range).
+
+    Every ingested quarter is kept in a QuarterStore, so widening the window or picking up a
+    newly published quarter only downloads and parses the quarters that are not stored yet.
+    """
+
+    def __init__(self, client: AnsDataClient, ingestion: IngestionService,
+                 store: Optional[QuarterStore] = None,
+                 max_workers: int = config.DOWNLOAD_MAX_WORKERS,
+                 parse_workers: int = config.PIPELINE_PARSE_WORKERS,
+                 overlap: bool = config.PIPELINE_OVERLAP):
+        self.client = client
+        self.ingestion = ingestion
+        self.store = store or QuarterStore()
+        self.max_workers = max_workers
+        self.parse_workers = parse_workers
+        self.overlap = overlap
+
+    def run(self, count: Optional[int] = config.DEFAULT_QUARTER_WINDOW,
+            year_range: Optional[Tuple[int, int]] = None,
+            skip_keys: Optional[Set[str]] = None) -> Optional[pd.DataFrame]:
+        """
+        Returns the ingested DataFrame for the requested window (newest quarter first),
+        or None when nothing could be ingested.
+
+        Quarters in `skip_keys` (e.g. already folded into the aggregation state) are left out
+        while their stored copy is current; a republished one is processed and returned.
+        The keys of the window and of the returned quarters go to `last_window_keys`/`last_keys`.
+        """
+        self.last_window_keys: List[str] = []
+        self.last_keys: List[str] = []
+        items = self.client.select_quarters(count, year_range)
+        if not items:
+            return None
+
+        self.last_window_keys = [QuarterStore.key(item) for item in items]
+        missing = [item for item in items if not self.store.has(item)]
+        logger.info(f"Quarter window: {len(items)} quarters ({len(items) - len(missing)} stored, {len(missing)} to process).")
+
+        fresh = self._process(missing) if missing else {}
+
+        frames = []
+        skipped = 0
+        for item in items:
+            key = QuarterStore.key(item)
+            df = fresh.get(key)
+            if df is None and skip_keys and key in skip_keys and self.store.has(item):
+                skipped += 1
+                continue
+            if df is None and self.store.has(item):
+                df = self.store.load(item)
+
+            if df is not None:
+                frames.append(df)
+                self.last_keys.append(key)
+            else:
+                logger.warning(f"Quarter {key} is not available. Skipping it.")
+
+        if skipped:
+            logger.info(f"Skipped {skipped} quarters that are already up to date.")
+        if not frames:
+            if not skipped:
+                logger.warning("No data ingested from any available file.")
+            return None
+        return concat_facts(frames)
+
+    def store_window(self, count: Optional[int] = config.DEFAULT_QUARTER_WINDOW,
+                     year_range: Optional[Tuple[int, int]] = None) -> List[Dict]:
+        """
+        Out-of-core version of run: makes sure every quarter of the window is stored, without
+        keeping any of them in memory. Returns the window items (read them with iter_stored).
+        """
+        self.last_window_keys = []
+        self.last_keys = []
+        items = self.client.select_quarters(count, year_range)
+        self.last_window_keys = [QuarterStore.key(item) for item in items]
+        missing = [item for item in items if not self.store.has(item)]
+        logger.info(f"Quarter window: {len(items)} quarters ({len(items) - len(missing)} stored, {len(missing)} to process).")
+        if missing:
+            self._process(missing, keep=False)
+        return items
+
+    def iter_stored(self, items: List[Dict]) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """Yields (key, DataFrame) of each stored quarter, one at a time, in window order (as run concatenates them)."""
+        for item in items:
+            key = QuarterStore.key(item)
+            df = self.store.load(item) if self.store.has(item) else None
+            if df is None:
+                logger.warning(f"Quarter {key} is not available. Skipping it.")
+                continue
+            self.last_keys.append(key)
+            yield key, df
+            # Let the caller's copy be the only one before the next quarter is loaded
+            del df
+
+    def _process(self, items: List[Dict], keep: bool = True) -> Dict[str, pd.DataFrame]:
+        """
+        Downloads and parses the missing quarters, storing each one as soon as it is ready.
+        Returns the fresh frames by quarter key (so they are not read back from disk);
+        with keep=False they are only stored.
+        """
+        fresh = {}
+
+        def store_result(index: int, df: pd.DataFrame) -> None:
+            self.store.save(items[index], df)
+            if keep:
+                fresh[QuarterStore.key(items[index])] = df
+
+        if self.overlap:
+            downloads = self.client.iter_downloads(items, self.max_workers)
+            self.ingestion.ingest_overlapped(
+                downloads, parse_workers=self.parse_workers, on_result=store_result, collect=False
+            )
+            return fresh
+
+        paths = self.client.download_files(items, self.max_workers)
+        downloaded = [index for index, path in enumerate(paths) if path]
+        frames = self.ingestion.ingest_each([paths[index] for index in downloaded])
+
+        for index, df in zip(downloaded, frames):
+            if df is not None:
+                store_result(index, df)
+        return fresh
@@ -0,0 +1,156 @@
+import codecs
+import hashlib
+import json
+import logging
+import os
+import threading
+import pandas as pd
+from typing import Dict, Optional, Tuple
+from src.utils.schema import to_reg_ans
+from src import config
+
+logger = logging.getLogger(__name__)
+
+def scan_file(path: str, block_size: int = 1024 * 1024) -> Tuple[str, str]:
+    """
+    SHA-256 and encoding of the cadastre in a single read. The encoding is detected without
+    parsing: the blocks are fed to an incremental UTF-8 decoder until the first invalid
+    sequence, which means Latin-1 (it accepts any byte); later blocks are only hashed.
+    """
+    digest = hashlib.sha256()
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    encoding = None
+    with open(path, 'rb') as f:
+        head = f.read(len(codecs.BOM_UTF8))
+        digest.update(head)
+        if head == codecs.BOM_UTF8:
+            encoding = 'utf-8-sig'
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+            if encoding is None:
+                try:
+                    decoder.decode(head + block)
+                except UnicodeDecodeError:
+                    encoding = 'latin-1'
+                head = b''
+    if encoding is None:
+        try:
+            decoder.decode(head, final=True)  # head: a file shorter than the BOM
+            encoding = 'utf-8'
+        except UnicodeDecodeError:
+            encoding = 'latin-1'
+    return digest.hexdigest(), encoding
+
+def sniff_encoding(path: str, block_size: int = 1024 * 1024) -> str:
+    """Encoding of the cadastre: 'utf-8', 'utf-8-sig' or 'latin-1' (see scan_file)."""
+    return scan_file(path, block_size)[1]
+
+class CadastreDimension:
+    """
+    Operator dimension built from the cadastre (Relatorio_Cadop.csv): one row per
+    REGISTRO_OPERADORA (first occurrence kept), indexed by it.
+
+    The parsed dimension is persisted as Parquet and only rebuilt when the cadastre
+    changes: same size/mtime reuses it directly, otherwise the content hash decides.
+    """
+
+    KEY = 'REGISTRO_OPERADORA'
+    COLUMNS = ['REGISTRO_OPERADORA', 'CNPJ', 'Razao_Social', 'Modalidade', 'UF']
+    META_FILE = "cadastre.json"
+    DATA_FILE = "cadastre.parquet"
+
+    def __init__(self, cache_dir: str = config.CADASTRE_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+
+    def _meta_path(self) -> str:
+        return os.path.join(self.cache_dir, self.META_FILE)
+
+    def _data_path(self) -> str:
+        return os.path.join(self.cache_dir, self.DATA_FILE)
+
+    def _load_meta(self) -> Dict:
+        try:
+            with open(self._meta_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_meta(self, meta: Dict) -> None:
+        path = self._meta_path()
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    def load(self, csv_path: str) -> Optional[pd.DataFrame]:
+        """
+        Returns the dimension of `csv_path` (index: REGISTRO_OPERADORA), parsing the
+        cadastre only if it is a new release. Returns None if it cannot be read.
+        """
+        with self._lock:
+            try:
+                stat = os.stat(csv_path)
+            except OSError as e:
+                logger.error(f"Cadastre not available: {e}")
+                return None
+
+            signature = f"{stat.st_size}:{stat.st_mtime_ns}"
+            meta = self._load_meta()
+            cached = os.path.exists(self._data_path())
+
+            if cached and meta.get('signature') == signature:
+                return self._read_cached()
+
+            # One read for both the content hash and the encoding
+            sha256, encoding = scan_file(csv_path)
+            if cached and meta.get('sha256') == sha256:
+                # Same content, new mtime (e.g. re-downloaded): keep the dimension
+                meta['signature'] = signature
+                self._save_meta(meta)
+                return self._read_cached()
+
+            dimension = self._build(csv_path, encoding)
+            if dimension is None:
+                return None
+
+            # Created on the first write only: a DataEnricher that never loads leaves no directory
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{self._data_path()}.tmp"
+            dimension.to_parquet(tmp_path)
+            os.replace(tmp_path, self._data_path())
+            self._save_meta({
+                'signature': signature,
+                'sha256': sha256,
+                'encoding': self.last_encoding,
+                'rows': len(dimension),
+            })
+            return dimension
+
+    @staticmethod
+    def by_number(dimension: pd.DataFrame) -> pd.DataFrame:
+        """The dimension indexed by integer REG_ANS (non-numeric keys dropped, first of equal numbers kept)."""
+        keys = to_reg_ans(dimension.index.to_series())
+        keep = (keys.notna() & ~keys.duplicated()).to_numpy(dtype=bool)
+        dimension = dimension[keep]
+        dimension.index = pd.Index(keys[keep].array, name=dimension.index.name)
+        return dimension
+
+    def _read_cached(self) -> pd.DataFrame:
+        logger.info("    Cadastre unchanged: using the cached operator dimension.")
+        return pd.read_parquet(self._data_path())
+
+    def _build(self, csv_path: str, encoding: str) -> Optional[pd.DataFrame]:
+        self.last_encoding = encoding
+        logger.info(f"    Parsing cadastre {csv_path} ({self.last_encoding})...")
+        try:
+            df = pd.read_csv(csv_path, sep=config.CSV_SEP, encoding=self.last_encoding,
+                             usecols=self.COLUMNS, dtype=str)
+        except Exception as e:
+            logger.error(f"Failed to parse cadastre {csv_path}: {e}")
+            return None
+
+        df[self.KEY] = df[self.KEY].str.strip()
+        # Trade-off: If ID duplicates exist, keep the first one to avoid row explosion
+        dimension = df.drop_duplicates(subset=[self.KEY]).set_index(self.KEY)
+        logger.info(f"    Operator dimension: {len(dimension)} operators ({len(df) - len(dimension)} duplicates dropped).")
+        return dimension
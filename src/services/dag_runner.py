@@ -0,0 +1,197 @@
+import hashlib
+import inspect
+import json
+import logging
+import os
+import time
+import pandas as pd
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from src.utils.columnar import read_frame, write_frame
+from src import config
+
+logger = logging.getLogger(__name__)
+
+# A stage receives the outputs of its dependencies by name and returns a DataFrame
+# (persisted by the runner) or the path of a file it produced (e.g. the cadastre)
+StageFn = Callable[[Dict[str, Any]], Any]
+
+class Stage:
+    """
+    One node of the pipeline DAG.
+
+    Args:
+        name: Stage name (used by --from/--until).
+        run: Function computing the output from the dependency outputs.
+        deps: Names of the stages whose outputs are inputs of this one.
+        code: Classes/functions whose module source is part of the fingerprint (code version).
+        params: Config values the output depends on (must be JSON serializable).
+        source: Fingerprint of external inputs (e.g. the listing of the quarter ZIPs).
+        volatile: Always runs (cheap stages that check their own source, like a conditional
+            download); its output is still content-addressed, so dependents can be skipped.
+    """
+
+    def __init__(self, name: str, run: StageFn, deps: Iterable[str] = (), code: Iterable[Any] = (),
+                 params: Optional[Dict] = None, source: Optional[Callable[[], Any]] = None,
+                 volatile: bool = False):
+        self.name = name
+        self.run = run
+        self.deps = list(deps)
+        self.code = list(code)
+        self.params = params or {}
+        self.source = source
+        self.volatile = volatile
+
+class DagError(ValueError):
+    """A run the saved state cannot satisfy: a --from without saved outputs, or a stage without output."""
+
+class DagRunner:
+    """
+    Runs the stages in order and skips the ones whose outputs are still valid.
+
+    The fingerprint of a stage hashes its code, params, external source and the content hash
+    of every input. Outputs are stored by fingerprint, so a stage is skipped when its
+    fingerprint has an output already, and a re-run that produces the same content does not
+    invalidate the stages after it. Skipped outputs are only read if a later stage runs.
+    """
+
+    MANIFEST_FILE = "manifest.json"
+
+    def __init__(self, stages: List[Stage], state_dir: str = config.STAGE_CACHE_DIR):
+        names = [stage.name for stage in stages]
+        for stage in stages:
+            for dep in stage.deps:
+                if dep not in names[:names.index(stage.name)]:
+                    raise ValueError(f"Stage '{stage.name}' depends on '{dep}', which does not run before it.")
+        self.stages = stages
+        self.state_dir = state_dir
+        os.makedirs(state_dir, exist_ok=True)
+        self.manifest = self._load_manifest()
+        self.last_report: Dict[str, str] = {}
+
+    # --- Manifest ---
+
+    def _load_manifest(self) -> Dict:
+        try:
+            with open(os.path.join(self.state_dir, self.MANIFEST_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self) -> None:
+        path = os.path.join(self.state_dir, self.MANIFEST_FILE)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    # --- Hashing ---
+
+    @staticmethod
+    def _file_hash(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def code_hash(objects: Iterable[Any]) -> str:
+        digest = hashlib.sha256()
+        for obj in objects:
+            with open(inspect.getsourcefile(obj), 'rb') as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+
+    def fingerprint(self, stage: Stage) -> str:
+        payload = {
+            'stage': stage.name,
+            'code': self.code_hash(stage.code),
+            'params': stage.params,
+            'source': stage.source() if stage.source else None,
+            'inputs': {dep: self.manifest.get(dep, {}).get('output_hash') for dep in stage.deps},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    # --- Outputs ---
+
+    def _is_valid(self, stage: Stage, fingerprint: str) -> bool:
+        entry = self.manifest.get(stage.name)
+        return bool(entry) and entry['fingerprint'] == fingerprint and os.path.exists(entry['output'])
+
+    def _store(self, stage: Stage, fingerprint: str, output: Any) -> None:
+        previous = self.manifest.get(stage.name, {})
+        if isinstance(output, pd.DataFrame):
+            path = write_frame(output, os.path.join(self.state_dir, f"{stage.name}-{fingerprint[:16]}.parquet"))
+            owned = True
+        else:
+            path, owned = str(output), False
+
+        # Only the latest output of each stage is kept
+        if previous.get('owned') and previous.get('output') != path and os.path.exists(previous['output']):
+            os.remove(previous['output'])
+
+        self.manifest[stage.name] = {
+            'fingerprint': fingerprint,
+            'output': path,
+            'owned': owned,
+            'output_hash': self._file_hash(path),
+        }
+        self._save_manifest()
+
+    def _load_output(self, name: str) -> Any:
+        entry = self.manifest.get(name)
+        if not entry or not os.path.exists(entry['output']):
+            raise DagError(f"No saved output for stage '{name}' (run it first, without --from)")
+        return read_frame(entry['output']) if entry['owned'] else entry['output']
+
+    # --- Run ---
+
+    def stage_names(self) -> List[str]:
+        return [stage.name for stage in self.stages]
+
+    def run(self, start: Optional[str] = None, until: Optional[str] = None, force: bool = False) -> Dict[str, str]:
+        """
+        Runs the stages from `start` to `until` (inclusive; default: all of them). Stages
+        before `start` are not checked: their latest saved outputs are used as they are.
+        Returns the status of each stage: 'ran', 'skipped', 'reused' or 'not run'.
+        """
+        names = self.stage_names()
+        for name in (start, until):
+            if name is not None and name not in names:
+                raise ValueError(f"Unknown stage '{name}'. Stages: {', '.join(names)}")
+        first = names.index(start) if start else 0
+        last = names.index(until) if until else len(names) - 1
+
+        outputs: Dict[str, Any] = {}
+        report: Dict[str, str] = {}
+
+        def output_of(name: str) -> Any:
+            if name not in outputs:
+                outputs[name] = self._load_output(name)
+            return outputs[name]
+
+        for position, stage in enumerate(self.stages):
+            if position < first:
+                report[stage.name] = 'reused'
+                continue
+            if position > last:
+                report[stage.name] = 'not run'
+                continue
+
+            fingerprint = self.fingerprint(stage)
+            if not force and not stage.volatile and self._is_valid(stage, fingerprint):
+                logger.info(f"[DAG] {stage.name}: unchanged, skipped.")
+                report[stage.name] = 'skipped'
+                continue
+
+            logger.info(f"[DAG] {stage.name}: running...")
+            start_time = time.perf_counter()
+            output = stage.run({dep: output_of(dep) for dep in stage.deps})
+            if output is None:
+                raise DagError(f"Stage '{stage.name}' produced no output")
+            self._store(stage, fingerprint, output)
+            outputs[stage.name] = output
+            report[stage.name] = 'ran'
+            logger.info(f"[DAG] {stage.name}: done in {time.perf_counter() - start_time:.2f}s.")
+
+        self.last_report = report
+        return report
@@ -2,13 +2,21 @@ import logging
 import pandas as pd
 import os
 import zipfile
+from typing import List, Optional, Set
+from src.services.aggregation_cube import AggregationCube
 from src import config
+from src.utils.columnar import is_columnar, read_frame
+from src.utils.schema import to_reais
+from src.utils.telemetry import instrumented
 
 logger = logging.getLogger(__name__)
 
 class DataAggregator:
+    INPUT_COLUMNS = ['REG_ANS', 'RazaoSocial', 'UF', 'Modalidade', 'ValorDespesas', 'DATA']
+
     def __init__(self, output_dir=config.OUTPUT_DIR):
         self.output_dir = output_dir
+        self.last_cube: Optional[AggregationCube] = None
 
     def aggregate_data(self, clean_csv_path: str):
         """
@@ -17,13 +25,73 @@ class DataAggregator:
         """
         logger.info(f"   [Aggregator] Loading clean data from {clean_csv_path}...")
         
-        # Load data (ensure correct types)
+        # Load data (ensure correct types). Parquet input: only the needed columns are read
         try:
-            df = pd.read_csv(clean_csv_path, sep=config.CSV_SEP, encoding=config.CSV_ENCODING)
+            if is_columnar(clean_csv_path):
+                df = read_frame(clean_csv_path, columns=self.INPUT_COLUMNS)
+            else:
+                df = pd.read_csv(clean_csv_path, sep=config.CSV_SEP, encoding=config.CSV_ENCODING)
         except Exception as e:
             logger.error(f"   [Error] Failed to read file {clean_csv_path}: {e}")
             return None
 
+        summary = self.aggregate_frame(df)
+        return self.export(summary)
+
+    @instrumented
+    def aggregate_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        DataFrame-in/DataFrame-out version of aggregate_data (no file I/O).
+        Returns the summary table, sorted by total expenses.
+        """
+        df = self._prepare(df)
+
+        logger.info("   Calculating metrics by Operator/State...")
+
+        # --- CUBE ---
+        # One pass over the rows: partial stats per (operator, DATA). The operator table
+        # (latest snapshot totals + active quarters) and the UF/Modalidade/quarter rollups
+        # are all derived from these partials.
+        return self.aggregate_cube(AggregationCube.from_frame(df))
+
+    def partials(self, df: pd.DataFrame) -> AggregationCube:
+        """Cube of a slice of the clean rows (out-of-core mode merges one per partition)."""
+        return AggregationCube.from_frame(self._prepare(df))
+
+    def aggregate_cube(self, cube: AggregationCube) -> pd.DataFrame:
+        """Summary table derived from already computed partials (kept for the rollup exports)."""
+        self.last_cube = cube
+        return self._finish(cube.by_operator())
+
+    @instrumented
+    def aggregate_incremental(self, df: Optional[pd.DataFrame], quarters: List[str],
+                              window: Optional[List[str]] = None,
+                              state_path: str = config.AGGREGATION_STATE_FILE) -> pd.DataFrame:
+        """
+        Incremental version of aggregate_frame: `df` only holds the new (or republished)
+        `quarters`. Their partials are folded into the persisted state and the summary
+        is derived from the state, restricted to the `window` quarters when given.
+        Cost scales with the new rows, not with the history.
+        """
+        state = AggregationCube.load(state_path)
+        if quarters:
+            rows = 0 if df is None else len(df)
+            logger.info(f"   Folding {rows} new rows ({', '.join(quarters)}) into the aggregation state...")
+            new = AggregationCube.from_frame(self._prepare(df)) if rows else AggregationCube.empty()
+            state = state.fold(new, quarters)
+            state.save(state_path)
+        else:
+            logger.info("   No new quarters: deriving the aggregation from the saved state.")
+
+        self.last_cube = state.select_quarters(window) if window else state
+        return self._finish(self.last_cube.by_operator())
+
+    def folded_quarters(self, state_path: str = config.AGGREGATION_STATE_FILE) -> Set[str]:
+        """Quarters already folded into the persisted aggregation state."""
+        return AggregationCube.load(state_path).quarters()
+
+    def _prepare(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Repairs legacy suffixed columns and converts the value/date columns."""
         # remove columns with '_y'
         cols_to_drop = [col for col in df.columns if str(col).endswith('_y')]
         if cols_to_drop:
@@ -36,48 +104,17 @@ class DataAggregator:
             logger.info(f"   [Fix] Renaming columns back to original: {cols_to_rename}")
             df.rename(columns=cols_to_rename, inplace=True)
 
-        # Convert numeric columns if they are strings
-        df['ValorDespesas'] = pd.to_numeric(df['ValorDespesas'], errors='coerce')
-
-        # Convert Date to extract Quarters
-        df['DATA'] = pd.to_datetime(df['DATA'], errors='coerce')
-        
-        # Create a helper column 'Quarter' (e.g., "2025Q3")
-        df['Quarter'] = df['DATA'].dt.to_period('Q').astype(str)
-
-        logger.info("   Calculating metrics by Operator/State...")
+        # Convert numeric columns if they are strings; the statistics are in reais (centavos / 100)
+        df['ValorDespesas'] = pd.to_numeric(to_reais(df['ValorDespesas']), errors='coerce')
 
-        latest_date = df['DATA'].max()
-
-        df_snapshot = df[df['DATA'] == latest_date].copy()
-
-        group_keys = ['REG_ANS', 'RazaoSocial', 'UF', 'Modalidade']
-
-        # --- PRIMARY AGGREGATION (Sum & StdDev) ---
-        # Group by Company (RazaoSocial) and State (UF)
-        grouped = df_snapshot.groupby(group_keys)
-        
-        summary = df_snapshot.groupby(group_keys)['ValorDespesas'].agg(
-            Valor_total_Despesas='sum', Desvio_padrao_Despesas='std'
-            ).reset_index()
-        
-        
-        # Handle NaN in StdDev (occurs if an operator has only 1 transaction)
-        summary['Desvio_padrao_Despesas'] = summary['Desvio_padrao_Despesas'].fillna(0)
-
-        # --- QUARTERLY AVERAGE ---
-        # Logic: Total Expenses / Number of Active Quarters
-        # We count how many distinct quarters each operator appears in
-        grouped_original = df.groupby(group_keys)
-
-        unique_quarters = grouped_original['Quarter'].nunique().reset_index(name='Qtd_Trimestres_Ativos')
-        
-        # Merge this count back to summary
-        summary = pd.merge(summary, unique_quarters, on=group_keys)
-        
-        # Calculate Average
-        summary['Media_Despesas_Por_Trimestre'] = summary['Valor_total_Despesas'] / summary['Qtd_Trimestres_Ativos']
+        # Convert Date to extract Quarters (plain datetimes: the cube groups and compares them)
+        dates = df['DATA']
+        if isinstance(dates.dtype, pd.CategoricalDtype):
+            dates = dates.astype(dates.cat.categories.dtype)
+        df['DATA'] = pd.to_datetime(dates, errors='coerce')
+        return df
 
+    def _finish(self, summary: pd.DataFrame) -> pd.DataFrame:
         # ---  SORTING (The Trade-off) ---
         # Strategy: Sort by Total Expenses (Descending) to highlight top spenders.
         # Justification: Using Pandas optimized Quicksort (O(N log N)).
@@ -88,6 +125,11 @@ class DataAggregator:
             'RazaoSocial': 'Razao_Social'
         }, inplace=True)
 
+        return summary
+
+    @instrumented
+    def export(self, summary: pd.DataFrame) -> str:
+        """Writes the summary as the final CSV export and its ZIP. Returns the ZIP path."""
         # Save CSV 
         csv_filename = 'despesas_agregadas.csv'
         output_csv_path = os.path.join(self.output_dir, csv_filename)
@@ -107,10 +149,28 @@ class DataAggregator:
         
         logger.info(f"   [Success] Final file created: {output_zip_path}")
 
+        if self.last_cube is not None:
+            self.export_rollups(self.last_cube)
+
         # Show Top 1 result for validation
         if not summary.empty:
             top_one = summary.iloc[0]
             logger.info(f"   -> Top Spender: {top_one['Razao_Social']} ({top_one['UF']})")
             logger.info(f"   -> Total: R$ {top_one['Valor_total_Despesas']:,.2f}")
 
-        return output_zip_path
\ No newline at end of file
+        return output_zip_path
+
+    def export_rollups(self, cube: AggregationCube) -> List[str]:
+        """State, modality and quarter level exports, derived from the cube partials."""
+        paths = []
+        for filename, rollup in (('despesas_por_uf.csv', cube.by_uf()),
+                                 ('despesas_por_modalidade.csv', cube.by_modalidade()),
+                                 ('despesas_por_trimestre.csv', cube.by_quarter())):
+            path = os.path.join(self.output_dir, filename)
+            rollup.to_csv(path, index=False, sep=config.CSV_SEP, float_format='%.2f', encoding=config.CSV_ENCODING)
+            logger.info(f"    Saved CSV to {path}")
+            paths.append(path)
+
+        total = cube.grand_total()
+        logger.info(f"   -> Grand Total (latest snapshot): R$ {total['sum']:,.2f} over {int(total['count'])} entries")
+        return paths
\ No newline at end of file
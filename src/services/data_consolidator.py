@@ -1,28 +1,57 @@
+import numpy as np
 import pandas as pd
+import io
 import os
 import zipfile
 import logging
+from typing import Iterable, Optional
+from src.services.deduplicator import FingerprintDeduplicator
 from src import config
+from src.utils.columnar import write_frame
+from src.utils.schema import compact_facts, expand, quarter_parts
+from src.utils.telemetry import instrumented
 
 logger = logging.getLogger(__name__)
 
 class DataConsolidator:
-    def __init__(self, output_dir=config.OUTPUT_DIR):
+    def __init__(self, output_dir=config.OUTPUT_DIR, deduplicator: Optional[FingerprintDeduplicator] = None):
+        """
+        Args:
+            deduplicator: Shared deduplicator (e.g. with a persisted seen-set, to deduplicate
+                a new quarter against history). By default each call deduplicates on its own.
+        """
         self.output_dir = output_dir
+        self.deduplicator = deduplicator
+        self.last_dedup_stats = {}
         os.makedirs(self.output_dir, exist_ok=True)
 
     def consolidate(self, df: pd.DataFrame):
+        """
+        Path-based consolidation: consolidate_frame + the ZIP export + the Parquet hand-off.
+
+        Returns:
+            str: Path of the Parquet hand-off file.
+        """
+        final_df = self.consolidate_frame(df)
+        self.export(final_df)
+        return self.checkpoint(final_df)
+
+    @instrumented
+    def consolidate_frame(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Executes the consolidation stage of the ETL pipeline.
 
         Responsibilities:
-        1. Temporal Normalization: Standardizes date formats to Year/Quarter.
-        2. Data Cleaning: Filters out null accounting entries (zero values).
-        3. Deduplication: Identifies and removes redundant records based on composite keys.
-        4. Export: Generates the final dataset in CSV format compressed as ZIP.
+        1. Compact Schema: Integer keys, dictionary-encoded text/dates, centavos (see utils.schema).
+        2. Temporal Normalization: Standardizes date formats to Year/Quarter.
+        3. Data Cleaning: Filters out null accounting entries (zero values).
+        4. Deduplication: Identifies and removes redundant records based on composite keys.
 
         Args:
             df (pd.DataFrame): The raw aggregated DataFrame containing financial data from all quarters.
+
+        Returns:
+            pd.DataFrame: The consolidated dataset (no file I/O; see export/checkpoint).
         """
 
         initial_count = len(df)
@@ -30,16 +59,17 @@ class DataConsolidator:
         logger.info(f"--- STARTING CONSOLIDATION (Input: {initial_count} rows) ---")
         
 
-        # STANDARDIZE DATE 
-        df['DATA'] = pd.to_datetime(df['DATA'], errors='coerce')
-        df['Ano'] = df['DATA'].dt.year
-        df['Trimestre'] = df['DATA'].dt.quarter
+        # COMPACT SCHEMA (no-op for frames coming from the ZipProcessor)
+        compact_facts(df)
+
+        # STANDARDIZE DATE: computed once per distinct date
+        df['Ano'], df['Trimestre'] = quarter_parts(df['DATA'])
 
         # RENAME COLUMNS
         df.rename(columns={'VL_SALDO_FINAL': 'ValorDespesas'}, inplace=True)
         
         # Filter Zeros, Keep Negatives
-        zeros_mask = (df['ValorDespesas'] == 0)
+        zeros_mask = (df['ValorDespesas'] == 0).fillna(False)
         zeros_count = zeros_mask.sum()
         
         
@@ -47,35 +77,66 @@ class DataConsolidator:
         df = df[~zeros_mask].copy()
         
         logger.info(f"    Dropped {zeros_count} rows with Zero Value.")
-        logger.info(f"    Keeping {len(df[df['ValorDespesas'] < 0])} negative rows (reversals).")
+        logger.info(f"    Keeping {(df['ValorDespesas'] < 0).sum()} negative rows (reversals).")
 
-        # Drop Duplicates
-        target_cols = ['REG_ANS', 'DATA', 'CD_CONTA_CONTABIL', 'ValorDespesas', 'DESCRICAO']
-        duplicates_mask = df.duplicated(subset=target_cols, keep=False)
-        duplicate_count = duplicates_mask.sum()
+        # Drop Duplicates: one 64-bit fingerprint per composite key, stats from the same pass
+        deduplicator = self.deduplicator or FingerprintDeduplicator()
+        keep = deduplicator.deduplicate(df)
+        stats = deduplicator.last_stats
+        self.last_dedup_stats = stats
 
-        if duplicate_count > 0:
-            logger.info(f"    Detected {duplicate_count} duplicate records.")
+        if stats['duplicate_rows'] > 0:
+            logger.info(f"    Detected {stats['duplicate_rows']} duplicate records ({stats['duplicate_keys']} distinct keys).")
             logger.info("   --- Sample of Duplicates (First 5) ---")
-            logger.info("\n" + df[duplicates_mask].head(5).to_string(index=False)) # Cleaner print
-            
+            logger.info("\n" + df.iloc[stats['sample_positions']].to_string(index=False)) # Cleaner print
+
+        dropped = stats['dropped_in_batch'] + stats['dropped_seen_before']
+        if dropped > 0:
             #  Remove duplicates, keeping the first occurrence
-            df_clean = df.drop_duplicates(subset=target_cols)
-            logger.info(f"    Deduplication complete. Dropped {initial_count - len(df_clean)} redundant rows.")
+            df_clean = df[keep]
+            logger.info(f"    Deduplication complete. Dropped {dropped} redundant rows "
+                        f"({stats['dropped_seen_before']} already seen in earlier batches).")
         else:
             logger.info("    No duplicates detected.")
             df_clean = df
 
-        # Create placeholders for CNPJ/Name 
-        df_clean = df_clean.assign(CNPJ=None, RazaoSocial=None)
+        # Create placeholders for CNPJ/Name (empty categoricals: one byte per row, not one object)
+        placeholder = pd.Categorical.from_codes(np.full(len(df_clean), -1, dtype=np.int8),
+                                                categories=pd.Index([], dtype='str'))
+        df_clean = df_clean.assign(CNPJ=placeholder, RazaoSocial=placeholder)
         
         final_cols = ['DATA','REG_ANS', 'CD_CONTA_CONTABIL', 'CNPJ', 'RazaoSocial', 'Trimestre', 'Ano', 'ValorDespesas']
-        final_df = df_clean[final_cols].copy()
+        return df_clean[final_cols].copy()
+
+    @instrumented
+    def export(self, df: pd.DataFrame) -> str:
+        """Generates the final dataset in CSV format compressed as ZIP (input of the MySQL import). Returns its path."""
+        return self._save_to_zip(df)
+
+    @instrumented
+    def export_partitions(self, frames: Iterable[pd.DataFrame]) -> str:
+        """
+        Same ZIP as export, written partition by partition (out-of-core mode): the CSV is
+        streamed into the archive, so neither the whole dataset nor the CSV is ever held.
+        The frames must share dtypes (see PartitionedPipeline) for the text to match.
+        """
+        csv_filename = "consolidado_despesas.csv"
+        zip_filename = os.path.join(self.output_dir, "consolidado_despesas.zip")
+
+        logger.info(f"Saving final file to {zip_filename} (streamed by partition)...")
+        with zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_DEFLATED) as zf:
+            with io.TextIOWrapper(zf.open(csv_filename, 'w', force_zip64=True),
+                                  encoding=config.CSV_ENCODING, newline='') as csv_file:
+                for position, df in enumerate(frames):
+                    expand(df).to_csv(csv_file, index=False, header=position == 0, sep=config.CSV_SEP)
+        logger.info("Success! Consolidation finished.")
+        return zip_filename
 
-        # EXPORT
-        self._save_to_zip(final_df)
+    def checkpoint(self, df: pd.DataFrame) -> str:
+        """Typed Parquet copy (keeps dtypes, no re-parsing in the next stage). Returns its path."""
+        return write_frame(df, os.path.join(self.output_dir, config.CONSOLIDATED_INTERMEDIATE))
 
-    def _save_to_zip(self, df: pd.DataFrame):
+    def _save_to_zip(self, df: pd.DataFrame) -> str:
         csv_filename = "consolidado_despesas.csv"
         csv_path = os.path.join(self.output_dir, csv_filename)
         zip_filename = os.path.join(self.output_dir, "consolidado_despesas.zip")
@@ -83,7 +144,7 @@ class DataConsolidator:
         logger.info(f"Saving final file to {zip_filename}...")
         
         # Save CSV
-        df.to_csv(csv_path, index=False, sep=config.CSV_SEP, encoding=config.CSV_ENCODING)
+        expand(df).to_csv(csv_path, index=False, sep=config.CSV_SEP, encoding=config.CSV_ENCODING)
         
         # Zip it
         with zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_DEFLATED) as zf:
@@ -91,4 +152,5 @@ class DataConsolidator:
             
         # Cleanup
         os.remove(csv_path)
-        logger.info("Success! Consolidation finished.")
\ No newline at end of file
+        logger.info("Success! Consolidation finished.")
+        return zip_filename
\ No newline at end of file
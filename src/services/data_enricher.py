@@ -1,89 +1,155 @@
-import pandas as pd
-import os
-
 import logging
+import numpy as np
 import pandas as pd
 import os
+from typing import Optional
+from src.services.cadastre import CadastreDimension
+from src import config
+from src.utils.columnar import is_columnar, read_frame, write_frame
+from src.utils.schema import expand
+from src.utils.telemetry import instrumented
 
 logger = logging.getLogger(__name__)
 
 class DataEnricher:
-    def __init__(self, output_dir='output'):
+    def __init__(self, output_dir='output', dimension: Optional[CadastreDimension] = None):
         self.output_dir = output_dir
+        self.dimension = dimension or CadastreDimension()
 
-    def _load_cadastral_csv(self, path: str) -> pd.DataFrame:
+    @instrumented
+    def load_cadastre(self, path: str) -> pd.DataFrame:
         """
-        Helper to load the Cadastral CSV handling Encoding issues automatically.
+        Operator columns of the cadastre, deduplicated and indexed by REGISTRO_OPERADORA.
+        The cadastre is parsed once per release (see CadastreDimension).
         """
-        # We only need these columns to enrich our data
-        cols = ['REGISTRO_OPERADORA', 'CNPJ', 'Razao_Social', 'Modalidade', 'UF']
-        
-        try:
-            # Try UTF-8 first
-            return pd.read_csv(path, sep=';', encoding='utf-8', usecols=cols, dtype=str)
-        except (UnicodeDecodeError, ValueError):
-            logger.warning("   UTF-8 failed. Retrying with Latin-1...")
-            return pd.read_csv(path, sep=';', encoding='latin-1', usecols=cols, dtype=str)
+        dimension = self.dimension.load(path)
+        if dimension is None:
+            raise ValueError(f"Could not load the cadastre from {path}")
+        return dimension
 
     def enrich_data(self, financial_zip_path: str, cadastral_csv_path: str):
+        """
+        Joins the consolidated expenses with the cadastre.
+        A Parquet input produces a Parquet output (typed hand-off to the validator);
+        the legacy zipped CSV input still produces 'enriched_data.zip'.
+        """
         logger.info(f"    Loading Financial Data: {financial_zip_path}...")
-        df_fin = pd.read_csv(financial_zip_path, compression='zip', sep=';', encoding='utf-8', dtype=str)
+        columnar = is_columnar(financial_zip_path)
+        if columnar:
+            df_fin = read_frame(financial_zip_path)
+        else:
+            df_fin = pd.read_csv(financial_zip_path, compression='zip', sep=';', encoding='utf-8', dtype=str)
         
         logger.info(f"   Loading Cadastral Data: {cadastral_csv_path}...")
-        df_cad = self._load_cadastral_csv(cadastral_csv_path)
-
-        # STANDARDIZE KEYS (Remove spaces, ensure string)
-        df_fin['REG_ANS'] = df_fin['REG_ANS'].str.strip()
-        df_cad['REGISTRO_OPERADORA'] = df_cad['REGISTRO_OPERADORA'].str.strip()
-
-        # DEDUPLICATE CADASTRE
-        # Trade-off: If ID duplicates exist, keep the first one to avoid row explosion
-        df_cad = df_cad.drop_duplicates(subset=['REGISTRO_OPERADORA'])
-
-        # PERFORM JOIN (Left Join)
-        logger.info(f"   Merging {len(df_fin)} rows...")
-        merged_df = pd.merge(
-            df_fin, 
-            df_cad, 
-            left_on='REG_ANS', 
-            right_on='REGISTRO_OPERADORA', 
-            how='left'
-        )
+        df_cad = self.load_cadastre(cadastral_csv_path)
+
+        final_df = self.enrich_frame(df_fin, df_cad)
+
+        # SAVE
+        if columnar:
+            return write_frame(final_df, os.path.join(self.output_dir, config.ENRICHED_FILE))
+
+        output_file = os.path.join(self.output_dir, 'enriched_data.zip')
+        compression_opts = dict(method='zip', archive_name='enriched_data.csv')
+        expand(final_df).to_csv(output_file, index=False, sep=';', compression=compression_opts, encoding='utf-8')
+        
+        return output_file
+
+    @instrumented
+    def enrich_frame(self, df_fin: pd.DataFrame, df_cad: pd.DataFrame) -> pd.DataFrame:
+        """
+        DataFrame-in/DataFrame-out version of enrich_data (no file I/O).
+
+        Left join without pd.merge: every distinct REG_ANS is mapped once to its row in the
+        (deduplicated) operator dimension, then each attribute is pulled with a single take.
+        The fact columns are not copied and the CNPJ is normalized on the ~1k dimension rows.
+        The attributes come out dictionary-encoded (the dimension values are the categories).
+        """
+        dimension = self._prepare_dimension(df_cad)
+
+        # MAP KEYS -> DIMENSION ROW (-1 = no match), on the distinct keys only
+        codes, keys = pd.factorize(df_fin['REG_ANS'])
+        stripped = None
+        if pd.api.types.is_integer_dtype(keys):
+            # Compact facts: integer keys, matched against the numeric registry numbers
+            dimension = CadastreDimension.by_number(dimension)
+            positions = dimension.index.get_indexer(keys)
+        else:
+            stripped = pd.Index(keys).str.strip()
+            positions = dimension.index.get_indexer(stripped)
+        row_pos = np.where(codes >= 0, positions[codes], -1)
+
+        logger.info(f"   Joining {len(df_fin)} rows ({np.count_nonzero(row_pos >= 0)} matched)...")
+
+        def take(column: str, default=None) -> pd.Series:
+            # Position -1 (no match) takes the default; the dimension's own gaps are filled first
+            values = dimension[column] if default is None else dimension[column].fillna(default)
+            value_codes, categories = pd.factorize(values)
+            fill_code = -1
+            if default is not None:
+                if default not in categories:
+                    categories = categories.append(pd.Index([default]))
+                fill_code = categories.get_loc(default)
+            # The extra last slot is what position -1 picks
+            row_codes = np.append(value_codes, fill_code)[row_pos]
+            return pd.Series(pd.Categorical.from_codes(row_codes, categories=categories), index=df_fin.index)
 
         # FILL MISSING VALUES (The Enrichment Step)
         # We fill the empty CNPJ/Razao from the financial file with the data from Cadastre
-        merged_df['CNPJ'] = merged_df['CNPJ_y'].fillna(merged_df['CNPJ_x'])
-        merged_df['RazaoSocial'] = merged_df['Razao_Social'].fillna(merged_df['RazaoSocial'])
-        
+        cnpj = take('CNPJ')
+        razao = take('Razao_Social')
+        if 'CNPJ' in df_fin.columns:
+            missing = cnpj.isna() & df_fin['CNPJ'].notna()
+            if missing.any():
+                cnpj = cnpj.astype(object)
+                cnpj[missing] = self.normalize_cnpj(df_fin.loc[missing, 'CNPJ'])
+        if 'RazaoSocial' in df_fin.columns and df_fin['RazaoSocial'].notna().any():
+            razao = razao.astype(object).fillna(df_fin['RazaoSocial'])
+
         # HANDLE NO MATCHES (Trade-off: Unknown vs Drop)
         # We choose to keep the data (Unknown)
-        merged_df['Modalidade'] = merged_df['Modalidade'].fillna('DESCONHECIDO')
-        merged_df['UF'] = merged_df['UF'].fillna('ND')
-
-        # 1. Convert to String
-        # 2. Remove ".0" if it exists (float artifact)
-        # 3. Fill "nan" strings back to real None (so we can filter them)
-        # 4. Pad with Zeros to ensure 14 digits (Fixes the Sul America bug)
-        merged_df['CNPJ'] = merged_df['CNPJ'].astype(str).str.replace(r'\.0$', '', regex=True)
-        merged_df['CNPJ'] = merged_df['CNPJ'].replace('nan', '') # Handle string 'nan'
-
-        # It turns "1685053000156" into "01685053000156"
-        mask_valid = merged_df['CNPJ'] != ''
-        merged_df.loc[mask_valid, 'CNPJ'] = merged_df.loc[mask_valid, 'CNPJ'].str.zfill(14)
+        enriched = {
+            'CNPJ': cnpj,
+            'RazaoSocial': razao,
+            'UF': take('UF', 'ND'),
+            'Modalidade': take('Modalidade', 'DESCONHECIDO'),
+        }
 
         # SELECT FINAL COLUMNS
         final_cols = [
             'DATA', 'REG_ANS', 'CD_CONTA_CONTABIL', 'DESCRICAO', 
             'ValorDespesas', 'CNPJ', 'RazaoSocial', 'UF', 'Modalidade'
         ]
-        
+        fact_cols = [c for c in final_cols if c in df_fin.columns and c not in enriched]
+        final_df = df_fin[fact_cols].assign(**enriched)
+
+        # STANDARDIZE KEYS (Remove spaces), only if some key needed it
+        if stripped is not None and not stripped.equals(pd.Index(keys)):
+            final_df['REG_ANS'] = np.where(codes >= 0, stripped.take(codes), None)
+
         # Ensure only existing columns are selected
-        available = [c for c in final_cols if c in merged_df.columns]
-        final_df = merged_df[available]
+        return final_df[[c for c in final_cols if c in final_df.columns]]
 
-        # SAVE
-        output_file = os.path.join(self.output_dir, 'enriched_data.zip')
-        compression_opts = dict(method='zip', archive_name='enriched_data.csv')
-        final_df.to_csv(output_file, index=False, sep=';', compression=compression_opts, encoding='utf-8')
-        
-        return output_file
\ No newline at end of file
+    def _prepare_dimension(self, df_cad: pd.DataFrame) -> pd.DataFrame:
+        """Operator dimension indexed by REGISTRO_OPERADORA, with the CNPJ already normalized."""
+        key = CadastreDimension.KEY
+        if df_cad.index.name != key:
+            # Raw cadastre rows: STANDARDIZE KEYS and DEDUPLICATE CADASTRE
+            # Trade-off: If ID duplicates exist, keep the first one to avoid row explosion
+            df_cad = df_cad.assign(**{key: df_cad[key].str.strip()})
+            df_cad = df_cad.drop_duplicates(subset=[key]).set_index(key)
+        return df_cad.assign(CNPJ=self.normalize_cnpj(df_cad['CNPJ']))
+
+    @staticmethod
+    def normalize_cnpj(cnpj: pd.Series) -> pd.Series:
+        # 1. Convert to String
+        # 2. Remove ".0" if it exists (float artifact)
+        # 3. Fill "nan" strings back to real None (so we can filter them)
+        # 4. Pad with Zeros to ensure 14 digits (Fixes the Sul America bug)
+        cnpj = cnpj.astype(str).str.replace(r'\.0$', '', regex=True)
+        cnpj = cnpj.replace('nan', '') # Handle string 'nan'
+
+        # It turns "1685053000156" into "01685053000156"
+        mask_valid = cnpj.notna() & (cnpj != '')
+        cnpj[mask_valid] = cnpj[mask_valid].str.zfill(14)
+        return cnpj
@@ -1,76 +1,125 @@
 import logging
 import pandas as pd
 import os
-from src.utils.validators import validate_cnpj
+from typing import Dict, Iterable, Optional
+from src.services.validation_rules import RuleEngine
+from src.utils.columnar import is_columnar, read_frame, write_frame
+from src.utils.schema import expand, map_categories, to_centavos
 from src import config
+from src.utils.telemetry import instrumented
 
 logger = logging.getLogger(__name__)
 
 class DataValidator:
-    def __init__(self, output_dir=config.OUTPUT_DIR):
+    # Failed rules of each quarantined row (bitmask, see RuleEngine)
+    MASK_COLUMN = 'validation_mask'
+
+    def __init__(self, output_dir=config.OUTPUT_DIR, rules: Optional[RuleEngine] = None):
         self.output_dir = output_dir
+        self.rules = rules or RuleEngine()
+        self.last_rule_counts: Dict[str, int] = {}
 
     def validate_and_split(self, input_zip_path: str):
         """
         Reads the consolidated ZIP, validates business rules,
         and splits data into 'clean' and 'quarantine'.
+        A Parquet input produces a Parquet clean file (typed hand-off to the aggregator);
+        the quarantine is always a CSV, since it is meant for manual auditing.
         """
         logger.info(f"    Reading data from {input_zip_path}...")
+        columnar = is_columnar(input_zip_path)
         
         # Pandas can read directly from ZIP if it contains one CSV
         try:
-            df = pd.read_csv(input_zip_path, compression='zip', sep=config.CSV_SEP, encoding=config.CSV_ENCODING, dtype=str)
+            if columnar:
+                df = read_frame(input_zip_path)
+            else:
+                df = pd.read_csv(input_zip_path, compression='zip', sep=config.CSV_SEP, encoding=config.CSV_ENCODING, dtype=str)
         except Exception as e:
             logger.error(f"   [Error] Could not read ZIP file: {e}")
             return None
 
-        logger.info(f"    Validating {len(df)} rows...")
-        
-        # We strip '.0' in case pandas read it as a float initially
-        df['CNPJ'] = df['CNPJ'].fillna('').astype(str).str.replace('.0', '', regex=False).str.zfill(14)
+        clean_df, quarantine_df = self.validate_frame(df)
 
-        # Replace comma with dot (standardize)
-        df['ValorDespesas'] = df['ValorDespesas'].str.replace(',', '.', regex=False)
-        
-        # Convert to Number (Coerce errors to NaN, then fill with 0)
-        df['ValorDespesas'] = pd.to_numeric(df['ValorDespesas'], errors='coerce').fillna(0)
+        # --- SAVING ---
+        quarantine_path = self.save_quarantine(quarantine_df)
 
-        # --- RULES ---
-        
-        #  CNPJ Validation
-        valid_cnpj = df['CNPJ'].apply(validate_cnpj)
-        
-        # Razao Social (Cannot be Empty)
-        valid_razao = df['RazaoSocial'].notna() & (df['RazaoSocial'] != '')
-        
-        # Positive Values
-        valid_value = df['ValorDespesas'] > 0
+        if columnar:
+            clean_path = write_frame(clean_df, os.path.join(self.output_dir, config.CLEAN_FILE))
+        else:
+            clean_path = os.path.join(self.output_dir, 'data_clean.csv')
+            expand(clean_df).to_csv(clean_path, sep=config.CSV_SEP, index=False, encoding=config.CSV_ENCODING)
 
-        # --- FLAGGING ---
+        logger.info(f"   -> Clean Rows: {len(clean_df)} (Saved to {clean_path})")
         
-        df['validation_errors'] = ''
+        return clean_path, quarantine_path
+
+    @instrumented
+    def validate_frame(self, df: pd.DataFrame):
+        """
+        DataFrame-in/DataFrame-out version of validate_and_split (no file I/O).
+
+        Returns:
+            Tuple[pd.DataFrame, pd.DataFrame]: (clean, quarantine). The quarantine has the
+            'validation_mask' column, expanded to 'validation_errors' text by save_quarantine.
+        """
+        logger.info(f"    Validating {len(df)} rows...")
         
-        # It uses Vectorized operations (faster than loops) to mark errors
-        df.loc[~valid_cnpj, 'validation_errors'] += 'Invalid CNPJ; '
-        df.loc[~valid_razao, 'validation_errors'] += 'Missing Razao Social; '
-        df.loc[~valid_value, 'validation_errors'] += 'Non-Positive Value; '
+        # We strip '.0' in case pandas read it as a float initially (once per distinct CNPJ)
+        df['CNPJ'] = map_categories(
+            df['CNPJ'], lambda cnpj: cnpj.fillna('').astype(str).str.replace('.0', '', regex=False).str.zfill(14)
+        )
 
-        # Define "Clean" as having NO errors
-        df['is_valid'] = (df['validation_errors'] == '')
+        # Integer centavos (no-op for the compact frames): decimal comma, no thousands separator
+        # in the legacy CSV; malformed values become 0 and so fail the positive value rule below
+        df['ValorDespesas'], failed = to_centavos(df['ValorDespesas'], thousands=None)
+        df['ValorDespesas'] = df['ValorDespesas'].fillna(0)
+        if failed:
+            logger.warning(f"    {failed} values in ValorDespesas could not be parsed (set to 0).")
+
+        # --- RULES ---
+        # Every rule runs once as a vectorized mask; failures are kept as a bitmask per row
+        mask = self.rules.evaluate(df)
+        self.last_rule_counts = self.rules.counts(mask)
+        for name, count in self.last_rule_counts.items():
+            if count:
+                logger.info(f"    Rule '{name}': {count} rows failed.")
 
         # --- SPLITTING ---
-        clean_df = df[df['is_valid']].copy().drop(columns=['is_valid', 'validation_errors'])
-        quarantine_df = df[~df['is_valid']].copy().drop(columns=['is_valid'])
+        # Define "Clean" as having NO errors
+        is_valid = mask == 0
+        clean_df = df[is_valid].copy()
+        quarantine_df = df[~is_valid].copy()
+        quarantine_df[self.MASK_COLUMN] = mask[~is_valid]
 
-        # --- SAVING ---
-        clean_path = os.path.join(self.output_dir, 'data_clean.csv')
-        quarantine_path = os.path.join(self.output_dir, 'data_quarantine.csv')
+        logger.info(f"    Done. {len(clean_df)} clean rows, {len(quarantine_df)} in quarantine.")
+        return clean_df, quarantine_df
 
-        clean_df.to_csv(clean_path, sep=config.CSV_SEP, index=False, encoding=config.CSV_ENCODING)
+    @instrumented
+    def save_quarantine(self, quarantine_df: pd.DataFrame) -> str:
+        """The quarantine is always written (as CSV): it is the audit trail of the rejected rows."""
+        quarantine_path = os.path.join(self.output_dir, 'data_quarantine.csv')
+        quarantine_df = expand(self._with_reasons(quarantine_df))
         quarantine_df.to_csv(quarantine_path, sep=config.CSV_SEP, index=False, encoding=config.CSV_ENCODING)
-
-        logger.info(f"    Done.")
-        logger.info(f"   -> Clean Rows: {len(clean_df)} (Saved to {clean_path})")
         logger.info(f"   -> Quarantine Rows: {len(quarantine_df)} (Saved to {quarantine_path})")
-        
-        return clean_path, quarantine_path
\ No newline at end of file
+        return quarantine_path
+
+    @instrumented
+    def save_quarantine_partitions(self, frames: Iterable[pd.DataFrame]) -> str:
+        """Same file as save_quarantine, appended partition by partition (out-of-core mode)."""
+        quarantine_path = os.path.join(self.output_dir, 'data_quarantine.csv')
+        rows = 0
+        with open(quarantine_path, 'w', encoding=config.CSV_ENCODING, newline='') as f:
+            for position, quarantine_df in enumerate(frames):
+                expand(self._with_reasons(quarantine_df)).to_csv(f, sep=config.CSV_SEP, index=False, header=position == 0)
+                rows += len(quarantine_df)
+        logger.info(f"   -> Quarantine Rows: {rows} (Saved to {quarantine_path})")
+        return quarantine_path
+
+    def _with_reasons(self, quarantine_df: pd.DataFrame) -> pd.DataFrame:
+        if self.MASK_COLUMN in quarantine_df.columns:
+            # Reasons are only expanded to text here, for the rows being written
+            quarantine_df = quarantine_df.assign(
+                validation_errors=self.rules.reasons(quarantine_df[self.MASK_COLUMN])
+            ).drop(columns=[self.MASK_COLUMN])
+        return quarantine_df
@@ -0,0 +1,276 @@
+import argparse
+import logging
+import sys
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Union
+from sqlalchemy import Engine, bindparam, create_engine, delete, func, select, true, update
+from api import database
+from api.models import Despesa, Operadora, ResumoOperadora, ResumoUF
+from src.services.cadastre import CadastreDimension
+from src.services.data_enricher import DataEnricher
+from src.utils.schema import compact_facts, to_reais, to_reg_ans
+from src.utils.telemetry import instrumented
+from src import config
+
+logger = logging.getLogger(__name__)
+
+class DatabaseLoader:
+    """
+    Bulk loads dim_operadoras and fact_despesas_eventos (the tables of api/models.py) from
+    the pipeline output, with the same rules as sql/docker_import.sql: facts only for
+    operators of the cadastre.
+
+    Facts go in as multi-row INSERT batches (the driver's executemany), several batches at
+    a time over the connection pool, each one in its own transaction. The secondary indexes
+    of the fact table are dropped during the load and rebuilt once at the end, instead of
+    being maintained row by row (the index behind the foreign key stays: MySQL requires it).
+
+    Loading is idempotent per quarter: the fact rows of every DATA in the input are replaced,
+    other quarters are kept. Operators are upserted.
+
+    The summary tables read by /api/estatisticas (agg_despesas_operadora, agg_despesas_uf)
+    are refreshed at the end of each load, see refresh_summaries.
+    """
+
+    FACT_COLUMNS = ['DATA', 'REG_ANS', 'CD_CONTA_CONTABIL', 'ValorDespesas']
+    # Leaf accounts of the chart of accounts (the level the statistics add up)
+    LEAF_ACCOUNT_LENGTH = 9
+
+    def __init__(self, engine: Union[Engine, str, None] = None,
+                 batch_rows: int = config.DB_LOAD_BATCH_ROWS,
+                 workers: int = config.DB_LOAD_WORKERS):
+        """
+        Args:
+            engine: SQLAlchemy engine or URL (default: the API's engine, from DATABASE_URL).
+        """
+        if engine is None:
+            engine = database.engine
+        elif isinstance(engine, str):
+            engine = create_engine(engine)
+        self.engine = engine
+        self.batch_rows = batch_rows
+        # SQLite has a single writer: parallel batches would only wait on the file lock
+        self.workers = 1 if engine.dialect.name == 'sqlite' else max(workers, 1)
+        self.last_stats: Dict = {}
+        self.last_quarters: List = []
+
+    def create_tables(self) -> None:
+        database.Base.metadata.create_all(self.engine, tables=[Operadora.__table__, Despesa.__table__,
+                                                               ResumoOperadora.__table__, ResumoUF.__table__])
+
+    def load(self, dimension: pd.DataFrame, facts: Iterable[pd.DataFrame]) -> Dict:
+        """
+        Loads the operator dimension (CadastreDimension output) and the consolidated fact
+        frames (e.g. read_export). Returns the load statistics (also in `last_stats`).
+        """
+        start = time.perf_counter()
+        self.create_tables()
+        operators = self.load_operators(dimension)
+
+        deferred = self.deferred_indexes()
+        for index in deferred:
+            index.drop(self.engine, checkfirst=True)
+        try:
+            rows = self.load_facts(facts)
+        finally:
+            build_start = time.perf_counter()
+            for index in deferred:
+                index.create(self.engine, checkfirst=True)
+            index_s = time.perf_counter() - build_start
+        summary_s = self.refresh_summaries(self.last_quarters)
+
+        wall = time.perf_counter() - start
+        self.last_stats.update({'operators': operators, 'index_build_s': index_s, 'summary_s': summary_s,
+                                'wall_s': wall})
+        logger.info(f"    Indexes rebuilt in {index_s:.2f}s ({', '.join(index.name for index in deferred) or 'none'}).")
+        logger.info(f"    Database load: {operators} operators, {rows} expense rows in {wall:.2f}s.")
+        return self.last_stats
+
+    def deferred_indexes(self) -> List:
+        """Secondary indexes of the fact table that can be rebuilt after the load."""
+        return [index for index in Despesa.__table__.indexes
+                if not any(column.foreign_keys for column in index.columns)]
+
+    @instrumented
+    def load_operators(self, dimension: pd.DataFrame) -> int:
+        """Upserts the operators of the dimension (numeric REG_ANS, normalized CNPJ). Returns their count."""
+        dimension = CadastreDimension.by_number(dimension)
+        operators = pd.DataFrame({
+            'reg_ans': dimension.index.astype('str'),
+            'cnpj': DataEnricher.normalize_cnpj(dimension['CNPJ']).to_numpy(),
+            'razao_social': dimension['Razao_Social'].to_numpy(),
+            'uf': dimension['UF'].to_numpy(),
+            'modalidade': dimension['Modalidade'].to_numpy(),
+        })
+        records = self._records(operators)
+
+        table = Operadora.__table__
+        with self.engine.begin() as conn:
+            existing = set(conn.execute(select(table.c.reg_ans)).scalars())
+            new = [row for row in records if row['reg_ans'] not in existing]
+            changed = [{'key': row['reg_ans'], **row} for row in records if row['reg_ans'] in existing]
+            if new:
+                conn.execute(table.insert(), new)
+            if changed:
+                conn.execute(update(table).where(table.c.reg_ans == bindparam('key')),
+                             [{k: v for k, v in row.items() if k != 'reg_ans'} for row in changed])
+        logger.info(f"    Operators: {len(new)} inserted, {len(changed)} updated.")
+        return len(records)
+
+    @instrumented
+    def load_facts(self, frames: Iterable[pd.DataFrame]) -> int:
+        """
+        Inserts the consolidated rows frame by frame, in batches of `batch_rows` sent by
+        `workers` threads. The existing rows of each DATA are deleted the first time it shows up.
+        Returns the number of rows inserted.
+        """
+        table = Despesa.__table__
+        with self.engine.connect() as conn:
+            registered = pd.Series(list(conn.execute(select(Operadora.__table__.c.reg_ans)).scalars()), dtype='str')
+        operators = to_reg_ans(registered).dropna()
+
+        cleared: Set = set()
+        pending: List[Future] = []
+        inserted = skipped = 0
+        start = time.perf_counter()
+        pool = ThreadPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+
+        def settle(limit: int) -> None:
+            # Bounded in-flight batches: the frames are streamed, never all held at once
+            nonlocal inserted
+            while len(pending) > limit:
+                inserted += pending.pop(0).result()
+
+        try:
+            for df in frames:
+                facts = self._facts(df, operators)
+                skipped += len(df) - len(facts)
+
+                quarters = set(facts['data_trimestre'].unique()) - cleared
+                if quarters:
+                    settle(0)
+                    with self.engine.begin() as conn:
+                        removed = conn.execute(delete(table).where(table.c.data_trimestre.in_(quarters))).rowcount
+                    cleared |= quarters
+                    logger.info(f"    Replacing {len(quarters)} quarters ({removed} existing rows deleted).")
+
+                records = self._records(facts)
+                for position in range(0, len(records), self.batch_rows):
+                    batch = records[position:position + self.batch_rows]
+                    if pool is None:
+                        inserted += self._insert(batch)
+                    else:
+                        pending.append(pool.submit(self._insert, batch))
+                        settle(2 * self.workers)
+
+                elapsed = time.perf_counter() - start
+                logger.info(f"    Loaded {inserted} rows so far ({inserted / elapsed if elapsed else 0:,.0f} rows/s).")
+            settle(0)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        elapsed = time.perf_counter() - start
+        rate = inserted / elapsed if elapsed else 0.0
+        self.last_stats = {'rows': inserted, 'skipped_rows': skipped, 'load_s': elapsed, 'rows_per_s': rate,
+                           'batch_rows': self.batch_rows, 'workers': self.workers}
+        self.last_quarters = sorted(cleared)
+        logger.info(f"    Expenses: {inserted} rows in {elapsed:.2f}s ({rate:,.0f} rows/s, "
+                    f"{self.workers} workers); {skipped} rows without a known operator or date skipped.")
+        return inserted
+
+    @instrumented
+    def refresh_summaries(self, quarters: Optional[Iterable] = None) -> float:
+        """
+        Rebuilds the statistics summaries from the fact table, for the given quarters
+        (default: all of them). Returns the time it took, in seconds.
+
+        The per-operator totals are recomputed for those quarters only; the per-UF totals are
+        rebuilt whole from the per-operator ones (a few rows per operator and quarter), so
+        cadastre changes (UF, modalidade) reach every quarter.
+        """
+        start = time.perf_counter()
+        fact, operator = Despesa.__table__, Operadora.__table__
+        by_operator, by_uf = ResumoOperadora.__table__, ResumoUF.__table__
+        quarters = None if quarters is None else list(quarters)
+
+        # LENGTH, not CHAR_LENGTH (missing in SQLite): the account codes are ASCII digits
+        leaf = func.length(fact.c.conta_contabil) == self.LEAF_ACCOUNT_LENGTH
+        with self.engine.begin() as conn:
+            conn.execute(delete(by_operator).where(
+                true() if quarters is None else by_operator.c.data_trimestre.in_(quarters)))
+            conn.execute(by_operator.insert().from_select(
+                ['data_trimestre', 'reg_ans', 'total_despesas'],
+                select(fact.c.data_trimestre, fact.c.reg_ans, func.sum(fact.c.vl_saldo_final))
+                .where(leaf if quarters is None else leaf & fact.c.data_trimestre.in_(quarters))
+                .group_by(fact.c.data_trimestre, fact.c.reg_ans)))
+
+            conn.execute(delete(by_uf))
+            conn.execute(by_uf.insert().from_select(
+                ['data_trimestre', 'uf', 'modalidade', 'total_despesas', 'num_operadoras'],
+                select(by_operator.c.data_trimestre, operator.c.uf, operator.c.modalidade,
+                       func.sum(by_operator.c.total_despesas), func.count())
+                .select_from(by_operator.join(operator, by_operator.c.reg_ans == operator.c.reg_ans))
+                .group_by(by_operator.c.data_trimestre, operator.c.uf, operator.c.modalidade)))
+
+        elapsed = time.perf_counter() - start
+        scope = 'all' if quarters is None else len(quarters)
+        logger.info(f"    Statistics summaries refreshed in {elapsed:.2f}s (quarters: {scope}).")
+        return elapsed
+
+    def _insert(self, batch: List[Dict]) -> int:
+        with self.engine.begin() as conn:
+            conn.execute(Despesa.__table__.insert(), batch)
+        return len(batch)
+
+    def _facts(self, df: pd.DataFrame, operators: pd.Series) -> pd.DataFrame:
+        """Fact rows of a consolidated frame, as table columns (rows the table cannot hold are left out)."""
+        df = compact_facts(df[self.FACT_COLUMNS].copy())
+        dates = df['DATA'].cat.codes.to_numpy()
+        keep = ((dates >= 0) & df['REG_ANS'].isin(operators).to_numpy(dtype=bool)
+                & df['CD_CONTA_CONTABIL'].notna().to_numpy(dtype=bool))
+        df = df[keep]
+
+        # Python dates once per distinct DATA, then picked by code
+        day = np.asarray(df['DATA'].cat.categories.date, dtype=object)
+        return pd.DataFrame({
+            'data_trimestre': day[df['DATA'].cat.codes.to_numpy()],
+            'reg_ans': df['REG_ANS'].astype('str').to_numpy(),
+            'conta_contabil': df['CD_CONTA_CONTABIL'].astype('str').to_numpy(),
+            'vl_saldo_final': to_reais(df['ValorDespesas']).round(2).to_numpy(),
+        })
+
+    @staticmethod
+    def _records(df: pd.DataFrame) -> List[Dict]:
+        # Missing values as None (NULL); numpy scalars as Python ones (what the drivers expect)
+        return df.astype(object).where(df.notna(), None).to_dict('records')
+
+    @staticmethod
+    def read_export(path: str, chunk_rows: int = config.DB_LOAD_READ_ROWS) -> Iterator[pd.DataFrame]:
+        """Streams consolidado_despesas.zip (or .csv) in chunks of the fact columns."""
+        logger.info(f"    Reading {path} in chunks of {chunk_rows} rows...")
+        reader = pd.read_csv(path, sep=config.CSV_SEP, encoding=config.CSV_ENCODING, dtype=str,
+                             usecols=DatabaseLoader.FACT_COLUMNS, chunksize=chunk_rows)
+        with reader:
+            yield from reader
+
+def main(argv=None) -> int:
+    """
+    Migration/backfill of the statistics summaries on an existing database (the one of
+    DATABASE_URL, or --url): creates the missing tables and rebuilds every quarter.
+    """
+    parser = argparse.ArgumentParser(description="Create and rebuild the /api/estatisticas summary tables")
+    parser.add_argument('--url', help="Database URL (default: DATABASE_URL, as the API)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    loader = DatabaseLoader(args.url)
+    loader.create_tables()
+    loader.refresh_summaries()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+import json
+import logging
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+class FingerprintDeduplicator:
+    """
+    Drops repeated records by a 64-bit fingerprint of their composite key.
+
+    The key columns are hashed once per row; duplicates inside a batch and against every
+    batch seen before (kept as a sorted uint64 array, 8 bytes per distinct record) are
+    found from the fingerprints alone. With `seen_path` the seen-set survives between
+    runs, so a new quarter can be deduplicated against history without reloading it
+    (--incremental). The quarters it covers are saved next to it (`<seen_path>.json`).
+    """
+
+    KEY_COLUMNS = ['REG_ANS', 'DATA', 'CD_CONTA_CONTABIL', 'ValorDespesas', 'DESCRICAO']
+
+    def __init__(self, key_columns: Optional[List[str]] = None, seen_path: Optional[str] = None):
+        self.key_columns = key_columns or self.KEY_COLUMNS
+        self.seen_path = seen_path
+        self.seen = self._load_seen()
+        self.quarters: Set[str] = self._load_quarters()
+        self.last_stats: Dict = {}
+
+    def _load_seen(self) -> np.ndarray:
+        if self.seen_path and os.path.exists(self.seen_path):
+            try:
+                return np.load(self.seen_path)
+            except Exception as e:
+                logger.warning(f"Discarding unreadable seen-set {self.seen_path}: {e}")
+        return np.empty(0, dtype=np.uint64)
+
+    def _load_quarters(self) -> Set[str]:
+        if not len(self.seen):
+            return set()
+        try:
+            with open(f"{self.seen_path}.json", 'r', encoding='utf-8') as f:
+                return set(json.load(f)['quarters'])
+        except (OSError, ValueError, KeyError):
+            return set()
+
+    def forget(self, quarters: Iterable[str]) -> bool:
+        """
+        Clears the seen-set if it covers any of `quarters` (republished quarters are processed
+        again and must not be deduplicated against their own previous version; fingerprints
+        cannot be removed one quarter at a time). Returns True if it was cleared.
+        """
+        overlap = self.quarters & set(quarters)
+        if not overlap:
+            return False
+        logger.info(f"    Seen-set covers reprocessed quarters ({', '.join(sorted(overlap))}): starting a new one.")
+        self.seen = np.empty(0, dtype=np.uint64)
+        self.quarters = set()
+        return True
+
+    def save(self, quarters: Iterable[str] = ()) -> None:
+        """Persists the seen-set, now also covering `quarters` (no-op without seen_path)."""
+        self.quarters |= set(quarters)
+        if not self.seen_path:
+            return
+        os.makedirs(os.path.dirname(self.seen_path) or '.', exist_ok=True)
+        tmp_path = f"{self.seen_path}.tmp.npy"
+        np.save(tmp_path, self.seen)
+        os.replace(tmp_path, self.seen_path)
+        with open(f"{self.seen_path}.json.tmp", 'w', encoding='utf-8') as f:
+            json.dump({'quarters': sorted(self.quarters)}, f)
+        os.replace(f"{self.seen_path}.json.tmp", f"{self.seen_path}.json")
+
+    def fingerprint(self, df: pd.DataFrame) -> np.ndarray:
+        keys = df[self.key_columns]
+        # Text keys repeat a lot: as categoricals each distinct string is hashed once
+        # (pandas hashes categoricals by value, so the fingerprints are the same)
+        text = {col: 'category' for col in keys.columns
+                if keys[col].dtype == object or pd.api.types.is_string_dtype(keys[col])}
+        return pd.util.hash_pandas_object(keys.astype(text), index=False).to_numpy()
+
+    def deduplicate(self, df: pd.DataFrame, remember: bool = True) -> np.ndarray:
+        """
+        Returns the boolean mask of the rows to keep: the first occurrence of each key that
+        was not seen in a previous batch. Statistics of the pass go to `self.last_stats`.
+        With remember=True the kept keys join the seen-set (for the next chunk/partition).
+        """
+        fingerprints = self.fingerprint(df)
+        # Codes follow the order of first appearance, so a row is the first of its key
+        # exactly when its code is higher than every code before it
+        codes, uniques = pd.factorize(fingerprints)
+        first = codes > np.maximum.accumulate(np.concatenate(([-1], codes[:-1])))
+        counts = np.bincount(codes, minlength=len(uniques))
+
+        seen_before = np.zeros(len(uniques), dtype=bool)
+        if len(self.seen):
+            slots = np.searchsorted(self.seen, uniques).clip(max=len(self.seen) - 1)
+            seen_before = self.seen[slots] == uniques
+
+        keep = first & ~seen_before[codes]
+        repeated = counts > 1
+        self.last_stats = {
+            'rows': len(df),
+            'kept': int(np.count_nonzero(keep)),
+            'duplicate_rows': int(counts[repeated].sum()),  # every row of a repeated key
+            'duplicate_keys': int(np.count_nonzero(repeated)),
+            'dropped_in_batch': int(len(df) - len(uniques)),
+            # first occurrences whose key came in an earlier batch (rows = kept + both drops)
+            'dropped_seen_before': int(np.count_nonzero(seen_before)),
+            'sample_positions': np.flatnonzero(repeated[codes])[:5],
+        }
+
+        if remember:
+            # The new keys are distinct and not in the seen-set: a sorted insert (linear)
+            # instead of np.union1d, which re-deduplicates the whole set on every batch
+            new = np.sort(uniques[~seen_before])
+            self.seen = np.insert(self.seen, np.searchsorted(self.seen, new), new)
+        return keep
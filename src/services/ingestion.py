@@ -1,44 +1,193 @@
 import os
+import time
+import queue
 import logging
+import threading
 import pandas as pd
-from typing import List, Optional
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 from src.services.zip_processor import ZipProcessor
+from src.services.parse_cache import ParsedZipCache
+from src import config
+from src.utils.schema import concat_facts
+from src.utils.telemetry import instrumented
 
 logger = logging.getLogger(__name__)
 
+def _parse_zip(processor: ZipProcessor, zip_file: str) -> Optional[pd.DataFrame]:
+    """
+    Parses one ZIP and tags its rows with the source file (None if it could not be parsed;
+    an empty frame if no row matched the filter). Module-level so it can run inside a process pool worker.
+    """
+    df = processor.process_zip(zip_file)
+    if df is not None:
+        # Enrich with source metadata
+        df['SOURCE_FILE'] = pd.Series(os.path.basename(zip_file), index=df.index, dtype='category')
+    return df
+
 class IngestionService:
-    def __init__(self):
+    def __init__(self, cache: Optional[ParsedZipCache] = None, workers: int = config.INGEST_WORKERS):
         self.processor = ZipProcessor()
+        self.cache = cache
+        self.workers = workers
+        self.last_run_stats: Dict = {}
 
-    def ingest_from_files(self, file_paths: List[str]) -> Optional[pd.DataFrame]:
+    def _ingest_one(self, zip_file: str, pool: Optional[ProcessPoolExecutor] = None) -> Optional[pd.DataFrame]:
         """
-        Iterates over the provided ZIP paths, extracts the relevant CSV/XLSX data,
-        and aggregates them into a single DataFrame.
+        Processes a single ZIP (in `pool` when given). Unchanged ZIPs are served from the cache.
+        Errors are logged and isolated to that file.
         """
-        all_data = []
-        logger.info(f"Starting ingestion for {len(file_paths)} files.")
+        logger.info(f"Processing: {zip_file}")
+        try:
+            key = self.cache.key_for(zip_file, self.processor.filter_config()) if self.cache else None
+            df = self.cache.get(key) if key else None
 
-        for zip_file in file_paths:
-            logger.info(f"Processing: {zip_file}")
-            try:
-                df = self.processor.process_zip(zip_file)
-                
-                if df is not None and not df.empty:
-                    # Enrich with source metadata
-                    df['SOURCE_FILE'] = os.path.basename(zip_file)
-                    all_data.append(df)
-            except Exception as e:
-                logger.error(f"Failed to ingest {zip_file}: {e}")
-                continue
-        
+            if df is not None:
+                logger.info(f"Cache hit for {os.path.basename(zip_file)} ({len(df)} rows).")
+                # The same content may come under another name
+                df['SOURCE_FILE'] = pd.Series(os.path.basename(zip_file), index=df.index, dtype='category')
+                return df if not df.empty else None
+
+            if pool is not None:
+                df = pool.submit(_parse_zip, self.processor, zip_file).result()
+            else:
+                df = _parse_zip(self.processor, zip_file)
+
+            # Empty results are cached too: a ZIP without matching rows is not re-parsed every run
+            if key and df is not None:
+                self.cache.put(key, df)
+            return df if df is not None and not df.empty else None
+        except Exception as e:
+            logger.error(f"Failed to ingest {zip_file}: {e}")
+        return None
+
+    def _concat(self, all_data: List[pd.DataFrame]) -> Optional[pd.DataFrame]:
         if not all_data:
             logger.warning("No data ingested from any available file.")
             return None
-            
+
         logger.info(f"Aggregating {len(all_data)} DataFrames.")
         try:
-            full_df = pd.concat(all_data, ignore_index=True)
+            full_df = concat_facts(all_data)
             return full_df
         except Exception as e:
             logger.error(f"Failed to concatenate DataFrames: {e}")
             return None
+
+    @instrumented
+    def ingest_each(self, file_paths: List[str]) -> List[Optional[pd.DataFrame]]:
+        """
+        Ingests every ZIP and returns one DataFrame (or None on failure) per path, in path order.
+        With workers > 1 the parsing runs in a process pool (one ZIP per worker).
+        """
+        if self.workers > 1 and len(file_paths) > 1:
+            workers = min(self.workers, len(file_paths))
+            logger.info(f"Parsing {len(file_paths)} files with {workers} worker processes.")
+            # Threads only wait on the process futures (and do the cache lookups)
+            with ProcessPoolExecutor(max_workers=workers) as pool, ThreadPoolExecutor(max_workers=workers) as threads:
+                return list(threads.map(lambda path: self._ingest_one(path, pool), file_paths))
+
+        return [self._ingest_one(zip_file) for zip_file in file_paths]
+
+    def ingest_from_files(self, file_paths: List[str]) -> Optional[pd.DataFrame]:
+        """
+        Iterates over the provided ZIP paths, extracts the relevant CSV/XLSX data,
+        and aggregates them into a single DataFrame.
+        """
+        logger.info(f"Starting ingestion for {len(file_paths)} files.")
+
+        all_data = [df for df in self.ingest_each(file_paths) if df is not None]
+        return self._concat(all_data)
+
+    @instrumented
+    def ingest_overlapped(self, downloads: Iterable[Tuple[int, Optional[str], float]],
+                          queue_size: int = config.PIPELINE_QUEUE_SIZE,
+                          parse_workers: int = config.PIPELINE_PARSE_WORKERS,
+                          on_result: Optional[Callable[[int, pd.DataFrame], None]] = None,
+                          collect: bool = True) -> Optional[pd.DataFrame]:
+        """
+        Producer/consumer ingestion: parses each ZIP as soon as its download finishes.
+
+        A producer thread drains `downloads` (e.g. AnsDataClient.iter_downloads) into a bounded
+        queue, so at most `queue_size` finished files wait for a parse worker. The final
+        DataFrame keeps the original item order, whatever the completion order was.
+        `on_result(index, df)` is called from the parse worker for every file that yielded data;
+        with collect=False the frames are only handed to it and nothing is returned.
+        Timings per stage are stored in `self.last_run_stats`.
+        """
+        # With worker processes, each parse thread drives one process
+        pool = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        parse_workers = max(parse_workers, self.workers)
+
+        work_queue = queue.Queue(maxsize=queue_size)
+        results: Dict[int, pd.DataFrame] = {}
+        download_times: List[float] = []
+        parse_times: List[float] = []
+        lock = threading.Lock()
+        start = time.perf_counter()
+
+        def producer():
+            try:
+                for index, path, elapsed in downloads:
+                    download_times.append(elapsed)
+                    if path:
+                        work_queue.put((index, path))
+            except Exception as e:
+                logger.error(f"Download stage failed: {e}")
+            finally:
+                self.last_run_stats['download_wall'] = time.perf_counter() - start
+                for _ in range(parse_workers):
+                    work_queue.put(None)
+
+        def consumer():
+            while True:
+                item = work_queue.get()
+                if item is None:
+                    break
+                index, path = item
+                parse_start = time.perf_counter()
+                df = self._ingest_one(path, pool)
+                if df is not None and on_result:
+                    try:
+                        on_result(index, df)
+                    except Exception as e:
+                        # Never let a hook kill the worker (the producer would block forever)
+                        logger.error(f"Result hook failed for {path}: {e}")
+                with lock:
+                    parse_times.append(time.perf_counter() - parse_start)
+                    if df is not None and collect:
+                        results[index] = df
+
+        self.last_run_stats = {}
+        threads = [threading.Thread(target=producer, name="ingest-producer")]
+        threads += [threading.Thread(target=consumer, name=f"ingest-parser-{i}") for i in range(parse_workers)]
+        try:
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        wall = time.perf_counter() - start
+        parse_total = sum(parse_times)
+        sequential = self.last_run_stats['download_wall'] + parse_total
+        self.last_run_stats.update({
+            'files': len(download_times),
+            'download_total': sum(download_times),
+            'parse_total': parse_total,
+            'wall': wall,
+            'sequential_estimate': sequential,
+            'saved': max(sequential - wall, 0.0),
+        })
+
+        stats = self.last_run_stats
+        logger.info("   --- Overlapped ingestion timings ---")
+        logger.info(f"    Download stage: {stats['download_wall']:.2f}s wall ({stats['download_total']:.2f}s across {stats['files']} files)")
+        logger.info(f"    Parse stage:    {stats['parse_total']:.2f}s")
+        logger.info(f"    Total wall:     {stats['wall']:.2f}s vs {stats['sequential_estimate']:.2f}s sequential (saved {stats['saved']:.2f}s)")
+
+        if not collect:
+            return None
+        return self._concat([results[i] for i in sorted(results)])
@@ -0,0 +1,83 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date
+from typing import Callable, Dict, List, Optional
+
+from src import config
+
+logger = logging.getLogger(__name__)
+
+class ListingManifest:
+    """
+    Local cache of the ANS directory listings, one entry per folder URL.
+
+    Each entry remembers when it was fetched and whether its folder is closed:
+    closed years are kept for a long time, while the root listing and the
+    current (still growing) year are rechecked on a short TTL.
+    """
+
+    def __init__(self, path: str, closed_ttl: int = config.LISTING_TTL_CLOSED,
+                 open_ttl: int = config.LISTING_TTL_OPEN, today: Callable[[], date] = date.today):
+        """
+        Args:
+            today: Clock used to tell closed years apart (injectable for tests).
+        """
+        self.path = path
+        self.closed_ttl = closed_ttl
+        self.open_ttl = open_ttl
+        self.today = today
+        self._lock = threading.Lock()
+        self._folders = self._load()
+        self._dirty = False
+
+    def _load(self) -> Dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('folders', {})
+        except (OSError, ValueError):
+            return {}
+
+    def is_closed_year(self, year: int, files: List[Dict]) -> bool:
+        """
+        A year is closed once all 4 quarters are published, or once it is older than last year
+        (Q4 of year N is only published during year N+1).
+        """
+        quarters = {f['quarter'] for f in files}
+        return len(quarters) == 4 or year < self.today().year - 1
+
+    def get(self, url: str) -> Optional[List]:
+        """Returns the cached listing of a folder, or None if missing/expired."""
+        with self._lock:
+            entry = self._folders.get(url)
+        if entry is None:
+            return None
+        ttl = self.closed_ttl if entry['closed'] else self.open_ttl
+        if time.time() - entry['fetched_at'] > ttl:
+            return None
+        return entry['entries']
+
+    def put(self, url: str, entries: List, closed: bool = False) -> None:
+        with self._lock:
+            self._folders[url] = {
+                'fetched_at': time.time(),
+                'closed': closed,
+                'entries': entries,
+            }
+            self._dirty = True
+
+    def save(self) -> None:
+        """Writes the manifest atomically (only if something changed)."""
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'folders': self._folders}, f, indent=2)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+            except OSError as e:
+                logger.warning(f"Could not save listing manifest {self.path}: {e}")
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import pandas as pd
+from typing import Dict, Optional
+from src.utils.schema import compact_facts
+from src import config
+
+logger = logging.getLogger(__name__)
+
+class ParsedZipCache:
+    """
+    Parquet cache of ZipProcessor results (the filtered, typed DataFrame of each ZIP).
+
+    The key is the SHA-256 of the ZIP content plus a hash of the filter config, so an
+    unchanged ZIP is parsed only once and changing the filter invalidates its entries.
+    Entries are evicted by age and by total size, least recently used first.
+    """
+
+    HASHES_FILE = "hashes.json"
+
+    def __init__(self, cache_dir: str = config.PARSE_CACHE_DIR,
+                 max_bytes: int = config.PARSE_CACHE_MAX_BYTES,
+                 max_age_days: float = config.PARSE_CACHE_MAX_AGE_DAYS):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._hashes = self._load_hashes()
+
+    def _load_hashes(self) -> Dict:
+        try:
+            with open(os.path.join(self.cache_dir, self.HASHES_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_hashes(self) -> None:
+        path = os.path.join(self.cache_dir, self.HASHES_FILE)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(self._hashes, f)
+        os.replace(f"{path}.tmp", path)
+
+    def file_hash(self, path: str) -> str:
+        """
+        SHA-256 of the file content. The digest is memoized by (path, size, mtime),
+        so unchanged files are not re-read on every run.
+        """
+        stat = os.stat(path)
+        signature = f"{stat.st_size}:{stat.st_mtime_ns}"
+        abs_path = os.path.abspath(path)
+
+        with self._lock:
+            memo = self._hashes.get(abs_path)
+        if memo and memo['signature'] == signature:
+            return memo['sha256']
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+
+        with self._lock:
+            self._hashes[abs_path] = {'signature': signature, 'sha256': digest.hexdigest()}
+            self._save_hashes()
+        return digest.hexdigest()
+
+    def key_for(self, zip_path: str, filter_config: Dict) -> str:
+        config_hash = hashlib.sha256(json.dumps(filter_config, sort_keys=True).encode('utf-8')).hexdigest()
+        return f"{self.file_hash(zip_path)[:32]}-{config_hash[:16]}"
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        path = self._entry_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            df = pd.read_parquet(path)
+            # Touch: eviction is least recently used first
+            os.utime(path)
+            # Parquet has no categorical of dates: DATA comes back as plain datetimes
+            return compact_facts(df)
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cache entry {key}: {e}")
+            os.remove(path)
+            return None
+
+    def put(self, key: str, df: pd.DataFrame) -> None:
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            df.to_parquet(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Could not cache parsed result {key}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        """Drops entries older than max_age_days, then the least recently used until under max_bytes."""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.parquet'):
+                    path = os.path.join(self.cache_dir, name)
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+            now = time.time()
+            max_age = self.max_age_days * 24 * 3600
+            total = sum(size for _, size, _ in entries)
+
+            for mtime, size, path in sorted(entries):
+                if now - mtime > max_age or total > self.max_bytes:
+                    os.remove(path)
+                    total -= size
+                    logger.info(f"Evicted cache entry {os.path.basename(path)}.")
@@ -0,0 +1,165 @@
+import logging
+import os
+import resource
+import shutil
+import tempfile
+import pandas as pd
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from src.services.aggregation_cube import AggregationCube
+from src.services.data_aggregator import DataAggregator
+from src.services.data_consolidator import DataConsolidator
+from src.services.data_enricher import DataEnricher
+from src.services.data_validator import DataValidator
+from src.services.deduplicator import FingerprintDeduplicator
+from src.utils.columnar import read_frame, write_frame
+from src.utils.schema import expand
+from src.utils.telemetry import current_rss
+from src import config
+
+logger = logging.getLogger(__name__)
+
+class SpilledFrames:
+    """
+    Frames of one stage output written to disk in order. The dtypes of every frame are
+    remembered, so reading them back can promote each column the way pd.concat of all the
+    frames would have (e.g. 'Ano' becomes float everywhere if any slice had a missing date).
+    """
+
+    def __init__(self, directory: str, name: str):
+        self.directory = directory
+        self.name = name
+        self.paths: List[str] = []
+        self.templates: List[pd.DataFrame] = []
+
+    def append(self, df: pd.DataFrame) -> None:
+        self.templates.append(df.head(0))
+        if not df.empty:
+            path = os.path.join(self.directory, f"{self.name}-{len(self.paths):05d}.parquet")
+            self.paths.append(write_frame(df, path))
+
+    def dtypes(self) -> pd.Series:
+        return pd.concat(self.templates).dtypes
+
+    def frames(self) -> Iterator[pd.DataFrame]:
+        """Yields the frames one at a time with the common dtypes (an empty frame if all were empty)."""
+        dtypes = self.dtypes()
+        if not self.paths:
+            yield pd.concat(self.templates)
+            return
+        for path in self.paths:
+            yield read_frame(path).astype(dtypes)
+
+class PartitionedPipeline:
+    """
+    Out-of-core execution of consolidate -> enrich -> validate -> aggregate under a memory budget.
+
+    Quarters are read one at a time (from the QuarterStore) and cut into row slices sized so a
+    slice's working set fits the budget. The stages are row-local except two, which carry
+    small state across slices: the deduplicator keeps its seen-set of fingerprints (so the
+    first occurrence of a key wins, as in one pass), and the aggregation keeps one partials
+    cube per quarter. Stage outputs are spilled to Parquet and the exports are streamed from
+    the spill at the end, so the files match the in-memory run: same rows, order and text.
+
+    A quarter is the largest unit held at once (it is ingested and loaded whole): peak memory
+    is the biggest quarter plus one slice's working set, whatever the number of quarters in
+    the window. The budget only bounds the slices; see check_budget.
+    """
+
+    def __init__(self, memory_budget: int, output_dir: str = config.OUTPUT_DIR,
+                 spill_dir: str = config.SPILL_DIR,
+                 working_factor: float = config.PARTITION_WORKING_FACTOR,
+                 min_rows: int = config.MIN_PARTITION_ROWS):
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.working_factor = working_factor
+        self.min_rows = min_rows
+        self.consolidator = DataConsolidator(output_dir, deduplicator=FingerprintDeduplicator())
+        self.enricher = DataEnricher(output_dir)
+        self.validator = DataValidator(output_dir=output_dir)
+        self.aggregator = DataAggregator(output_dir)
+        self.last_stats = {}
+
+    def check_budget(self, quarter_bytes: Dict[str, Optional[int]]) -> bool:
+        """
+        Checks, before processing, that the largest quarter (estimated in-memory bytes by key)
+        leaves room for slices under the budget. Logs what the peak will be when it does not.
+        """
+        sizes = {key: size for key, size in quarter_bytes.items() if size}
+        if not sizes:
+            return True
+        largest = max(sizes, key=sizes.get)
+        available = self.memory_budget - (current_rss() or 0)
+        if sizes[largest] < available:
+            return True
+        logger.warning(f"    Quarter {largest} alone takes ~{sizes[largest] / 1024 ** 2:,.0f} MiB in memory, more than "
+                       f"the {available / 1024 ** 2:,.0f} MiB left of the budget: quarters are loaded whole, so peak "
+                       f"RSS will be about the largest quarter + one slice of {self.min_rows} rows, above the budget.")
+        return False
+
+    def slice_rows(self, df: pd.DataFrame) -> int:
+        """Rows per slice: what is left of the budget (the quarter is already loaded) over the working set of a row."""
+        row_bytes = max(df.memory_usage(deep=True).sum() / max(len(df), 1), 1.0)
+        available = self.memory_budget - (current_rss() or 0)
+        rows = int(available / (row_bytes * self.working_factor))
+        if rows < self.min_rows:
+            logger.warning(f"    Memory budget nearly exhausted ({available / 1024 ** 2:,.0f} MiB left): "
+                           f"using the minimum slice of {self.min_rows} rows.")
+            return self.min_rows
+        return rows
+
+    def run(self, partitions: Iterable[Tuple[str, pd.DataFrame]], dimension: pd.DataFrame) -> Optional[pd.DataFrame]:
+        """
+        Processes the quarters of `partitions` ((key, ingested DataFrame), in window order)
+        and writes the same exports as the in-memory pipeline. Returns the summary table,
+        or None when no rows came in.
+        """
+        os.makedirs(self.spill_dir, exist_ok=True)
+        spill = tempfile.mkdtemp(prefix="run-", dir=self.spill_dir)
+        consolidated = SpilledFrames(spill, "consolidated")
+        quarantine = SpilledFrames(spill, "quarantine")
+        cubes: List[AggregationCube] = []
+        rows = slices = 0
+
+        try:
+            for key, quarter in partitions:
+                step = self.slice_rows(quarter)
+                logger.info(f"\n--- Partition {key}: {len(quarter)} rows, slices of {step} ---")
+                clean = SpilledFrames(spill, f"clean-{key}")
+
+                for start in range(0, len(quarter), step):
+                    consolidated_df = self.consolidator.consolidate_frame(quarter.iloc[start:start + step])
+                    # Export representation: dtypes a concat of all slices can promote (no per-slice categories)
+                    consolidated.append(expand(consolidated_df))
+                    enriched_df = self.enricher.enrich_frame(consolidated_df, dimension)
+                    del consolidated_df
+                    clean_df, quarantine_df = self.validator.validate_frame(enriched_df)
+                    del enriched_df
+                    quarantine.append(expand(quarantine_df))
+                    # Only the cube inputs of the clean rows are kept until the quarter is done
+                    clean.append(clean_df[DataAggregator.INPUT_COLUMNS])
+                    del clean_df, quarantine_df
+                    slices += 1
+
+                rows += len(quarter)
+                del quarter
+                # One cube per quarter: a (operator, DATA) group never spans two cubes
+                if clean.paths:
+                    cubes.append(self.aggregator.partials(pd.concat(clean.frames(), ignore_index=True)))
+
+            if not rows:
+                logger.error("No data available after ingestion. Aborting.")
+                return None
+
+            logger.info("\n--- Exports (streamed from the spill) ---")
+            export = self.consolidator.export_partitions(consolidated.frames())
+            self.validator.save_quarantine_partitions(quarantine.frames())
+            summary = self.aggregator.aggregate_cube(AggregationCube.combine(cubes))
+            self.aggregator.export(summary)
+        finally:
+            shutil.rmtree(spill, ignore_errors=True)
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        self.last_stats = {'rows': rows, 'slices': slices, 'peak_rss_bytes': peak, 'export': export}
+        logger.info(f"    Out-of-core run: {rows} rows in {slices} slices, peak RSS {peak / 1024 ** 2:,.0f} MiB "
+                    f"(budget {self.memory_budget / 1024 ** 2:,.0f} MiB).")
+        return summary
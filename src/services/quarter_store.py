@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+import threading
+import pandas as pd
+import pyarrow.parquet as pq
+from typing import Dict, Optional
+from src.utils.columnar import COLUMNAR_EXTENSION, is_columnar, read_frame, write_frame
+from src.utils.schema import SCHEMA_VERSION, compact_facts
+from src import config
+
+logger = logging.getLogger(__name__)
+
+class QuarterStore:
+    """
+    Keeps the ingested (filtered + typed) DataFrame of every processed quarter on disk.
+
+    Entries are keyed by year/quarter and remember the listing metadata of the source ZIP
+    (filename, size, date), so a quarter is only reprocessed when ANS republishes it.
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, store_dir: str = config.QUARTER_STORE_DIR):
+        self.store_dir = store_dir
+        self._lock = threading.Lock()
+        self._index = self._load_index()
+
+    @staticmethod
+    def key(item: Dict) -> str:
+        return f"{item['year']}Q{item['quarter']}"
+
+    def _load_index(self) -> Dict:
+        try:
+            with open(os.path.join(self.store_dir, self.INDEX_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self) -> None:
+        path = os.path.join(self.store_dir, self.INDEX_FILE)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(self._index, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    def has(self, item: Dict) -> bool:
+        """True if the quarter was processed from the same source file (same name/size/date) and schema."""
+        entry = self._index.get(self.key(item))
+        if not entry or entry['filename'] != item['filename']:
+            return False
+        if not is_columnar(entry['file']):  # pickled by an older version
+            return False
+        if entry.get('schema') != SCHEMA_VERSION:
+            return False
+        for field in ('size', 'modified'):
+            # Only compare what both listings know about
+            if entry.get(field) and item.get(field) and entry[field] != item[field]:
+                return False
+        return os.path.exists(os.path.join(self.store_dir, entry['file']))
+
+    def load(self, item: Dict) -> Optional[pd.DataFrame]:
+        entry = self._index.get(self.key(item))
+        try:
+            # Parquet has no categorical of dates: DATA comes back as plain datetimes
+            return compact_facts(read_frame(os.path.join(self.store_dir, entry['file'])))
+        except Exception as e:
+            logger.error(f"Failed to load stored quarter {self.key(item)}: {e}")
+            return None
+
+    def memory_estimate(self, item: Dict) -> Optional[int]:
+        """Uncompressed size of a stored quarter, from the Parquet metadata (a lower bound of its in-memory size)."""
+        entry = self._index.get(self.key(item))
+        try:
+            metadata = pq.ParquetFile(os.path.join(self.store_dir, entry['file'])).metadata
+            return sum(metadata.row_group(i).total_byte_size for i in range(metadata.num_row_groups))
+        except Exception as e:
+            logger.warning(f"Could not read the size of stored quarter {self.key(item)}: {e}")
+            return None
+
+    def save(self, item: Dict, df: pd.DataFrame) -> None:
+        key = self.key(item)
+        filename = f"{key}{COLUMNAR_EXTENSION}"
+        # Atomic like the index: a crash never leaves a partial quarter behind a valid entry
+        os.makedirs(self.store_dir, exist_ok=True)
+        write_frame(df, os.path.join(self.store_dir, filename))
+
+        with self._lock:
+            self._index[key] = {
+                'filename': item['filename'],
+                'size': item.get('size'),
+                'modified': item.get('modified'),
+                'file': filename,
+                'rows': len(df),
+                'schema': SCHEMA_VERSION,
+            }
+            self._save_index()
+        logger.info(f"Stored quarter {key} ({len(df)} rows).")
@@ -0,0 +1,85 @@
+import logging
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, List, Optional
+from src.utils.validators import validate_cnpj_series
+
+logger = logging.getLogger(__name__)
+
+# A check receives the whole DataFrame and returns a boolean Series: True = row passes
+RuleCheck = Callable[[pd.DataFrame], pd.Series]
+
+
+class ValidationRule:
+    def __init__(self, name: str, reason: str, check: RuleCheck):
+        self.name = name
+        self.reason = reason
+        self.check = check
+
+
+class RuleEngine:
+    """
+    Evaluates the registered rules as vectorized masks and records the failures of each row
+    as an integer bitmask (bit i = rule i failed; 0 = clean row).
+
+    The bitmask is all the state kept per row: counts per rule are read from it and the
+    human-readable reasons are only built for the rows that end up in quarantine.
+    """
+
+    MAX_RULES = 64
+
+    def __init__(self, rules: Optional[List[ValidationRule]] = None):
+        self.rules: List[ValidationRule] = []
+        for rule in rules if rules is not None else default_rules():
+            self.register(rule)
+
+    def register(self, rule: ValidationRule) -> None:
+        if len(self.rules) >= self.MAX_RULES:
+            raise ValueError(f"At most {self.MAX_RULES} rules are supported.")
+        if any(r.name == rule.name for r in self.rules):
+            raise ValueError(f"Rule '{rule.name}' is already registered.")
+        self.rules.append(rule)
+
+    def _mask_dtype(self) -> np.dtype:
+        for dtype in (np.uint8, np.uint16, np.uint32):
+            if len(self.rules) <= np.iinfo(dtype).bits:
+                return np.dtype(dtype)
+        return np.dtype(np.uint64)
+
+    def evaluate(self, df: pd.DataFrame) -> np.ndarray:
+        """Runs every rule once over the whole frame. Returns one bitmask per row."""
+        dtype = self._mask_dtype()
+        mask = np.zeros(len(df), dtype=dtype)
+        for bit, rule in enumerate(self.rules):
+            passed = np.asarray(rule.check(df), dtype=bool)
+            mask[~passed] |= dtype.type(1 << bit)
+        return mask
+
+    def counts(self, mask: np.ndarray) -> Dict[str, int]:
+        """Failed rows per rule, straight from the bitmask."""
+        return {
+            rule.name: int(np.count_nonzero(mask & mask.dtype.type(1 << bit)))
+            for bit, rule in enumerate(self.rules)
+        }
+
+    def reasons(self, mask: pd.Series) -> pd.Series:
+        """
+        Expands bitmasks into 'Reason A; Reason B; ' text. Only the distinct bit
+        combinations are expanded (there are few), then mapped back to the rows.
+        """
+        labels = {}
+        for value in pd.unique(mask):
+            labels[value] = ''.join(
+                f"{rule.reason}; " for bit, rule in enumerate(self.rules) if int(value) >> bit & 1
+            )
+        return mask.map(labels)
+
+
+def default_rules() -> List[ValidationRule]:
+    """Business rules of the validation stage (the CNPJ and values must be normalized first)."""
+    return [
+        ValidationRule('cnpj', 'Invalid CNPJ', lambda df: validate_cnpj_series(df['CNPJ'])),
+        ValidationRule('razao_social', 'Missing Razao Social',
+                       lambda df: df['RazaoSocial'].notna() & (df['RazaoSocial'] != '')),
+        ValidationRule('positive_value', 'Non-Positive Value', lambda df: df['ValorDespesas'] > 0),
+    ]
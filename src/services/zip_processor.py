@@ -2,14 +2,32 @@ import logging
 import zipfile
 import os
 import pandas as pd
-from typing import List, Optional
+from typing import Dict, List, Optional
 from src import config
+from src.utils.schema import SCHEMA_VERSION, compact_facts
+from src.utils.telemetry import instrumented
 
 logger = logging.getLogger(__name__)
 
 class ZipProcessor:
     """Processes ZIP files containing CSV data using in-memory extraction."""
 
+    def __init__(self, streaming: bool = config.ZIP_STREAMING, chunksize: int = config.ZIP_CHUNK_ROWS,
+                 columns: Optional[List[str]] = None):
+        self.streaming = streaming
+        self.chunksize = chunksize
+        self.columns = columns or config.INGEST_COLUMNS
+
+    def filter_config(self) -> Dict:
+        """Everything that changes the output of process_zip (used as part of cache keys)."""
+        return {
+            'description': config.TARGET_EXPENSE_DESCRIPTION,
+            'columns': self.columns if self.streaming else None,
+            'sep': config.CSV_SEP,
+            'encoding': config.CSV_ENCODING,
+            'schema': SCHEMA_VERSION,
+        }
+
     def inspect_zip(self, zip_path: str) -> List[str]:
         """
         Opens a ZIP file (read-only) and returns a list of filenames inside it.
@@ -51,10 +69,7 @@ class ZipProcessor:
                         df_filtered = df[mask].copy()
 
 
-                    numeric_cols = ['VL_SALDO_INICIAL', 'VL_SALDO_FINAL']
-                    for col in numeric_cols:
-                        if col in df_filtered.columns:
-                            df_filtered[col] = df_filtered[col].apply(self._to_float)
+                    compact_facts(df_filtered, thousands='.')
                     
                     logger.info(f"Filtered: {len(df_filtered)} rows match '{target_pattern}'.")
                     return df_filtered
@@ -63,20 +78,54 @@ class ZipProcessor:
             logger.error(f"Error reading {target_filename}: {e}")
             return None
 
-    def _to_float(self, val):
+    def stream_csv_from_zip(self, zip_path: str, target_filename: str) -> Optional[pd.DataFrame]:
         """
-        Helper: Converte string '1.000,00' para float 1000.00
+        Streaming variant of read_csv_from_zip.
+        Reads the ZIP member in chunks of `chunksize` rows, only the needed columns, and keeps
+        only the rows matching the target description from each chunk. Peak memory tracks the
+        filtered output instead of the raw file.
         """
-        if isinstance(val, str):
-            # Remove thousands separator and replace decimal comma with point
-            # E.g.: '1.234,56' -> '1234.56'
-            clean_val = val.replace('.', '').replace(',', '.')
-            try:
-                return float(clean_val)
-            except ValueError:
-                return 0.0
-        return val
+        target_pattern = config.TARGET_EXPENSE_DESCRIPTION
+        wanted = set(self.columns)
+
+        try:
+            with zipfile.ZipFile(zip_path, 'r') as z:
+                with z.open(target_filename) as f:
+                    logger.info(f"Streaming {target_filename} (chunks of {self.chunksize} rows)...")
+
+                    reader = pd.read_csv(
+                        f, encoding=config.CSV_ENCODING, sep=config.CSV_SEP, dtype=str,
+                        usecols=lambda col: col in wanted, chunksize=self.chunksize
+                    )
+
+                    kept = []
+                    total_rows = 0
+                    for chunk in reader:
+                        if 'DESCRICAO' not in chunk.columns:
+                            logger.error(f"Error reading {target_filename}: column DESCRICAO not found.")
+                            return None
+
+                        total_rows += len(chunk)
+                        description = chunk['DESCRICAO'].str.strip()
+                        mask = description.str.contains(target_pattern, case=False, na=False, regex=False)
+
+                        if mask.any():
+                            matched = chunk[mask].copy()
+                            matched['DESCRICAO'] = description[mask]
+                            kept.append(matched)
+
+            # Chunk indexes continue across chunks, so this matches the eager reader's index
+            df_filtered = pd.concat(kept) if kept else pd.DataFrame(columns=list(self.columns))
+            compact_facts(df_filtered, thousands='.')
+
+            logger.info(f"Filtered: {len(df_filtered)} of {total_rows} rows match '{target_pattern}'.")
+            return df_filtered
+
+        except Exception as e:
+            logger.error(f"Error reading {target_filename}: {e}")
+            return None
 
+    @instrumented
     def process_zip(self, zip_path: str) -> Optional[pd.DataFrame]:
         """
         Orchestrator wrapper:
@@ -93,4 +142,6 @@ class ZipProcessor:
             logger.warning(f"No suitable CSV/XLSX found in {zip_path}")
             return None
         
+        if self.streaming and target_file.lower().endswith('.csv'):
+            return self.stream_csv_from_zip(zip_path, target_file)
         return self.read_csv_from_zip(zip_path, target_file)
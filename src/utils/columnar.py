@@ -0,0 +1,32 @@
+import os
+from typing import List, Optional
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+# Typed columnar format used for the hand-offs between pipeline stages.
+# CSV/ZIP is only written for the final exports.
+COLUMNAR_EXTENSION = '.parquet'
+
+
+def is_columnar(path: str) -> bool:
+    return str(path).lower().endswith(COLUMNAR_EXTENSION)
+
+
+def write_frame(df: pd.DataFrame, path: str) -> str:
+    """Writes a stage output as Parquet (atomically: readers never see a partial file)."""
+    tmp_path = f"{path}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_frame(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Reads a stage output with column projection: only the requested columns are
+    decoded from disk. Requested columns missing from the file are ignored.
+    """
+    if columns is not None:
+        available = set(pq.read_schema(path).names)
+        columns = [c for c in columns if c in available]
+    return pd.read_parquet(path, columns=columns)
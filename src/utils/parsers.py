@@ -0,0 +1,87 @@
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# sign, integer digits, fraction digits (after the separators were normalized)
+_DECIMAL_PARTS = r'^([+-]?)(\d*)(?:\.(\d*))?$'
+# numbers the fast centavos path takes (at most 2 decimals)...
+_SHORT_DECIMAL = r'[+-]?\d+(?:\.\d{0,2})?|[+-]?\.\d{1,2}'
+# ...while x * 100 stays well inside the 53 bits of a double
+_FLOAT_EXACT_LIMIT = 2 ** 50 / 100
+
+
+def parse_br_decimal(values: pd.Series, as_centavos: bool = False,
+                     thousands: Optional[str] = '.', decimal: str = ',') -> Tuple[pd.Series, int]:
+    """
+    Vectorized parser for Brazilian formatted numbers ('1.234,56' -> 1234.56) over a whole column.
+
+    Mirrors the old per-cell helper: missing cells stay missing, non-text values pass
+    through untouched and malformed text falls back to 0.0.
+
+    Args:
+        values: Column to parse.
+        as_centavos: Returns exact integer centavos (Int64) instead of floats. The digits are
+            split as text, so no binary rounding is involved (half-up after the 2nd decimal).
+        thousands: Thousands separator to drop (None when the input has none, e.g. '1234,56').
+        decimal: Decimal separator.
+
+    Returns:
+        Tuple[pd.Series, int]: Parsed column and the number of cells that failed to parse.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        parsed = values.astype('float64')
+        if as_centavos:
+            parsed = (parsed * 100).round().astype('Int64')
+        return parsed, 0
+
+    missing = values.isna()
+    text_mask = ~missing
+    if values.dtype == object:
+        # Legacy mixed columns: only text cells are parsed, numbers are kept as they are
+        text_mask = values.map(lambda v: isinstance(v, str), na_action='ignore').fillna(False).astype(bool)
+
+    cleaned = values.where(text_mask).astype('str').str.strip()
+    if thousands:
+        cleaned = cleaned.str.replace(thousands, '', regex=False)
+    if decimal != '.':
+        cleaned = cleaned.str.replace(decimal, '.', regex=False)
+
+    if as_centavos:
+        # Fast path: plain numbers with up to 2 decimals are exact through float64 (the error
+        # of the double is far below half a centavo). Longer fractions and malformed text are
+        # split as digits instead, with the integer arithmetic below.
+        number = cleaned.where(cleaned.str.fullmatch(_SHORT_DECIMAL)).astype('float64')
+        digits = text_mask & (number.isna() | (number.abs() >= _FLOAT_EXACT_LIMIT))
+        parsed = (number * 100).round().astype('Int64')
+        failed = pd.Series(False, index=values.index)
+
+        if digits.any():
+            parts = cleaned[digits].str.extract(_DECIMAL_PARTS)
+            sign, integer, fraction = parts[0], parts[1], parts[2].fillna('')
+            ok = parts[1].notna() & ((integer != '') | (fraction != ''))
+
+            # Integer arithmetic end to end (nullable Int64), never through floats
+            whole = pd.to_numeric(integer.where(integer != '', '0').where(ok), dtype_backend='numpy_nullable')
+            cents = pd.to_numeric(fraction.str.slice(0, 2).str.pad(2, side='right', fillchar='0').where(ok),
+                                  dtype_backend='numpy_nullable')
+            round_up = (fraction.str.slice(2, 3) >= '5').where(ok, False).astype('int64')
+
+            exact = (whole * 100 + cents + round_up).astype('Int64')
+            exact = exact.where(sign != '-', -exact)
+            failed[digits] = ~ok
+            parsed[digits] = exact.mask(~ok, 0)
+
+        passthrough = ~text_mask & ~missing
+        if passthrough.any():
+            parsed[passthrough] = (pd.to_numeric(values[passthrough]) * 100).round().astype('int64')
+    else:
+        parsed = pd.to_numeric(cleaned, errors='coerce').astype('float64')
+        failed = text_mask & parsed.isna()
+        parsed = parsed.mask(failed, 0.0)
+
+        passthrough = ~text_mask & ~missing
+        if passthrough.any():
+            parsed[passthrough] = pd.to_numeric(values[passthrough]).astype('float64')
+
+    return parsed, int(np.count_nonzero(failed))
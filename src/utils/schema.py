@@ -0,0 +1,152 @@
+import logging
+from functools import reduce
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.utils.parsers import parse_br_decimal
+
+logger = logging.getLogger(__name__)
+
+# Compact schema of the fact rows, from ingestion onward:
+#   REG_ANS                          Int32 (nullable; non-numeric keys become <NA>)
+#   DATA                             category of dates (one small code per row, few distinct dates)
+#   CD_CONTA_CONTABIL, DESCRICAO,
+#   SOURCE_FILE, UF, Modalidade      category (dictionary-encoded text)
+#   Ano / Trimestre                  Int16 / Int8
+#   VL_SALDO_*, ValorDespesas        Int64 centavos (exact; reais only at the float boundaries:
+#                                    aggregation statistics and the CSV exports)
+# Bump SCHEMA_VERSION whenever this changes: it invalidates the parse cache and the quarter store.
+SCHEMA_VERSION = 2
+
+DATE_FORMAT = '%Y-%m-%d'
+KEY_DTYPE = 'Int32'
+VALUE_DTYPE = 'Int64'
+CATEGORY_COLUMNS = ['CD_CONTA_CONTABIL', 'DESCRICAO', 'SOURCE_FILE', 'UF', 'Modalidade']
+VALUE_COLUMNS = ['VL_SALDO_INICIAL', 'VL_SALDO_FINAL', 'ValorDespesas']
+
+
+def is_centavos(values: pd.Series) -> bool:
+    # The CSV paths never produce the nullable Int64 dtype: floats/ints read from them are reais
+    return values.dtype == VALUE_DTYPE
+
+
+def to_centavos(values: pd.Series, thousands=None) -> Tuple[pd.Series, int]:
+    """Value column as Int64 centavos: text is split exactly (no float step), reais are rounded."""
+    if is_centavos(values):
+        return values, 0
+    return parse_br_decimal(values, as_centavos=True, thousands=thousands)
+
+
+def to_reais(values: pd.Series) -> pd.Series:
+    """Float reais for statistics and exports (centavos / 100 gives the same double as the text)."""
+    if is_centavos(values):
+        return values.astype('float64') / 100
+    return values
+
+
+def to_reg_ans(values: pd.Series) -> pd.Series:
+    if pd.api.types.is_integer_dtype(values):
+        return values.astype(KEY_DTYPE)
+    # Few distinct operators: only those are converted
+    codes, uniques = pd.factorize(values)
+    numbers = pd.to_numeric(pd.Index(uniques).astype('str').str.strip(), errors='coerce')
+    keys = pd.api.extensions.take(pd.array(numbers, dtype=KEY_DTYPE), codes, allow_fill=True)
+    return pd.Series(keys, index=values.index)
+
+
+def to_dates(values: pd.Series) -> pd.Series:
+    """
+    Dictionary-encoded dates: only the distinct values are parsed (ISO first, then with
+    inference for the ones that do not match); unparseable dates become missing.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype) and pd.api.types.is_datetime64_any_dtype(values.cat.categories):
+        return values
+    codes, uniques = pd.factorize(values)
+    if pd.api.types.is_datetime64_any_dtype(uniques):
+        parsed = pd.DatetimeIndex(uniques)
+    else:
+        text = pd.Index(uniques).astype('str')
+        parsed = pd.to_datetime(text, format=DATE_FORMAT, errors='coerce')
+        retry = parsed.isna()
+        if retry.any():
+            fallback = pd.to_datetime(pd.Series(text[retry]), errors='coerce', format='mixed')
+            parsed = parsed.where(~retry, pd.DatetimeIndex(fallback))
+
+    # Different texts of the same date share one category; NaT becomes a missing code
+    date_codes, dates = pd.factorize(parsed)
+    codes = np.where(codes >= 0, date_codes[codes.clip(min=0)] if len(date_codes) else -1, -1)
+    return pd.Series(pd.Categorical.from_codes(codes, categories=dates), index=values.index)
+
+
+def quarter_parts(dates: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """(Ano, Trimestre) of dictionary-encoded dates, computed on the distinct dates only."""
+    dates = to_dates(dates)
+    codes = dates.cat.codes.to_numpy()
+    categories = pd.DatetimeIndex(dates.cat.categories)
+
+    def per_row(values: np.ndarray, dtype: str) -> pd.Series:
+        taken = pd.api.extensions.take(pd.array(values, dtype=dtype), codes, allow_fill=True)
+        return pd.Series(taken, index=dates.index)
+
+    return per_row(categories.year, 'Int16'), per_row(categories.quarter, 'Int8')
+
+
+def map_categories(values: pd.Series, func) -> pd.Series:
+    """
+    Applies a text transformation (Series -> Series) to the distinct values only and returns
+    the result dictionary-encoded (missing values are passed to func as well).
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    mapped_codes, mapped = pd.factorize(func(pd.Series(uniques, dtype=object)))
+    return pd.Series(pd.Categorical.from_codes(mapped_codes[codes], categories=mapped), index=values.index)
+
+
+def compact_facts(df: pd.DataFrame, thousands=None) -> pd.DataFrame:
+    """
+    Converts the fact columns present in `df` to the compact schema (in place, and returns
+    it). Columns already compact are left as they are, so every stage can call it.
+    """
+    if 'REG_ANS' in df.columns and df['REG_ANS'].dtype != KEY_DTYPE:
+        keys = to_reg_ans(df['REG_ANS'])
+        invalid = int((keys.isna() & df['REG_ANS'].notna()).sum())
+        if invalid:
+            logger.warning(f"    {invalid} REG_ANS values are not numeric (set to missing).")
+        df['REG_ANS'] = keys
+    if 'DATA' in df.columns:
+        df['DATA'] = to_dates(df['DATA'])
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    for col in VALUE_COLUMNS:
+        if col in df.columns:
+            df[col], failed = to_centavos(df[col], thousands=thousands)
+            if failed:
+                logger.warning(f"    {failed} values in {col} could not be parsed (set to 0).")
+    return df
+
+
+def expand(df: pd.DataFrame) -> pd.DataFrame:
+    """Export representation: plain dates and values in reais (the text of the CSV files)."""
+    converted = {}
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            converted[col] = df[col].astype(df[col].cat.categories.dtype)
+        elif col in VALUE_COLUMNS and is_centavos(df[col]):
+            converted[col] = to_reais(df[col])
+    return df.assign(**converted) if converted else df
+
+
+def concat_facts(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    pd.concat that keeps the categorical columns categorical: their categories are unified
+    first (plain pd.concat falls back to object when the categories differ).
+    """
+    frames = list(frames)
+    for col in frames[0].columns:
+        dtypes = [frame[col].dtype for frame in frames if col in frame.columns]
+        if len(dtypes) == len(frames) and all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+            categories = reduce(lambda a, b: a.union(b), (dtype.categories for dtype in dtypes))
+            frames = [frame.assign(**{col: frame[col].cat.set_categories(categories)}) for frame in frames]
+    return pd.concat(frames, ignore_index=True)
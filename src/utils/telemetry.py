@@ -0,0 +1,256 @@
+import cProfile
+import functools
+import io
+import itertools
+import json
+import logging
+import os
+import pstats
+import resource
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Run being recorded (None: the hooks cost a single check)
+_active: Optional['RunTelemetry'] = None
+
+
+def _read_proc(path: str) -> Dict[str, int]:
+    """'key: value' files of /proc (empty when not on Linux)."""
+    values = {}
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                parts = value.split()
+                if parts and parts[0].isdigit():
+                    values[key] = int(parts[0])
+    except OSError:
+        pass
+    return values
+
+
+def current_rss() -> Optional[int]:
+    """Resident set size in bytes."""
+    status = _read_proc('/proc/self/status')
+    return status['VmRSS'] * 1024 if 'VmRSS' in status else None
+
+
+def io_counters() -> Dict[str, int]:
+    """Bytes read/written: storage level (read_bytes/write_bytes) and all read/write calls (rchar/wchar)."""
+    counters = _read_proc('/proc/self/io')
+    return {key: counters[key] for key in ('read_bytes', 'write_bytes', 'rchar', 'wchar') if key in counters}
+
+
+def count_rows(value: Any) -> int:
+    """Rows of a DataFrame, or of the DataFrames inside a tuple/list (e.g. clean + quarantine)."""
+    if isinstance(value, pd.DataFrame):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(count_rows(item) for item in value)
+    return 0
+
+
+def frame_bytes(value: Any) -> int:
+    """In-memory size of a DataFrame (or of the DataFrames inside a tuple/list), strings included."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True, index=False).sum())
+    if isinstance(value, (tuple, list)):
+        return sum(frame_bytes(item) for item in value)
+    return 0
+
+
+class RunTelemetry:
+    """
+    Per-stage performance record of one pipeline run.
+
+    Each instrumented call adds to its stage: wall and CPU time, peak RSS while it ran
+    (sampled by a background thread), rows in/out, in-memory size of the frames in/out and
+    bytes read/written. Repeated calls (e.g. one per ZIP) are accumulated in the same stage.
+    Calls made inside worker processes are not recorded.
+
+    With profile=True the outermost stages of the main thread also run under cProfile,
+    and the profile of the slowest one goes into the report.
+    """
+
+    def __init__(self, profile: bool = False, sample_interval: float = 0.05):
+        self.profile = profile
+        self.sample_interval = sample_interval
+        self.stages: Dict[str, Dict] = {}
+        self._profiles: Dict[str, cProfile.Profile] = {}
+        # Peak RSS of the calls in progress, by call id (updated by the sampler)
+        self._running: Dict[int, int] = {}
+        self._call_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._depth = threading.local()
+        self.run_peak_rss = 0
+
+    # --- Lifecycle ---
+
+    def start(self) -> 'RunTelemetry':
+        global _active
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        self._start_io = io_counters()
+        self._sampler = threading.Thread(target=self._sample, name="telemetry-sampler", daemon=True)
+        self._sampler.start()
+        _active = self
+        return self
+
+    def stop(self) -> None:
+        global _active
+        if _active is self:
+            _active = None
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join()
+        self._wall = time.perf_counter() - self._start_wall
+        self._cpu = time.process_time() - self._start_cpu
+
+    def __enter__(self) -> 'RunTelemetry':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.sample_interval):
+            rss = current_rss()
+            if rss is None:
+                return
+            with self._lock:
+                self.run_peak_rss = max(self.run_peak_rss, rss)
+                for call_id, peak in self._running.items():
+                    self._running[call_id] = max(peak, rss)
+
+    # --- Recording ---
+
+    def call(self, name: str, func: Callable, args: tuple, kwargs: dict) -> Any:
+        depth = getattr(self._depth, 'value', 0)
+        profiler = None
+        if self.profile and depth == 0 and threading.current_thread() is threading.main_thread():
+            profiler = self._profiles.setdefault(name, cProfile.Profile())
+
+        call_id = next(self._call_ids)
+        with self._lock:
+            self._running[call_id] = current_rss() or 0
+        io_before = io_counters()
+        wall, cpu = time.perf_counter(), time.process_time()
+
+        self._depth.value = depth + 1
+        result = None
+        try:
+            if profiler:
+                profiler.enable()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                if profiler:
+                    profiler.disable()
+            return result
+        finally:
+            self._depth.value = depth
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            io_after = io_counters()
+            with self._lock:
+                peak_rss = self._running.pop(call_id)
+                stage = self.stages.setdefault(name, {
+                    'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'peak_rss_bytes': 0, 'rows_in': 0, 'rows_out': 0,
+                    'frame_bytes_in': 0, 'frame_bytes_out': 0,
+                    **{key: 0 for key in io_after},
+                })
+                stage['calls'] += 1
+                stage['wall_s'] += wall
+                stage['cpu_s'] += cpu
+                stage['peak_rss_bytes'] = max(stage['peak_rss_bytes'], peak_rss, current_rss() or 0)
+                inputs = list(args) + list(kwargs.values())
+                stage['rows_in'] += count_rows(inputs)
+                stage['rows_out'] += count_rows(result)
+                stage['frame_bytes_in'] += frame_bytes(inputs)
+                stage['frame_bytes_out'] += frame_bytes(result)
+                for key, value in io_after.items():
+                    stage[key] = stage.get(key, 0) + value - io_before.get(key, value)
+
+    # --- Report ---
+
+    def slowest_profiled_stage(self) -> Optional[str]:
+        profiled = [name for name in self._profiles if name in self.stages]
+        return max(profiled, key=lambda name: self.stages[name]['wall_s'], default=None)
+
+    def report(self) -> Dict:
+        io_end = io_counters()
+        report = {
+            'started_at': self.started_at,
+            'wall_s': round(getattr(self, '_wall', time.perf_counter() - self._start_wall), 4),
+            'cpu_s': round(getattr(self, '_cpu', time.process_time() - self._start_cpu), 4),
+            # Process-wide peak (includes memory held before the run started)
+            'peak_rss_bytes': max(self.run_peak_rss, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024),
+            'io': {key: value - self._start_io.get(key, value) for key, value in io_end.items()},
+            'stages': {
+                name: {key: round(value, 4) if isinstance(value, float) else value for key, value in stage.items()}
+                for name, stage in self.stages.items()
+            },
+        }
+        return report
+
+    def write_report(self, path: str, top: int = 25) -> str:
+        """Writes the JSON run report (and, when profiling, the .prof of the slowest stage)."""
+        report = self.report()
+        slowest = self.slowest_profiled_stage()
+        if slowest:
+            prof_path = os.path.join(os.path.dirname(path), f"profile_{slowest}.prof")
+            stats = pstats.Stats(self._profiles[slowest])
+            stats.dump_stats(prof_path)
+            text = io.StringIO()
+            pstats.Stats(self._profiles[slowest], stream=text).sort_stats('cumulative').print_stats(top)
+            report['profile'] = {'stage': slowest, 'file': prof_path, 'top': text.getvalue().splitlines()}
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+        for name, stage in self.stages.items():
+            if stage['frame_bytes_out']:
+                logger.info(f"    {name}: {stage['rows_out']} rows out, {stage['frame_bytes_out'] / 1024 ** 2:,.1f} MiB in memory")
+        logger.info(f"Run report written to {path}" + (f" (profiled: {slowest})" if slowest else ""))
+        return path
+
+
+def _reset_after_fork() -> None:
+    """
+    A forked worker (e.g. of ingest_each's process pool) does not record into the parent's run:
+    its copy of the run, and of a lock that may have been held at fork time, is dropped.
+    """
+    global _active
+    if _active is not None:
+        _active._lock = threading.Lock()
+    _active = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def instrumented(func: Callable) -> Callable:
+    """
+    Stage hook: records the call in the active RunTelemetry under 'Class.method'.
+    Without an active run it only adds one check.
+    """
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        telemetry = _active
+        if telemetry is None:
+            return func(*args, **kwargs)
+        return telemetry.call(name, func, args, kwargs)
+
+    return wrapper
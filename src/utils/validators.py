@@ -1,5 +1,11 @@
 import re
 
+import numpy as np
+import pandas as pd
+
+CNPJ_WEIGHTS_1 = [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
+CNPJ_WEIGHTS_2 = [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
+
 def validate_cnpj(cnpj: str) -> bool:
     """
     Validates a CNPJ using the standard check digit algorithm.
@@ -26,11 +32,41 @@ def validate_cnpj(cnpj: str) -> bool:
         return 0 if remainder < 2 else 11 - remainder
 
     # First Digit
-    weights_1 = [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
-    digit_1 = calculate_digit(cnpj[:12], weights_1)
+    digit_1 = calculate_digit(cnpj[:12], CNPJ_WEIGHTS_1)
 
     # Second Digit
-    weights_2 = [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
-    digit_2 = calculate_digit(cnpj[:13], weights_2)
+    digit_2 = calculate_digit(cnpj[:13], CNPJ_WEIGHTS_2)
+
+    return cnpj[-2:] == f"{digit_1}{digit_2}"
+
+
+def validate_cnpj_series(values: pd.Series) -> pd.Series:
+    """
+    Column version of validate_cnpj, with the same results.
+
+    Each distinct value is validated once (a fact table repeats the same ~1k CNPJs):
+    the check digits of all of them are computed at once over a (n, 14) digit matrix,
+    then the result is broadcast back to every row. Missing values are invalid.
+    """
+    codes, uniques = pd.factorize(values)
+
+    # Same normalization as validate_cnpj: keep ASCII digits, re-pad stripped zeros
+    digits = pd.Series(uniques, dtype=object).map(str).str.replace(r'[^0-9]', '', regex=True)
+    digits = digits.where(~digits.str.len().between(10, 13), digits.str.zfill(14))
+    has_14 = (digits.str.len() == 14).to_numpy(dtype=bool)
+
+    valid = np.zeros(len(uniques) + 1, dtype=bool)  # last slot: missing values (code -1)
+    if has_14.any():
+        matrix = np.frombuffer(''.join(digits[has_14]).encode('ascii'), dtype=np.uint8)
+        matrix = matrix.reshape(-1, 14).astype(np.int64) - ord('0')
+
+        def check_digit(body, weights):
+            remainder = (body @ np.array(weights)) % 11
+            return np.where(remainder < 2, 0, 11 - remainder)
+
+        repeated = (matrix == matrix[:, :1]).all(axis=1)
+        matches = ((matrix[:, 12] == check_digit(matrix[:, :12], CNPJ_WEIGHTS_1)) &
+                   (matrix[:, 13] == check_digit(matrix[:, :13], CNPJ_WEIGHTS_2)))
+        valid[:-1][has_14] = matches & ~repeated
 
-    return cnpj[-2:] == f"{digit_1}{digit_2}"
\ No newline at end of file
+    return pd.Series(valid[codes], index=values.index)
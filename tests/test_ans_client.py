@@ -1,13 +1,32 @@
 import pytest
 import os
 import sys
+from datetime import date
 from unittest.mock import patch, MagicMock
+import zipfile
 from io import BytesIO
 from requests.exceptions import HTTPError
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from src import config
 from src.services.ans_client import AnsDataClient
+from src.services.listing_manifest import ListingManifest
+
+def _fake_response(status_code, content=b"", headers=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.raw = BytesIO(content)
+    response.__enter__ = MagicMock(return_value=response)
+    response.__exit__ = MagicMock(return_value=False)
+    return response
+
+def _zip_bytes():
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zf:
+        zf.writestr("data.csv", "DATA;REG_ANS\n2025-01-01;123456\n")
+    return buffer.getvalue()
 
 def test_directory_creation(tmp_path):
     """Test if the client creates the download folder automatically."""
@@ -23,7 +42,7 @@ def test_download_file_success(mock_get, tmp_path):
     mock_response = MagicMock()
     mock_response.status_code = 200 # HTTP OK
     # Mock r.raw (not iter_content) because the code uses shutil.copyfileobj(r.raw, f)
-    mock_response.raw = BytesIO(b"Fake Zip Content")
+    mock_response.raw = BytesIO(_zip_bytes())
     mock_response.__enter__ = MagicMock(return_value=mock_response)
     mock_response.__exit__ = MagicMock(return_value=False)
     mock_get.return_value = mock_response
@@ -39,14 +58,14 @@ def test_download_file_success(mock_get, tmp_path):
     # Verification
     
     # Check if requests.get was actually called with our URL
-    mock_get.assert_called_once_with(url, stream=True)
+    mock_get.assert_called_once_with(url, stream=True, headers={})
     
     # Check if the file was actually saved to disk
     expected_file = tmp_path / "test_download.zip"
     assert expected_file.exists()
     
     # Check if the content inside the file matches our fake data
-    assert expected_file.read_bytes() == b"Fake Zip Content"
+    assert expected_file.read_bytes() == _zip_bytes()
 
 @patch('src.services.ans_client.requests.get')
 def test_download_failure(mock_get, tmp_path):
@@ -69,4 +88,145 @@ def test_download_failure(mock_get, tmp_path):
     # 3. Verification
     expected_file = tmp_path / "missing.zip"
     # The file should NOT exist
-    assert not expected_file.exists()
\ No newline at end of file
+    assert not expected_file.exists()
+
+def _fake_listing(url, session=None):
+    """Fake ANS directory tree: 2025 has 2 quarters, every older year has 4."""
+    if url == config.ANS_BASE_URL:
+        links = ['2022/', '2025/', '2023/', '2024/', 'README.txt']
+    else:
+        year = url.rstrip('/').split('/')[-1]
+        quarters = [1, 2] if year == '2025' else [1, 2, 3, 4]
+        links = [f"{q}T{year}.zip" for q in quarters]
+    return [{'href': link, 'modified': None, 'size': None} for link in links]
+
+def test_concurrent_scan_matches_sequential(tmp_path):
+    """The pooled scan must return exactly what the sequential scan returns."""
+    client = AnsDataClient(download_dir=str(tmp_path), max_workers=3)
+
+    with patch.object(client, '_get_entries', side_effect=_fake_listing):
+        sequential = client.get_available_quarters()
+        concurrent = client.get_available_quarters(concurrent=True, refresh=True)
+
+    assert concurrent == sequential
+    assert len(sequential) == 14
+    assert (sequential[0]['year'], sequential[0]['quarter']) == (2025, 2)
+
+def test_concurrent_scan_stops_early(tmp_path):
+    """With a target count, older years should not be listed at all."""
+    client = AnsDataClient(download_dir=str(tmp_path), max_workers=1)
+
+    with patch.object(client, '_get_entries', side_effect=_fake_listing) as mock_links:
+        result = client.get_available_quarters(concurrent=True, target_count=3)
+
+    listed = [c.args[0].rstrip('/').split('/')[-1] for c in mock_links.call_args_list[1:]]
+    assert listed == ['2025', '2024']
+    assert [(r['year'], r['quarter']) for r in result[:3]] == [(2025, 2), (2025, 1), (2024, 4)]
+
+
+@patch('src.services.ans_client.requests.get')
+def test_download_resumes_partial_file(mock_get, tmp_path):
+    """A leftover .part is resumed with a Range request and promoted atomically."""
+    payload = _zip_bytes()
+    (tmp_path / "q1.zip.part").write_bytes(payload[:10])
+    (tmp_path / "q1.zip.part.meta.json").write_text('{"etag": "\\"abc\\""}')
+    mock_get.return_value = _fake_response(206, payload[10:])
+
+    client = AnsDataClient(download_dir=str(tmp_path))
+    path = client._download_file("http://fake-url.com/q1.zip", "q1.zip")
+
+    headers = mock_get.call_args.kwargs['headers']
+    assert headers['Range'] == 'bytes=10-'
+    assert headers['If-Range'] == '"abc"'
+    assert path == str(tmp_path / "q1.zip")
+    assert (tmp_path / "q1.zip").read_bytes() == payload
+    assert not (tmp_path / "q1.zip.part").exists()
+
+@patch('src.services.ans_client.requests.get')
+def test_download_revalidates_cached_file(mock_get, tmp_path):
+    """An intact cached file is revalidated with its ETag; 304 keeps it untouched."""
+    payload = _zip_bytes()
+    (tmp_path / "q1.zip").write_bytes(payload)
+    (tmp_path / "q1.zip.meta.json").write_text('{"etag": "\\"abc\\""}')
+    mock_get.return_value = _fake_response(304)
+
+    client = AnsDataClient(download_dir=str(tmp_path))
+    path = client._download_file("http://fake-url.com/q1.zip", "q1.zip")
+
+    assert mock_get.call_args.kwargs['headers']['If-None-Match'] == '"abc"'
+    assert path == str(tmp_path / "q1.zip")
+    assert (tmp_path / "q1.zip").read_bytes() == payload
+
+@patch('src.services.ans_client.requests.get')
+def test_download_replaces_truncated_cache_and_rejects_bad_zip(mock_get, tmp_path):
+    """A truncated cached ZIP is re-downloaded; a corrupt download never reaches the final path."""
+    (tmp_path / "q1.zip").write_bytes(_zip_bytes()[:20])
+    mock_get.return_value = _fake_response(200, b"not a zip")
+
+    client = AnsDataClient(download_dir=str(tmp_path))
+    path = client._download_file("http://fake-url.com/q1.zip", "q1.zip")
+
+    assert mock_get.call_args.kwargs['headers'] == {}
+    assert path is None
+    assert not (tmp_path / "q1.zip").exists()
+    assert not (tmp_path / "q1.zip.part").exists()
+
+def test_download_files_keeps_item_order(tmp_path):
+    """Parallel downloads return paths in the same order as the requested items."""
+    client = AnsDataClient(download_dir=str(tmp_path))
+    items = [{'url': f"http://fake-url.com/{n}", 'filename': n} for n in ('a.zip', 'b.zip', 'c.csv')]
+
+    def fake_download(url, filename, session=None):
+        return None if filename == 'b.zip' else os.path.join(str(tmp_path), filename)
+
+    with patch.object(client, '_download_file', side_effect=fake_download):
+        paths = client.download_files(items)
+
+    assert paths == [os.path.join(str(tmp_path), 'a.zip'), None, os.path.join(str(tmp_path), 'c.csv')]
+
+def test_listing_manifest_skips_cached_folders(tmp_path):
+    """A second scan is served from the manifest; only expired open folders are re-fetched."""
+    def manifest():
+        # Pinned clock: 2025 is the only open year, whatever the real date
+        return ListingManifest(os.path.join(str(tmp_path), config.LISTING_MANIFEST_FILE), today=lambda: date(2026, 3, 1))
+    client = AnsDataClient(download_dir=str(tmp_path), manifest=manifest())
+
+    with patch.object(client, '_get_entries', side_effect=_fake_listing) as mock_entries:
+        first = client.get_available_quarters()
+        assert mock_entries.call_count == 5  # root + 4 years
+
+        second = AnsDataClient(download_dir=str(tmp_path), manifest=manifest()).get_available_quarters()
+        assert second == first
+        assert mock_entries.call_count == 5  # nothing re-fetched
+
+        # Expire the open folders only: root + 2025 are rechecked, closed years are not
+        client.manifest.open_ttl = -1
+        client.get_available_quarters()
+        refetched = [c.args[0] for c in mock_entries.call_args_list[5:]]
+        assert refetched == [config.ANS_BASE_URL, f"{config.ANS_BASE_URL}2025/"]
+
+@patch('src.services.ans_client.requests.get')
+def test_get_entries_reads_size_and_date(mock_get, tmp_path):
+    """Apache listings expose the modification date and size next to each link."""
+    mock_get.return_value = MagicMock(text="""
+<table>
+<tr><td><a href="/FTP/PDA/">Parent Directory</a></td><td>&nbsp;</td><td align="right"> - </td></tr>
+<tr><td><a href="1T2025.zip">1T2025.zip</a></td><td align="right">2025-05-20 10:21  </td><td align="right"> 12M</td></tr>
+</table>""")
+
+    client = AnsDataClient(download_dir=str(tmp_path))
+    entries = client._get_entries("http://fake-url.com/2025/")
+
+    assert entries == [{'href': '1T2025.zip', 'modified': '2025-05-20 10:21', 'size': '12M'}]
+
+def test_select_quarters_by_year_range(tmp_path):
+    """Backfill windows pick every quarter inside the (inclusive) year range."""
+    client = AnsDataClient(download_dir=str(tmp_path))
+
+    with patch.object(client, '_get_entries', side_effect=_fake_listing):
+        targets = client.select_quarters(year_range=(2023, 2024))
+        newest = client.select_quarters(count=5)
+
+    assert {t['year'] for t in targets} == {2023, 2024}
+    assert len(targets) == 8
+    assert [(t['year'], t['quarter']) for t in newest] == [(2025, 2), (2025, 1), (2024, 4), (2024, 3), (2024, 2)]
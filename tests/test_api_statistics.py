@@ -0,0 +1,57 @@
+import pytest
+import os
+import sys
+from datetime import date
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from api.server import get_statistics
+from src.services.db_loader import DatabaseLoader
+
+OPERATORS = [('1', 'A', 'SP', 'Cooperativa Médica'), ('2', 'B', 'SP', 'Medicina de Grupo'),
+             ('3', 'C', 'RJ', 'Cooperativa Médica')]
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ans.db'}")
+    loader = DatabaseLoader(engine)
+    loader.create_tables()
+    facts = [
+        # quarter, operator, account, value (only 9-char accounts count)
+        (date(2024, 4, 1), '1', '411111111', 50.0),
+        (date(2024, 7, 1), '1', '411111111', 100.0),
+        (date(2024, 7, 1), '1', '41111', 999.0),
+        (date(2024, 7, 1), '2', '411111111', 300.0),
+        (date(2024, 7, 1), '3', '411111112', 20.0),
+    ]
+    with engine.begin() as conn:
+        for reg_ans, name, uf, modalidade in OPERATORS:
+            conn.execute(text("INSERT INTO dim_operadoras (reg_ans, razao_social, uf, modalidade) "
+                              "VALUES (:r, :n, :u, :m)"), {'r': reg_ans, 'n': name, 'u': uf, 'm': modalidade})
+        for quarter, reg_ans, account, value in facts:
+            conn.execute(text("INSERT INTO fact_despesas_eventos (data_trimestre, reg_ans, conta_contabil, vl_saldo_final) "
+                              "VALUES (:d, :r, :c, :v)"), {'d': quarter, 'r': reg_ans, 'c': account, 'v': value})
+    loader.refresh_summaries()
+    with Session(engine) as session:
+        yield session
+
+def _stats(db, trimestre=None, uf=None, modalidade=None):
+    return get_statistics(trimestre=trimestre, uf=uf, modalidade=modalidade, db=db)
+
+def test_latest_quarter_from_the_summaries(db):
+    stats = _stats(db)
+
+    assert float(stats.total_expenses) == 420.0
+    assert float(stats.average_expenses) == 140.0
+    assert [operator.reg_ans for operator in stats.top_5_operators] == ['2', '1', '3']
+    assert [(row.uf, float(row.total_expenses)) for row in stats.expenses_by_uf] == [('SP', 400.0), ('RJ', 20.0)]
+
+def test_filters_by_quarter_uf_and_modalidade(db):
+    assert float(_stats(db, trimestre=date(2024, 4, 1)).total_expenses) == 50.0
+
+    stats = _stats(db, uf='sp', modalidade='Cooperativa Médica')
+    assert float(stats.total_expenses) == 100.0
+    assert [operator.razao_social for operator in stats.top_5_operators] == ['A']
+    assert [row.uf for row in stats.expenses_by_uf] == ['SP']
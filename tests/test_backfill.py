@@ -0,0 +1,109 @@
+import pytest
+import pandas as pd
+import os
+import sys
+import zipfile
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.services.backfill import QuarterBackfill
+from src.services.ingestion import IngestionService
+from src.services.quarter_store import QuarterStore
+
+def _item(tmp_path, year, quarter):
+    """Listing entry + a matching quarterly ZIP on disk."""
+    filename = f"{quarter}T{year}.zip"
+    csv_content = f"""DATA;REG_ANS;CD_CONTA_CONTABIL;DESCRICAO;VL_SALDO_FINAL
+{year}-0{quarter}-01;111111;411111111;Despesas com Eventos / Sinistros;100,50"""
+    with zipfile.ZipFile(tmp_path / filename, 'w') as zf:
+        zf.writestr("data.csv", csv_content.encode('utf-8'))
+    return {'year': year, 'quarter': quarter, 'filename': filename, 'url': f"http://fake/{filename}",
+            'size': '1K', 'modified': '2025-01-01 10:00'}
+
+def _fake_client(tmp_path, items):
+    client = MagicMock()
+    client.select_quarters.return_value = items
+    client.iter_downloads.side_effect = lambda targets, workers=None: iter(
+        [(i, str(tmp_path / t['filename']), 0.0) for i, t in enumerate(targets)]
+    )
+    return client
+
+@pytest.mark.parametrize("overlap", [True, False])
+def test_backfill_only_processes_new_quarters(tmp_path, overlap):
+    store = QuarterStore(store_dir=str(tmp_path / "store"))
+    q1, q2 = _item(tmp_path, 2025, 1), _item(tmp_path, 2025, 2)
+
+    client = _fake_client(tmp_path, [q1])
+    client.download_files.side_effect = lambda targets, workers=None: [str(tmp_path / t['filename']) for t in targets]
+    df = QuarterBackfill(client, IngestionService(), store=store, overlap=overlap).run(count=1)
+    assert list(df['SOURCE_FILE']) == ["1T2025.zip"]
+
+    # A new quarter is published: only that one is downloaded and parsed
+    client = _fake_client(tmp_path, [q2, q1])
+    client.download_files.side_effect = lambda targets, workers=None: [str(tmp_path / t['filename']) for t in targets]
+    df = QuarterBackfill(client, IngestionService(), store=store, overlap=overlap).run(count=2)
+
+    downloaded = client.iter_downloads.call_args.args[0] if overlap else client.download_files.call_args.args[0]
+    assert [t['filename'] for t in downloaded] == ["2T2025.zip"]
+    assert list(df['SOURCE_FILE']) == ["2T2025.zip", "1T2025.zip"]
+
+def test_store_detects_republished_quarter(tmp_path):
+    """A quarter whose listing date changed must be reprocessed."""
+    store = QuarterStore(store_dir=str(tmp_path / "store"))
+    item = _item(tmp_path, 2025, 1)
+    store.save(item, IngestionService().ingest_from_files([str(tmp_path / item['filename'])]))
+
+    assert QuarterStore(store_dir=str(tmp_path / "store")).has(item)
+    assert not store.has(dict(item, modified='2025-06-01 09:00'))
+
+def test_store_round_trips_the_compact_schema(tmp_path):
+    """Quarters are kept as Parquet and come back with the same dtypes (DATA re-encoded)."""
+    store = QuarterStore(store_dir=str(tmp_path / "store"))
+    item = _item(tmp_path, 2025, 1)
+    df = IngestionService().ingest_from_files([str(tmp_path / item['filename'])])
+    store.save(item, df)
+
+    assert sorted(os.listdir(tmp_path / "store")) == ["2025Q1.parquet", "index.json"]
+    pd.testing.assert_frame_equal(store.load(item), df.reset_index(drop=True))
+    assert store.memory_estimate(item) > 0
+
+    # Entries pickled by older versions are reprocessed, never unpickled
+    store._index["2025Q1"]['file'] = "2025Q1.pkl"
+    assert not store.has(item)
+
+def test_skip_keys_leave_out_up_to_date_quarters(tmp_path):
+    """Quarters already folded downstream are not returned, unless they were republished."""
+    store = QuarterStore(store_dir=str(tmp_path / "store"))
+    q1, q2 = _item(tmp_path, 2025, 1), _item(tmp_path, 2025, 2)
+    store.save(q1, IngestionService().ingest_from_files([str(tmp_path / q1['filename'])]))
+    store.save(q2, IngestionService().ingest_from_files([str(tmp_path / q2['filename'])]))
+
+    backfill = QuarterBackfill(_fake_client(tmp_path, [q2, q1]), IngestionService(), store=store)
+    df = backfill.run(count=2, skip_keys={"2025Q1"})
+    assert list(df['SOURCE_FILE']) == ["2T2025.zip"]
+    assert backfill.last_keys == ["2025Q2"]
+    assert backfill.last_window_keys == ["2025Q2", "2025Q1"]
+
+    republished = dict(q1, modified='2025-06-01 09:00')
+    backfill = QuarterBackfill(_fake_client(tmp_path, [q2, republished]), IngestionService(), store=store)
+    backfill.run(count=2, skip_keys={"2025Q1", "2025Q2"})
+    assert backfill.last_keys == ["2025Q1"]
+
+def test_store_window_yields_quarters_one_at_a_time(tmp_path):
+    """Out-of-core mode: the window is stored first, then read back quarter by quarter in run() order."""
+    store = QuarterStore(store_dir=str(tmp_path / "store"))
+    q1, q2 = _item(tmp_path, 2025, 1), _item(tmp_path, 2025, 2)
+    store.save(q1, IngestionService().ingest_from_files([str(tmp_path / q1['filename'])]))
+
+    client = _fake_client(tmp_path, [q2, q1])
+    backfill = QuarterBackfill(client, IngestionService(), store=store)
+    items = backfill.store_window(count=2)
+    assert [t['filename'] for t in client.iter_downloads.call_args.args[0]] == ["2T2025.zip"]
+    assert store.has(q2)
+
+    quarters = backfill.iter_stored(items)
+    key, df = next(quarters)
+    assert key == "2025Q2" and list(df['SOURCE_FILE']) == ["2T2025.zip"]
+    assert [key for key, _ in quarters] == ["2025Q1"]
+    assert backfill.last_keys == ["2025Q2", "2025Q1"]
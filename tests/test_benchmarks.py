@@ -0,0 +1,59 @@
+import pytest
+import pandas as pd
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.generator import SyntheticAnsData, data_version, generate
+from benchmarks.run import find_regressions
+from src.services.zip_processor import ZipProcessor
+from src.services.cadastre import CadastreDimension
+from src.utils.validators import validate_cnpj_series
+
+def _small(**options):
+    return SyntheticAnsData(seed=7, operators=50, accounts=20, quarters=2, rows_per_quarter=500, **options)
+
+def test_generator_is_seeded():
+    assert _small().quarter_frame(2024, 4).equals(_small().quarter_frame(2024, 4))
+    assert _small().cadastre_frame().equals(_small().cadastre_frame())
+    assert not _small().quarter_frame(2024, 4).equals(_small().quarter_frame(2024, 3))
+
+def test_quarters_end_at_the_last_quarter():
+    data = SyntheticAnsData(quarters=5, rows_per_quarter=10, last_quarter=(2024, 2))
+    assert data.quarter_list() == [(2023, 2), (2023, 3), (2023, 4), (2024, 1), (2024, 2)]
+
+def test_files_go_through_the_pipeline_readers(tmp_path):
+    files = generate(str(tmp_path), seed=7, operators=50, accounts=20, quarters=2, rows_per_quarter=500,
+                     missing_cadastre_share=0.2, invalid_cnpj_share=0.2)
+    assert [os.path.basename(path) for path in files['zips']] == ['3T2024.zip', '4T2024.zip']
+    # 500 rows + 1% re-sent copies per quarter
+    assert files['rows'] == 2 * 505
+
+    df = ZipProcessor().process_zip(files['zips'][-1])
+    assert 0 < len(df) < 505
+    assert (df['DATA'] == '2024-10-01').all()
+    assert df['VL_SALDO_FINAL'].dtype == 'Int64'  # centavos
+    assert df.duplicated().any()
+
+    dimension = CadastreDimension(str(tmp_path / "cache")).load(files['cadastre'])
+    assert dimension.index.is_unique
+    # Noise: some operators are missing from the cadastre, some CNPJs are invalid
+    assert len(dimension) < 50
+    assert 0.5 < validate_cnpj_series(dimension['CNPJ']).mean() < 1
+
+def test_data_version_follows_the_options():
+    assert data_version(scale=1, seed=7) == data_version(scale=1, seed=7)
+    assert data_version(scale=1, seed=7) != data_version(scale=10, seed=7)
+    assert data_version(scale=1, seed=7) != data_version(scale=1, seed=7, quarters=2)
+
+def test_regressions_use_threshold_and_noise_floor():
+    baselines = {'scales': {'1': {'DataEnricher': {'wall_s': 1.0}, 'DataValidator': {'wall_s': 0.01}}}}
+    results = {1: {
+        'DataEnricher': {'wall_s': 1.3},
+        'DataValidator': {'wall_s': 0.03},   # 3x slower, but only 20ms
+        'DataAggregator': {'wall_s': 9.0},   # no baseline
+    }}
+    regressions = find_regressions(results, baselines, threshold=0.25)
+    assert len(regressions) == 1 and regressions[0].startswith('DataEnricher @ 1x')
+    assert find_regressions(results, baselines, threshold=0.5) == []
@@ -0,0 +1,67 @@
+import pytest
+import hashlib
+import pandas as pd
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.services.cadastre import CadastreDimension, scan_file, sniff_encoding
+
+CADASTRE = """REGISTRO_OPERADORA;CNPJ;Razao_Social;Nome_Fantasia;Modalidade;UF
+111111;12345678000199;Saúde Ação Ltda;X;Medicina de Grupo;SP
+222222;87654321000155;Empresa Dois;Y;Seguradora;RJ
+111111;99999999000199;Duplicada;Z;Cooperativa;MG"""
+
+def _write(path, encoding='utf-8', content=CADASTRE):
+    with open(path, 'w', encoding=encoding) as f:
+        f.write(content)
+    return str(path)
+
+def test_sniff_encoding(tmp_path):
+    assert sniff_encoding(_write(tmp_path / "utf8.csv")) == 'utf-8'
+    assert sniff_encoding(_write(tmp_path / "latin.csv", encoding='latin-1')) == 'latin-1'
+    assert sniff_encoding(_write(tmp_path / "bom.csv", encoding='utf-8-sig')) == 'utf-8-sig'
+
+def test_scan_hashes_and_sniffs_in_one_read(tmp_path):
+    # Tiny blocks: multi-byte characters are split across them
+    path = _write(tmp_path / "utf8.csv")
+    with open(path, 'rb') as f:
+        expected = hashlib.sha256(f.read()).hexdigest()
+    assert scan_file(path, block_size=3) == (expected, 'utf-8')
+    assert scan_file(_write(tmp_path / "latin.csv", encoding='latin-1'), block_size=3)[1] == 'latin-1'
+
+def test_dimension_is_deduplicated_and_keyed(tmp_path):
+    csv_path = _write(tmp_path / "cadop.csv", encoding='latin-1')
+    dimension = CadastreDimension(str(tmp_path / "cache")).load(csv_path)
+
+    assert dimension.index.name == 'REGISTRO_OPERADORA'
+    assert list(dimension.index) == ['111111', '222222']
+    # First occurrence wins, and the Latin-1 accents were decoded on the first parse
+    assert dimension.loc['111111', 'Razao_Social'] == 'Saúde Ação Ltda'
+    assert 'Nome_Fantasia' not in dimension.columns
+
+def test_unchanged_cadastre_is_parsed_once(tmp_path):
+    csv_path = _write(tmp_path / "cadop.csv")
+    CadastreDimension(str(tmp_path / "cache")).load(csv_path)
+
+    # Also a new mtime with the same content (re-download) reuses the dimension
+    os.utime(csv_path, (1_000_000_000, 1_000_000_000))
+    with patch("src.services.cadastre.pd.read_csv") as mock_read_csv:
+        dimension = CadastreDimension(str(tmp_path / "cache")).load(csv_path)
+
+    mock_read_csv.assert_not_called()
+    assert len(dimension) == 2
+
+def test_new_release_rebuilds_dimension(tmp_path):
+    csv_path = _write(tmp_path / "cadop.csv")
+    dimension = CadastreDimension(str(tmp_path / "cache"))
+    dimension.load(csv_path)
+
+    _write(csv_path, content=CADASTRE + "\n333333;11222333000181;Nova;W;Odontologia;BA")
+
+    assert list(dimension.load(csv_path).index) == ['111111', '222222', '333333']
+
+def test_missing_cadastre_returns_none(tmp_path):
+    assert CadastreDimension(str(tmp_path / "cache")).load(str(tmp_path / "missing.csv")) is None
@@ -0,0 +1,105 @@
+import logging
+import pytest
+import pandas as pd
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.services.dag_runner import DagError, DagRunner, Stage
+
+def _stages(calls, factor=2, raw_values=(1, 2, 3)):
+    """raw (volatile source) -> doubled -> total"""
+    def raw(_):
+        calls.append('raw')
+        return pd.DataFrame({'v': list(raw_values)})
+
+    def doubled(inputs):
+        calls.append('doubled')
+        return inputs['raw'].assign(v=inputs['raw']['v'] * factor)
+
+    def total(inputs):
+        calls.append('total')
+        return pd.DataFrame({'total': [inputs['doubled']['v'].sum()]})
+
+    return [
+        Stage('raw', raw, volatile=True),
+        Stage('doubled', doubled, deps=['raw'], code=[DagRunner], params={'factor': factor}),
+        Stage('total', total, deps=['doubled']),
+    ]
+
+def test_unchanged_stages_are_skipped(tmp_path):
+    calls = []
+    assert DagRunner(_stages(calls), state_dir=str(tmp_path)).run() == {'raw': 'ran', 'doubled': 'ran', 'total': 'ran'}
+
+    # The volatile source runs again, but produces the same content: nothing downstream runs
+    calls.clear()
+    report = DagRunner(_stages(calls), state_dir=str(tmp_path)).run()
+    assert report == {'raw': 'ran', 'doubled': 'skipped', 'total': 'skipped'}
+    assert calls == ['raw']
+
+def test_changed_params_rerun_the_stage_and_its_dependents(tmp_path):
+    DagRunner(_stages([]), state_dir=str(tmp_path)).run()
+
+    calls = []
+    runner = DagRunner(_stages(calls, factor=3), state_dir=str(tmp_path))
+    assert runner.run() == {'raw': 'ran', 'doubled': 'ran', 'total': 'ran'}
+    assert runner._load_output('total')['total'].tolist() == [18]
+
+def test_changed_source_content_invalidates_dependents(tmp_path):
+    DagRunner(_stages([]), state_dir=str(tmp_path)).run()
+
+    report = DagRunner(_stages([], raw_values=(1, 2, 4)), state_dir=str(tmp_path)).run()
+    assert report == {'raw': 'ran', 'doubled': 'ran', 'total': 'ran'}
+
+def test_from_and_until_select_stages(tmp_path):
+    DagRunner(_stages([]), state_dir=str(tmp_path)).run()
+
+    calls = []
+    report = DagRunner(_stages(calls, factor=5), state_dir=str(tmp_path)).run(start='doubled', until='doubled')
+    assert report == {'raw': 'reused', 'doubled': 'ran', 'total': 'not run'}
+    assert calls == ['doubled']
+
+    calls.clear()
+    report = DagRunner(_stages(calls, factor=5), state_dir=str(tmp_path)).run(start='total', force=True)
+    assert report == {'raw': 'reused', 'doubled': 'reused', 'total': 'ran'}
+    assert calls == ['total']
+
+def test_from_without_saved_upstream_fails(tmp_path):
+    with pytest.raises(DagError):
+        DagRunner(_stages([]), state_dir=str(tmp_path)).run(start='total')
+
+def test_stage_without_output_fails(tmp_path):
+    stages = [Stage('raw', lambda _: None, volatile=True)]
+    with pytest.raises(DagError, match="produced no output"):
+        DagRunner(stages, state_dir=str(tmp_path)).run()
+
+@patch('src.main.ParsedZipCache', MagicMock())
+@patch('src.main.AnsDataClient', MagicMock())
+def test_main_aborts_a_from_without_saved_outputs(tmp_path, caplog):
+    from src import main
+
+    with patch('src.main.DagRunner', side_effect=lambda stages: DagRunner(stages, state_dir=str(tmp_path))):
+        assert main.run_pipeline(main.parse_args(['--from', 'validate']), logging.getLogger(__name__)) is None
+    assert "No saved output for stage" in caplog.text and "Aborting" in caplog.text
+
+def test_dependencies_must_come_first(tmp_path):
+    with pytest.raises(ValueError):
+        DagRunner([Stage('b', MagicMock(), deps=['a']), Stage('a', MagicMock())], state_dir=str(tmp_path))
+
+def test_only_latest_output_is_kept(tmp_path):
+    DagRunner(_stages([]), state_dir=str(tmp_path)).run()
+    DagRunner(_stages([], factor=3), state_dir=str(tmp_path)).run()
+
+    outputs = [name for name in os.listdir(tmp_path) if name.startswith('doubled-')]
+    assert len(outputs) == 1
+
+def test_pipeline_stages_hash_the_shared_schema_module():
+    """Every stage that reads or writes fact frames depends on src/utils/schema.py."""
+    from src.main import build_stages, parse_args
+    from src.utils.schema import compact_facts
+
+    stages = {stage.name: stage for stage in build_stages(parse_args(['--dag']), MagicMock(), MagicMock())}
+    for name in ('ingest', 'consolidate', 'enrich', 'validate', 'aggregate'):
+        assert compact_facts in stages[name].code
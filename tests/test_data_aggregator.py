@@ -1,8 +1,10 @@
 import unittest
 from unittest.mock import patch
+import numpy as np
 import pandas as pd
 import os
 import sys
+import tempfile
 
 # Add project root to sys.path to ensure correct imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -49,7 +51,9 @@ class TestDataAggregator(unittest.TestCase):
         expected_zip = os.path.join(self.output_dir, 'ans_financial_export.zip')
         self.assertEqual(result_file, expected_zip)
         
-        mock_to_csv.assert_called_once()
+        # despesas_agregadas.csv, then the UF, Modalidade and quarter rollups
+        self.assertEqual(mock_to_csv.call_count, 4)
+        self.assertEqual(mock_to_csv.call_args_list[0].args[0], expected_output)
         
         # Verify if ZIP creation was attempted (mocked execution)
         mock_zipfile.assert_called_once()
@@ -83,8 +87,162 @@ class TestDataAggregator(unittest.TestCase):
 
         self.aggregator.aggregate_data(self.sample_csv_path)
 
-        mock_to_csv.assert_called_once()
+        self.assertEqual(mock_to_csv.call_count, 4)
         mock_zipfile.assert_called_once()
 
+    @patch("src.services.data_aggregator.zipfile.ZipFile")
+    @patch("src.services.data_aggregator.read_frame")
+    @patch("src.services.data_aggregator.pd.read_csv")
+    @patch("src.services.data_aggregator.pd.DataFrame.to_csv")
+    def test_parquet_input_reads_only_needed_columns(self, mock_to_csv, mock_read_csv, mock_read_frame, mock_zipfile):
+        """A Parquet hand-off is read with column projection instead of parsing CSV text."""
+        mock_read_frame.return_value = pd.DataFrame({
+            'RazaoSocial': ['Op X'],
+            'UF': ['MG'],
+            'ValorDespesas': [10.0],
+            'DATA': ['2025-01-01'],
+            'REG_ANS': ['333'],
+            'Modalidade': ['Coop']
+        })
+
+        self.aggregator.aggregate_data("data_clean.parquet")
+
+        mock_read_frame.assert_called_once_with("data_clean.parquet", columns=DataAggregator.INPUT_COLUMNS)
+        mock_read_csv.assert_not_called()
+        self.assertEqual(mock_to_csv.call_count, 4)
+
+    def test_cube_matches_row_level_aggregation(self):
+        """The operator table derived from the cube equals the former two-groupby computation."""
+        rng = np.random.default_rng(7)
+        n = 2000
+        operators = pd.DataFrame({
+            'REG_ANS': ['100', '200', '300', '400', '500'],
+            'RazaoSocial': ['A', 'B', 'C', 'D', 'E'],
+            'UF': ['SP', 'RJ', 'SP', 'MG', 'RJ'],
+            'Modalidade': ['Grupo', 'Coop', 'Coop', 'Odonto', 'Grupo'],
+        })
+        df = operators.iloc[rng.integers(0, 5, n)].reset_index(drop=True)
+        df['DATA'] = rng.choice(['2024-10-01', '2025-01-01', '2025-04-01', '2025-07-01'], n)
+        df['ValorDespesas'] = rng.normal(1000, 300, n).round(2)
+        # Operator 500 only appears in older quarters, 400 has a single row in the snapshot
+        df = df[~((df['REG_ANS'] == '500') & (df['DATA'] == '2025-07-01'))]
+        df = df[~((df['REG_ANS'] == '400') & (df['DATA'] == '2025-07-01'))]
+        df = pd.concat([df, pd.DataFrame([{**operators.iloc[3], 'DATA': '2025-07-01', 'ValorDespesas': 42.0}])],
+                       ignore_index=True)
+
+        result = self.aggregator.aggregate_frame(df.copy())
+        expected = _row_level_reference(df.copy())
+
+        self.assertEqual(result['Registro_ANS'].tolist(), expected['Registro_ANS'].tolist())
+        self.assertEqual(result['Qtd_Trimestres_Ativos'].tolist(), expected['Qtd_Trimestres_Ativos'].tolist())
+        for col in ['Valor_total_Despesas', 'Desvio_padrao_Despesas', 'Media_Despesas_Por_Trimestre']:
+            np.testing.assert_allclose(result[col].to_numpy(), expected[col].to_numpy(), rtol=1e-9)
+
+    def test_rollups_from_partials(self):
+        """UF/Modalidade/grand total rollups equal direct groupbys over the snapshot rows."""
+        df = pd.DataFrame({
+            'REG_ANS': ['1', '1', '2', '3', '3', '3'],
+            'RazaoSocial': ['A', 'A', 'B', 'C', 'C', 'C'],
+            'UF': ['SP', 'SP', 'SP', 'RJ', 'RJ', 'RJ'],
+            'Modalidade': ['Grupo', 'Grupo', 'Coop', 'Grupo', 'Grupo', 'Grupo'],
+            'DATA': ['2025-04-01', '2025-04-01', '2025-04-01', '2025-04-01', '2025-04-01', '2025-01-01'],
+            'ValorDespesas': [10.0, 30.0, 5.0, 7.0, 9.0, 1000.0],
+        })
+        self.aggregator.aggregate_frame(df.copy())
+        cube = self.aggregator.last_cube
+
+        by_uf = cube.by_uf().set_index('UF')
+        self.assertEqual(by_uf.loc['SP', 'Valor_total_Despesas'], 45.0)
+        self.assertEqual(by_uf.loc['SP', 'Qtd_Operadoras'], 2)
+        self.assertAlmostEqual(by_uf.loc['SP', 'Desvio_padrao_Despesas'], pd.Series([10.0, 30.0, 5.0]).std())
+        self.assertEqual(by_uf.loc['RJ', 'Valor_total_Despesas'], 16.0)
+
+        by_modalidade = cube.by_modalidade().set_index('Modalidade')
+        self.assertEqual(by_modalidade.loc['Grupo', 'Valor_total_Despesas'], 56.0)
+
+        by_quarter = cube.by_quarter().set_index('Trimestre')
+        self.assertEqual(by_quarter.loc['2025Q1', 'Valor_total_Despesas'], 1000.0)
+        self.assertEqual(by_quarter.loc['2025Q2', 'Qtd_Registros'], 5)
+        self.assertEqual(by_quarter.loc['2025Q2', 'Qtd_Operadoras'], 3)
+
+        total = cube.grand_total()
+        self.assertEqual(total['sum'], 61.0)
+        self.assertAlmostEqual(total['std'], pd.Series([10.0, 30.0, 5.0, 7.0, 9.0]).std())
+
+    def test_quarter_rollup_is_exported(self):
+        """despesas_por_trimestre.csv has one line per quarter of the history, oldest first."""
+        df = pd.DataFrame({
+            'REG_ANS': ['1', '2', '1'],
+            'RazaoSocial': ['A', 'B', 'A'],
+            'UF': ['SP', 'RJ', 'SP'],
+            'Modalidade': ['Grupo', 'Coop', 'Grupo'],
+            'DATA': ['2025-04-01', '2025-04-01', '2025-01-01'],
+            'ValorDespesas': [10.0, 30.0, 1000.0],
+        })
+        self.aggregator.aggregate_frame(df.copy())
+
+        with tempfile.TemporaryDirectory() as tmp:
+            aggregator = DataAggregator(output_dir=tmp)
+            paths = aggregator.export_rollups(self.aggregator.last_cube)
+            path = os.path.join(tmp, 'despesas_por_trimestre.csv')
+            self.assertIn(path, paths)
+            exported = pd.read_csv(path, sep=';', encoding='utf-8')
+
+        self.assertEqual(list(exported['Trimestre']), ['2025Q1', '2025Q2'])
+        self.assertEqual(list(exported['Qtd_Operadoras']), [1, 2])
+        self.assertEqual(list(exported['Valor_total_Despesas']), [1000.0, 40.0])
+        self.assertEqual(list(exported['Media_Despesas_Por_Operadora']), [1000.0, 20.0])
+
+    def test_incremental_folding_matches_full_recompute(self):
+        """Folding quarter by quarter into the saved state gives the full-history result."""
+        rng = np.random.default_rng(11)
+        quarters = {'2024Q4': '2024-10-01', '2025Q1': '2025-01-01', '2025Q2': '2025-04-01'}
+        frames = {}
+        for key, date in quarters.items():
+            n = 300
+            frames[key] = pd.DataFrame({
+                'REG_ANS': rng.choice(['1', '2', '3'], n),
+                'DATA': date,
+                'ValorDespesas': rng.normal(500, 100, n),
+            })
+            frames[key]['RazaoSocial'] = 'Op ' + frames[key]['REG_ANS']
+            frames[key]['UF'] = 'SP'
+            frames[key]['Modalidade'] = 'Grupo'
+
+        with tempfile.TemporaryDirectory() as tmp:
+            state_path = os.path.join(tmp, 'state.parquet')
+            for key, frame in frames.items():
+                incremental = self.aggregator.aggregate_incremental(frame.copy(), [key], state_path=state_path)
+            self.assertEqual(self.aggregator.folded_quarters(state_path), set(quarters))
+
+            # A republished quarter replaces its partials instead of adding to them
+            republished = frames['2025Q2'].assign(ValorDespesas=frames['2025Q2']['ValorDespesas'] * 2)
+            frames['2025Q2'] = republished
+            incremental = self.aggregator.aggregate_incremental(republished.copy(), ['2025Q2'], state_path=state_path)
+
+            # Restricting to a window only keeps its quarters
+            windowed = self.aggregator.aggregate_incremental(None, [], window=['2025Q1', '2025Q2'], state_path=state_path)
+
+        full = self.aggregator.aggregate_frame(pd.concat(frames.values(), ignore_index=True))
+        pd.testing.assert_frame_equal(incremental.reset_index(drop=True), full.reset_index(drop=True))
+        self.assertEqual(windowed['Qtd_Trimestres_Ativos'].max(), 2)
+
+
+
+def _row_level_reference(df):
+    """The former aggregation: sum/std groupby on the snapshot + nunique quarters, merged."""
+    df['DATA'] = pd.to_datetime(df['DATA'])
+    df['Quarter'] = df['DATA'].dt.to_period('Q').astype(str)
+    keys = ['REG_ANS', 'RazaoSocial', 'UF', 'Modalidade']
+    snapshot = df[df['DATA'] == df['DATA'].max()]
+    summary = snapshot.groupby(keys)['ValorDespesas'].agg(
+        Valor_total_Despesas='sum', Desvio_padrao_Despesas='std').reset_index()
+    summary['Desvio_padrao_Despesas'] = summary['Desvio_padrao_Despesas'].fillna(0)
+    quarters = df.groupby(keys)['Quarter'].nunique().reset_index(name='Qtd_Trimestres_Ativos')
+    summary = pd.merge(summary, quarters, on=keys)
+    summary['Media_Despesas_Por_Trimestre'] = summary['Valor_total_Despesas'] / summary['Qtd_Trimestres_Ativos']
+    summary = summary.sort_values(by='Valor_total_Despesas', ascending=False)
+    return summary.rename(columns={'REG_ANS': 'Registro_ANS', 'RazaoSocial': 'Razao_Social'})
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -71,4 +71,17 @@ def test_consolidator_logic(mock_dirty_data, tmp_path):
     
     # Rule: Check if the extra columns were added (even if empty)
     assert 'CNPJ' in result_df.columns
-    assert 'RazaoSocial' in result_df.columns
\ No newline at end of file
+    assert 'RazaoSocial' in result_df.columns
+
+def test_consolidator_returns_parquet_handoff(mock_dirty_data, tmp_path):
+    consolidator = DataConsolidator(output_dir=str(tmp_path))
+
+    path = consolidator.consolidate(mock_dirty_data)
+
+    # The typed hand-off keeps the numeric dtypes (no text round trip)
+    assert path == str(tmp_path / "consolidado_despesas.parquet")
+    df = pd.read_parquet(path)
+    assert len(df) == 2
+    assert df['ValorDespesas'].dtype == 'Int64'  # centavos
+    assert df['ValorDespesas'].tolist() == [50000, -10000]
+    assert pd.api.types.is_numeric_dtype(df['Ano'])
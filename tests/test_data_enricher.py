@@ -8,6 +8,7 @@ import zipfile
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.services.data_enricher import DataEnricher
+from src.services.cadastre import CadastreDimension
 
 @pytest.fixture
 def mock_financial_zip(tmp_path):
@@ -44,7 +45,7 @@ def test_enrichment_logic(mock_financial_zip, mock_cadastral_csv, tmp_path):
     2. Fills CNPJ and RazaoSocial
     3. Handles missing keys (Left Join)
     """
-    enricher = DataEnricher(output_dir=str(tmp_path))
+    enricher = DataEnricher(output_dir=str(tmp_path), dimension=CadastreDimension(str(tmp_path / "cadastre_cache")))
     
     # Run
     output_file = enricher.enrich_data(mock_financial_zip, mock_cadastral_csv)
@@ -70,4 +71,80 @@ def test_enrichment_logic(mock_financial_zip, mock_cadastral_csv, tmp_path):
     assert row_ghost['UF'] == 'ND'
     
     # Verify Total Rows (Should match Financial Input = 3)
-    assert len(df) == 3
\ No newline at end of file
+    assert len(df) == 3
+
+def test_enrichment_parquet_handoff(mock_financial_zip, mock_cadastral_csv, tmp_path):
+    """A Parquet input is enriched into a Parquet output, keeping the value dtype."""
+    financial = pd.read_csv(mock_financial_zip, sep=';', compression='zip', dtype={'REG_ANS': str})
+    parquet_path = tmp_path / "consolidado_despesas.parquet"
+    financial.to_parquet(parquet_path, index=False)
+
+    enricher = DataEnricher(output_dir=str(tmp_path), dimension=CadastreDimension(str(tmp_path / "cadastre_cache")))
+    output_file = enricher.enrich_data(str(parquet_path), mock_cadastral_csv)
+
+    assert output_file.endswith("enriched_data.parquet")
+    df = pd.read_parquet(output_file)
+    assert len(df) == 3
+    assert pd.api.types.is_float_dtype(df['ValorDespesas'])
+    assert df.loc[df['REG_ANS'] == '222222', 'UF'].iloc[0] == 'RJ'
+
+
+def test_enrich_frame_matches_file_based_enrichment(mock_financial_zip, mock_cadastral_csv, tmp_path):
+    """The in-memory API yields the same rows as the path-based one."""
+    enricher = DataEnricher(output_dir=str(tmp_path), dimension=CadastreDimension(str(tmp_path / "cadastre_cache")))
+    df_fin = pd.read_csv(mock_financial_zip, sep=';', compression='zip', dtype=str)
+
+    in_memory = enricher.enrich_frame(df_fin, enricher.load_cadastre(mock_cadastral_csv))
+    from_file = pd.read_csv(enricher.enrich_data(mock_financial_zip, mock_cadastral_csv),
+                            sep=';', compression='zip', dtype=str, keep_default_na=False)
+
+    assert list(in_memory.columns) == list(from_file.columns)
+    assert in_memory['UF'].tolist() == from_file['UF'].tolist()
+    # The CSV round trip writes missing CNPJs as empty text
+    assert in_memory['CNPJ'].astype(object).fillna('').tolist() == from_file['CNPJ'].tolist()
+
+
+def _merge_reference(df_fin, df_cad):
+    """The former pd.merge based enrichment, kept as the reference for the index-mapped join."""
+    df_fin = df_fin.copy()
+    df_fin['REG_ANS'] = df_fin['REG_ANS'].str.strip()
+    df_cad = df_cad.copy()
+    df_cad['REGISTRO_OPERADORA'] = df_cad['REGISTRO_OPERADORA'].str.strip()
+    df_cad = df_cad.drop_duplicates(subset=['REGISTRO_OPERADORA'])
+    merged = pd.merge(df_fin, df_cad, left_on='REG_ANS', right_on='REGISTRO_OPERADORA', how='left')
+    merged['CNPJ'] = merged['CNPJ_y'].fillna(merged['CNPJ_x'])
+    merged['RazaoSocial'] = merged['Razao_Social'].fillna(merged['RazaoSocial'])
+    merged['Modalidade'] = merged['Modalidade'].fillna('DESCONHECIDO')
+    merged['UF'] = merged['UF'].fillna('ND')
+    merged['CNPJ'] = merged['CNPJ'].astype(str).str.replace(r'\.0$', '', regex=True).replace('nan', '')
+    mask = merged['CNPJ'].notna() & (merged['CNPJ'] != '')
+    merged.loc[mask, 'CNPJ'] = merged.loc[mask, 'CNPJ'].str.zfill(14)
+    cols = ['DATA', 'REG_ANS', 'CD_CONTA_CONTABIL', 'DESCRICAO', 'ValorDespesas', 'CNPJ', 'RazaoSocial', 'UF', 'Modalidade']
+    return merged[[c for c in cols if c in merged.columns]]
+
+
+def test_index_mapped_join_matches_merge(tmp_path):
+    df_fin = pd.DataFrame({
+        'DATA': ['2025-01-01'] * 6,
+        'REG_ANS': ['111111', ' 222222', '999999', '111111', '333333', '444444'],
+        'CD_CONTA_CONTABIL': ['1'] * 6,
+        'DESCRICAO': ['D'] * 6,
+        'ValorDespesas': [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+        'CNPJ': [None, None, '1685053000156', None, None, None],
+        'RazaoSocial': [None, None, 'Fallback Name', None, None, None],
+    })
+    df_cad = pd.DataFrame({
+        'REGISTRO_OPERADORA': ['111111', '222222 ', '111111', '333333', '444444'],
+        'CNPJ': ['12345678000199', '1685053000156', '00000000000000', None, '6990590000123.0'],
+        'Razao_Social': ['Um', 'Dois', 'Duplicado', 'Tres', None],
+        'Modalidade': ['Grupo', None, 'X', 'Coop', 'Odonto'],
+        'UF': ['SP', 'RJ', 'MG', None, 'BA'],
+    })
+    enricher = DataEnricher(output_dir=str(tmp_path), dimension=CadastreDimension(str(tmp_path / "cadastre_cache")))
+
+    result = enricher.enrich_frame(df_fin, df_cad)
+    expected = _merge_reference(df_fin, df_cad)
+
+    assert list(result.columns) == list(expected.columns)
+    for col in expected.columns:
+        assert result[col].fillna('<NA>').astype(str).tolist() == expected[col].fillna('<NA>').astype(str).tolist(), col
@@ -3,6 +3,7 @@ from unittest.mock import patch, MagicMock, ANY
 import pandas as pd
 import os
 import sys
+import tempfile
 
 # Add project root to sys.path to ensure correct imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -97,3 +98,78 @@ class TestDataValidator(unittest.TestCase):
         # If we truly wanted to verify the split, we could mock `to_csv` to capture the df.
         
         self.assertEqual(mock_to_csv.call_count, 2)
+
+    def test_parquet_input_writes_parquet_clean_file(self):
+        """A Parquet hand-off yields a Parquet clean file; the quarantine stays a CSV."""
+        with tempfile.TemporaryDirectory() as tmp:
+            input_path = os.path.join(tmp, 'enriched_data.parquet')
+            pd.DataFrame({
+                'CNPJ': ['06990590000123', '000'],
+                'RazaoSocial': ['Ok Ltd', 'Ok Ltd'],
+                'ValorDespesas': [50.0, 50.0],
+            }).to_parquet(input_path, index=False)
+
+            clean_path, quarantine_path = DataValidator(output_dir=tmp).validate_and_split(input_path)
+
+            self.assertEqual(clean_path, os.path.join(tmp, 'data_clean.parquet'))
+            self.assertTrue(quarantine_path.endswith('.csv'))
+            clean = pd.read_parquet(clean_path)
+            self.assertEqual(len(clean), 1)
+            # Integer centavos from the validation on (see utils.schema)
+            self.assertEqual(clean['ValorDespesas'].tolist(), [5000])
+
+    @patch("src.services.data_validator.pd.DataFrame.to_csv")
+    def test_validate_frame_returns_frames_without_io(self, mock_to_csv):
+        """The in-memory API splits the rows and writes nothing."""
+        df = pd.DataFrame({
+            'CNPJ': ['06990590000123', '000'],
+            'RazaoSocial': ['Ok Ltd', 'Ok Ltd'],
+            'ValorDespesas': [50.0, 50.0],
+        })
+
+        clean_df, quarantine_df = self.validator.validate_frame(df)
+
+        self.assertEqual(len(clean_df), 1)
+        self.assertEqual(quarantine_df['validation_mask'].tolist(), [1])
+        self.assertEqual(self.validator.last_rule_counts, {'cnpj': 1, 'razao_social': 0, 'positive_value': 0})
+        mock_to_csv.assert_not_called()
+
+    def test_quarantine_reasons_expanded_on_save(self):
+        """The bitmask becomes the readable 'validation_errors' text only in the quarantine file."""
+        df = pd.DataFrame({
+            'CNPJ': ['06990590000123', '000', '000'],
+            'RazaoSocial': ['Ok Ltd', '', 'Ok Ltd'],
+            'ValorDespesas': [50.0, 0.0, 10.0],
+        })
+        with tempfile.TemporaryDirectory() as tmp:
+            validator = DataValidator(output_dir=tmp)
+            _, quarantine_df = validator.validate_frame(df)
+            path = validator.save_quarantine(quarantine_df)
+
+            saved = pd.read_csv(path, sep=';', dtype=str)
+
+        self.assertNotIn('validation_mask', saved.columns)
+        self.assertEqual(saved['validation_errors'].tolist(), [
+            'Invalid CNPJ; Missing Razao Social; Non-Positive Value; ',
+            'Invalid CNPJ; ',
+        ])
+
+    def test_custom_rule_is_registered(self):
+        """New rules plug into the engine without touching the validator."""
+        from src.services.validation_rules import RuleEngine, ValidationRule, default_rules
+
+        engine = RuleEngine(default_rules() + [
+            ValidationRule('uf', 'Unknown UF', lambda df: df['UF'] != 'ND'),
+        ])
+        df = pd.DataFrame({
+            'CNPJ': ['06990590000123', '06990590000123'],
+            'RazaoSocial': ['Ok Ltd', 'Ok Ltd'],
+            'ValorDespesas': [50.0, 50.0],
+            'UF': ['SP', 'ND'],
+        })
+
+        clean_df, quarantine_df = DataValidator(output_dir=self.output_dir, rules=engine).validate_frame(df)
+
+        self.assertEqual(clean_df['UF'].tolist(), ['SP'])
+        self.assertEqual(quarantine_df['validation_mask'].tolist(), [8])
+        self.assertEqual(engine.reasons(quarantine_df['validation_mask']).tolist(), ['Unknown UF; '])
@@ -0,0 +1,146 @@
+import pytest
+import os
+import sys
+from unittest.mock import MagicMock, patch
+from sqlalchemy import create_engine, inspect, text
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.generator import generate
+from src import main
+from src.services.cadastre import CadastreDimension
+from src.services.data_consolidator import DataConsolidator
+from src.services import db_loader
+from src.services.db_loader import DatabaseLoader
+from src.services.ingestion import IngestionService
+
+@pytest.fixture
+def outputs(tmp_path):
+    """Consolidated export + operator dimension of a small synthetic run."""
+    files = generate(str(tmp_path / "data"), seed=5, operators=60, accounts=20, quarters=2, rows_per_quarter=1000,
+                     missing_cadastre_share=0.1)
+    consolidator = DataConsolidator(str(tmp_path / "out"))
+    consolidated = consolidator.consolidate_frame(IngestionService(cache=None).ingest_from_files(files['zips']))
+    consolidator.export(consolidated)
+    dimension = CadastreDimension(str(tmp_path / "cadastre")).load(files['cadastre'])
+    return str(tmp_path / "out" / "consolidado_despesas.zip"), consolidated, dimension
+
+def _engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'ans.db'}")
+
+def _expected(consolidated, dimension):
+    known = consolidated['REG_ANS'].astype('str').isin(CadastreDimension.by_number(dimension).index.astype('str'))
+    return consolidated[known]
+
+def test_loads_operators_and_expenses_of_known_operators(tmp_path, outputs):
+    export, consolidated, dimension = outputs
+    engine = _engine(tmp_path)
+    loader = DatabaseLoader(engine, batch_rows=100)
+
+    stats = loader.load(dimension, loader.read_export(export, chunk_rows=250))
+
+    expected = _expected(consolidated, dimension)
+    assert 0 < len(expected) < len(consolidated)  # some operators are missing from the cadastre
+    assert stats['rows'] == len(expected)
+    assert stats['skipped_rows'] == len(consolidated) - len(expected)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM dim_operadoras")).scalar() == len(dimension)
+        total = conn.execute(text("SELECT SUM(vl_saldo_final * 100) FROM fact_despesas_eventos")).scalar()
+        orphans = conn.execute(text(
+            "SELECT COUNT(*) FROM fact_despesas_eventos WHERE reg_ans NOT IN (SELECT reg_ans FROM dim_operadoras)"
+        )).scalar()
+    assert round(total) == int(expected['ValorDespesas'].sum())  # centavos
+    assert orphans == 0
+
+def test_reload_replaces_the_quarters(tmp_path, outputs):
+    export, consolidated, dimension = outputs
+    engine = _engine(tmp_path)
+    loader = DatabaseLoader(engine, batch_rows=100)
+
+    loader.load(dimension, [consolidated.copy()])
+    # Only the last quarter again: its rows are replaced, the other quarter is kept
+    last = consolidated[consolidated['DATA'] == consolidated['DATA'].cat.categories.max()]
+    loader.load(dimension, [last.copy()])
+
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT COUNT(*) FROM fact_despesas_eventos")).scalar()
+    assert rows == len(_expected(consolidated, dimension))
+
+def test_indexes_are_rebuilt_after_the_load(tmp_path, outputs):
+    export, consolidated, dimension = outputs
+    engine = _engine(tmp_path)
+    loader = DatabaseLoader(engine)
+
+    # The index behind the foreign key is kept during the load
+    assert [index.name for index in loader.deferred_indexes()] == ['idx_despesas_data']
+    loader.load(dimension, [consolidated.copy()])
+
+    names = {index['name'] for index in inspect(engine).get_indexes('fact_despesas_eventos')}
+    assert names >= {'idx_despesas_data', 'idx_despesas_reg'}
+
+def test_parallel_batches_load_every_row(tmp_path, outputs):
+    export, consolidated, dimension = outputs
+    engine = create_engine(f"sqlite:///{tmp_path / 'ans.db'}", connect_args={'timeout': 30})
+    loader = DatabaseLoader(engine, batch_rows=50)
+    loader.workers = 3  # SQLite serializes the writers, but every batch must land once
+
+    stats = loader.load(dimension, loader.read_export(export, chunk_rows=200))
+
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT COUNT(*) FROM fact_despesas_eventos")).scalar()
+    assert rows == stats['rows'] == len(_expected(consolidated, dimension))
+
+def _leaf_totals(conn):
+    # What /api/estatisticas used to compute from the fact table
+    return dict(((str(quarter), reg_ans), round(total, 2)) for quarter, reg_ans, total in conn.execute(text(
+        "SELECT data_trimestre, reg_ans, SUM(vl_saldo_final) FROM fact_despesas_eventos "
+        "WHERE LENGTH(conta_contabil) = 9 GROUP BY data_trimestre, reg_ans")))
+
+def test_summaries_match_the_fact_table(tmp_path, outputs):
+    export, consolidated, dimension = outputs
+    engine = _engine(tmp_path)
+    loader = DatabaseLoader(engine)
+
+    loader.load(dimension, [consolidated.copy()])
+    # A reload of one quarter refreshes its summaries only, the totals stay the same
+    last = consolidated[consolidated['DATA'] == consolidated['DATA'].cat.categories.max()]
+    loader.load(dimension, [last.copy()])
+
+    with engine.connect() as conn:
+        expected = _leaf_totals(conn)
+        summary = dict(((str(quarter), reg_ans), round(total, 2)) for quarter, reg_ans, total in conn.execute(text(
+            "SELECT data_trimestre, reg_ans, total_despesas FROM agg_despesas_operadora")))
+        by_uf = conn.execute(text(
+            "SELECT SUM(total_despesas), SUM(num_operadoras) FROM agg_despesas_uf")).one()
+    assert expected and summary == pytest.approx(expected)
+    assert by_uf[0] == pytest.approx(sum(expected.values()))
+    assert by_uf[1] == len(expected)
+
+def test_summary_backfill_on_an_existing_database(tmp_path, outputs):
+    """A database loaded before the summaries existed gets them from `python -m src.services.db_loader`."""
+    export, consolidated, dimension = outputs
+    engine = _engine(tmp_path)
+    DatabaseLoader(engine).load(dimension, [consolidated.copy()])
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE agg_despesas_uf"))
+        conn.execute(text("DROP TABLE agg_despesas_operadora"))
+
+    assert db_loader.main(['--url', str(engine.url)]) == 0
+
+    with engine.connect() as conn:
+        expected = _leaf_totals(conn)
+        total = conn.execute(text("SELECT SUM(total_despesas) FROM agg_despesas_uf")).scalar()
+    assert total == pytest.approx(sum(expected.values()))
+
+@patch('src.main.RunTelemetry', MagicMock())
+@patch('src.main.AnsDataClient', MagicMock())
+def test_load_db_only_loads_the_export_of_this_run():
+    with patch('src.main.load_database') as load_database:
+        # Aborted run: a leftover export of an earlier run must not be loaded
+        with patch('src.main.run_pipeline', return_value=None):
+            main.main(['--load-db'])
+        load_database.assert_not_called()
+
+        with patch('src.main.run_pipeline', return_value='output/consolidado_despesas.zip'):
+            main.main(['--load-db'])
+        assert load_database.call_args.args[-1] == 'output/consolidado_despesas.zip'
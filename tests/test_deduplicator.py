@@ -0,0 +1,77 @@
+import pytest
+import numpy as np
+import pandas as pd
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.services.deduplicator import FingerprintDeduplicator
+
+def _records(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'REG_ANS': rng.choice(['111111', '222222', '333333'], n),
+        'DATA': pd.to_datetime(rng.choice(['2025-01-01', '2025-04-01'], n)),
+        'CD_CONTA_CONTABIL': rng.choice(['411', '412'], n),
+        'ValorDespesas': rng.choice([10.0, -5.5, 20.25], n),
+        'DESCRICAO': rng.choice(['Eventos', 'Sinistros'], n),
+    })
+
+def test_matches_drop_duplicates_keep_first():
+    df = _records(500)
+    dedup = FingerprintDeduplicator()
+
+    keep = dedup.deduplicate(df)
+
+    expected = ~df.duplicated(subset=FingerprintDeduplicator.KEY_COLUMNS, keep='first')
+    assert keep.tolist() == expected.tolist()
+    stats = dedup.last_stats
+    assert stats['duplicate_rows'] == df.duplicated(subset=FingerprintDeduplicator.KEY_COLUMNS, keep=False).sum()
+    assert stats['kept'] + stats['dropped_in_batch'] + stats['dropped_seen_before'] == len(df)
+
+def test_chunks_are_deduplicated_against_previous_chunks():
+    df = _records(500, seed=1)
+    dedup = FingerprintDeduplicator()
+
+    keep = np.concatenate([dedup.deduplicate(df.iloc[i:i + 100]) for i in range(0, len(df), 100)])
+
+    expected = ~df.duplicated(subset=FingerprintDeduplicator.KEY_COLUMNS, keep='first')
+    assert keep.tolist() == expected.tolist()
+
+def test_seen_set_persists_between_runs(tmp_path):
+    seen_path = str(tmp_path / "seen.npy")
+    history, new_quarter = _records(50, seed=2), _records(50, seed=3)
+
+    first_run = FingerprintDeduplicator(seen_path=seen_path)
+    first_run.deduplicate(history)
+    first_run.save()
+
+    second_run = FingerprintDeduplicator(seen_path=seen_path)
+    keep = second_run.deduplicate(new_quarter)
+
+    combined = pd.concat([history, new_quarter], ignore_index=True)
+    expected = ~combined.duplicated(subset=FingerprintDeduplicator.KEY_COLUMNS, keep='first')
+    assert keep.tolist() == expected.iloc[len(history):].tolist()
+    assert second_run.last_stats['dropped_seen_before'] > 0
+
+def test_reprocessed_quarter_is_not_deduplicated_against_itself(tmp_path):
+    seen_path = str(tmp_path / "seen.npy")
+    quarter = _records(50, seed=2)
+
+    first_run = FingerprintDeduplicator(seen_path=seen_path)
+    first_run.deduplicate(quarter)
+    first_run.save(['2025Q1'])
+
+    # A new quarter keeps the history...
+    assert not FingerprintDeduplicator(seen_path=seen_path).forget(['2025Q2'])
+    # ...a republished one starts over, so its rows are kept again
+    republished = FingerprintDeduplicator(seen_path=seen_path)
+    assert republished.quarters == {'2025Q1'} and republished.forget(['2025Q1'])
+    assert republished.deduplicate(quarter).tolist() == (~quarter.duplicated(
+        subset=FingerprintDeduplicator.KEY_COLUMNS)).tolist()
+
+def test_remember_false_leaves_seen_set_untouched():
+    dedup = FingerprintDeduplicator()
+    dedup.deduplicate(_records(10), remember=False)
+    assert len(dedup.seen) == 0
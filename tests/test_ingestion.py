@@ -0,0 +1,64 @@
+import pytest
+import pandas as pd
+import os
+import sys
+import zipfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.services.ingestion import IngestionService
+
+def _make_zip(tmp_path, name, reg_ans):
+    csv_content = f"""DATA;REG_ANS;CD_CONTA_CONTABIL;DESCRICAO;VL_SALDO_FINAL
+2025-01-01;{reg_ans};411111111;Despesas com Eventos / Sinistros;100,50
+2025-01-01;{reg_ans};311111111;Outra Despesa;200,00"""
+    zip_path = tmp_path / name
+    with zipfile.ZipFile(zip_path, 'w') as zf:
+        zf.writestr("data.csv", csv_content.encode('utf-8'))
+    return str(zip_path)
+
+def test_ingest_overlapped_keeps_item_order(tmp_path):
+    """Files finishing out of order still come back in item order, with timings recorded."""
+    first = _make_zip(tmp_path, "1T2025.zip", "111111")
+    second = _make_zip(tmp_path, "2T2025.zip", "222222")
+
+    # Simulates AnsDataClient.iter_downloads: the second item finishes first, one download failed
+    downloads = iter([(1, second, 0.2), (2, None, 0.1), (0, first, 0.3)])
+
+    service = IngestionService()
+    df = service.ingest_overlapped(downloads, queue_size=1)
+
+    assert list(df['SOURCE_FILE']) == ["1T2025.zip", "2T2025.zip"]
+    assert list(df['REG_ANS']) == [111111, 222222]
+
+    stats = service.last_run_stats
+    assert stats['files'] == 3
+    assert stats['download_total'] == pytest.approx(0.6)
+    assert stats['wall'] > 0
+
+def test_ingest_overlapped_without_data(tmp_path):
+    """No successful download means no DataFrame."""
+    service = IngestionService()
+    assert service.ingest_overlapped(iter([(0, None, 0.1)])) is None
+
+def test_process_pool_matches_sequential(tmp_path):
+    """Worker processes keep the file order, tag SOURCE_FILE and isolate failures."""
+    files = [_make_zip(tmp_path, f"{q}T2025.zip", f"{q}00000") for q in (1, 2, 3)]
+    bad = tmp_path / "broken.zip"
+    bad.write_text("not a zip", encoding='utf-8')
+    paths = [files[0], str(bad), files[1], files[2]]
+
+    sequential = IngestionService(workers=1).ingest_from_files(paths)
+    parallel_each = IngestionService(workers=3).ingest_each(paths)
+    parallel = IngestionService(workers=3).ingest_from_files(paths)
+
+    assert parallel_each[1] is None
+    pd.testing.assert_frame_equal(parallel, sequential)
+    assert list(parallel['SOURCE_FILE']) == ["1T2025.zip", "2T2025.zip", "3T2025.zip"]
+
+def test_overlapped_with_worker_processes(tmp_path):
+    files = [_make_zip(tmp_path, f"{q}T2025.zip", f"{q}00000") for q in (1, 2)]
+    downloads = iter([(1, files[1], 0.0), (0, files[0], 0.0)])
+
+    df = IngestionService(workers=2).ingest_overlapped(downloads)
+    assert list(df['SOURCE_FILE']) == ["1T2025.zip", "2T2025.zip"]
@@ -0,0 +1,82 @@
+import pytest
+import pandas as pd
+import os
+import sys
+import time
+import zipfile
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.services.ingestion import IngestionService
+from src.services.parse_cache import ParsedZipCache
+
+def _write_zip(path, value="100,50"):
+    csv_content = f"""DATA;REG_ANS;CD_CONTA_CONTABIL;DESCRICAO;VL_SALDO_FINAL
+2025-01-01;123456;411111111;Despesas com Eventos / Sinistros;{value}
+2025-01-01;123456;311111111;Outra Despesa;200,00"""
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr("data.csv", csv_content.encode('utf-8'))
+    return str(path)
+
+def test_unchanged_zip_is_parsed_once(tmp_path):
+    zip_path = _write_zip(tmp_path / "1T2025.zip")
+    service = IngestionService(cache=ParsedZipCache(cache_dir=str(tmp_path / "cache")))
+
+    first = service.ingest_from_files([zip_path])
+    with patch.object(service.processor, 'process_zip', wraps=service.processor.process_zip) as spy:
+        second = service.ingest_from_files([zip_path])
+
+    spy.assert_not_called()
+    pd.testing.assert_frame_equal(first, second)
+    assert second.iloc[0]['VL_SALDO_FINAL'] == 10050  # centavos
+
+def test_changed_content_or_filter_is_reparsed(tmp_path):
+    zip_path = tmp_path / "1T2025.zip"
+    cache = ParsedZipCache(cache_dir=str(tmp_path / "cache"))
+    service = IngestionService(cache=cache)
+    service.ingest_from_files([_write_zip(zip_path)])
+
+    # Same name, new content (and a new mtime, set explicitly: coarse filesystem clocks)
+    _write_zip(zip_path, value="999,99")
+    later = os.stat(zip_path).st_mtime + 10
+    os.utime(zip_path, (later, later))
+    df = service.ingest_from_files([str(zip_path)])
+    assert df.iloc[0]['VL_SALDO_FINAL'] == 99999
+
+    # Different filter config -> different key
+    key = cache.key_for(str(zip_path), service.processor.filter_config())
+    assert cache.key_for(str(zip_path), {'description': 'other'}) != key
+
+def test_zip_without_matching_rows_is_cached(tmp_path):
+    zip_path = tmp_path / "1T2025.zip"
+    with zipfile.ZipFile(zip_path, 'w') as zf:
+        zf.writestr("data.csv", "DATA;REG_ANS;CD_CONTA_CONTABIL;DESCRICAO;VL_SALDO_FINAL\n"
+                                "2025-01-01;123456;311111111;Outra Despesa;200,00")
+    service = IngestionService(cache=ParsedZipCache(cache_dir=str(tmp_path / "cache")))
+
+    assert service.ingest_from_files([str(zip_path)]) is None
+    with patch.object(service.processor, 'process_zip', wraps=service.processor.process_zip) as spy:
+        assert service.ingest_from_files([str(zip_path)]) is None
+    spy.assert_not_called()
+
+def test_eviction_by_size_and_age(tmp_path):
+    cache = ParsedZipCache(cache_dir=str(tmp_path / "cache"), max_bytes=10 ** 9, max_age_days=1)
+    df = pd.DataFrame({'A': range(100)})
+
+    cache.put("old", df)
+    old_path = os.path.join(cache.cache_dir, "old.parquet")
+    two_days_ago = time.time() - 2 * 24 * 3600
+    os.utime(old_path, (two_days_ago, two_days_ago))
+
+    cache.put("fresh", df)
+    assert cache.get("old") is None
+    assert cache.get("fresh") is not None
+
+    # Size limit: only the most recently used entry survives
+    fresh_path = os.path.join(cache.cache_dir, "fresh.parquet")
+    os.utime(fresh_path, (time.time() - 60, time.time() - 60))
+    cache.max_bytes = os.path.getsize(fresh_path)
+    cache.put("newest", df)
+    assert cache.get("fresh") is None
+    assert cache.get("newest") is not None
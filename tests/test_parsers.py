@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+from src.utils.parsers import parse_br_decimal
+
+def _old_to_float(val):
+    """Reference: the per-cell helper previously used by ZipProcessor."""
+    if isinstance(val, str):
+        clean_val = val.replace('.', '').replace(',', '.')
+        try:
+            return float(clean_val)
+        except ValueError:
+            return 0.0
+    return val
+
+def test_parity_with_old_helper():
+    values = pd.Series(['1.234,56', '100,50', '-7,10', '0,00', '12', 'abc', '', None], dtype=str)
+
+    parsed, failed = parse_br_decimal(values)
+    expected = [_old_to_float(v) for v in values]
+
+    np.testing.assert_array_equal(parsed.to_numpy(), np.array(expected, dtype=float))
+    assert failed == 2  # 'abc' and ''
+
+def test_centavos_are_exact():
+    values = pd.Series(['1.234,56', '0,1', '-7,105', '92.233.720.368.547,75', None], dtype=str)
+
+    parsed, failed = parse_br_decimal(values, as_centavos=True)
+
+    assert parsed.dtype == 'Int64'
+    assert parsed.tolist()[:4] == [123456, 10, -711, 9223372036854775]
+    assert parsed.isna().tolist() == [False, False, False, False, True]
+    assert failed == 0
+
+def test_centavos_fast_path_matches_the_digits():
+    # Up to 2 decimals the values go through float64: every centavo must come back exact
+    rng = np.random.default_rng(0)
+    centavos = np.concatenate([rng.integers(-10 ** 12, 10 ** 12, 20_000), np.arange(-1000, 1000)])
+    text = pd.Series([f"{'-' if c < 0 else ''}{abs(c) // 100},{abs(c) % 100:02d}" for c in centavos], dtype=str)
+
+    parsed, failed = parse_br_decimal(text, as_centavos=True)
+
+    assert parsed.tolist() == centavos.tolist()
+    assert failed == 0
+
+def test_malformed_centavos_fall_back_to_zero():
+    parsed, failed = parse_br_decimal(pd.Series(['1,2,3', 'R$ 10'], dtype=str), as_centavos=True)
+    assert parsed.tolist() == [0, 0]
+    assert failed == 2
+
+def test_without_thousands_separator():
+    # Values already written by pandas use a dot as decimal separator
+    parsed, failed = parse_br_decimal(pd.Series(['500.0', '100,00'], dtype=str), thousands=None)
+    assert parsed.tolist() == [500.0, 100.0]
+    assert failed == 0
+
+def test_numeric_and_mixed_input_pass_through():
+    parsed, _ = parse_br_decimal(pd.Series([1.5, 2.0]))
+    assert parsed.tolist() == [1.5, 2.0]
+
+    parsed, failed = parse_br_decimal(pd.Series(['1.000,5', 3.0, None], dtype=object))
+    assert parsed.tolist()[:2] == [1000.5, 3.0]
+    assert failed == 0
@@ -0,0 +1,112 @@
+import pytest
+import pandas as pd
+import os
+import sys
+import zipfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.generator import generate
+from src.services.cadastre import CadastreDimension
+from src.services.data_aggregator import DataAggregator
+from src.services.data_consolidator import DataConsolidator
+from src.services.data_enricher import DataEnricher
+from src.services.data_validator import DataValidator
+from src.services.ingestion import IngestionService
+from src.services.partitioned_pipeline import PartitionedPipeline, SpilledFrames
+
+OUTPUTS = ['data_quarantine.csv', 'despesas_agregadas.csv', 'despesas_por_uf.csv', 'despesas_por_modalidade.csv',
+           'despesas_por_trimestre.csv']
+
+@pytest.fixture
+def quarters(tmp_path):
+    files = generate(str(tmp_path / "data"), seed=3, operators=80, accounts=30, quarters=3, rows_per_quarter=1500)
+    frames = IngestionService(cache=None).ingest_each(files['zips'])
+    # Noise that changes dtypes in one slice only: a malformed date (Ano becomes float)
+    # and a padded key (REG_ANS is rewritten as stripped values). The typed columns go back
+    # to text first, so the slices go through the text parsers of compact_facts.
+    frames[1]['DATA'] = frames[1]['DATA'].astype(str)
+    frames[1].loc[frames[1].index[3], 'DATA'] = 'not a date'
+    frames[2]['REG_ANS'] = frames[2]['REG_ANS'].astype(str)
+    frames[2].loc[frames[2].index[5], 'REG_ANS'] = f" {frames[2]['REG_ANS'].iloc[5]} "
+    dimension = CadastreDimension(str(tmp_path / "cadastre")).load(files['cadastre'])
+    return [(f"q{i}", df) for i, df in enumerate(frames)], dimension
+
+def _in_memory(quarters, dimension, output_dir):
+    """The default chain of main.py."""
+    full_df = pd.concat([df.copy() for _, df in quarters], ignore_index=True)
+    consolidator = DataConsolidator(output_dir)
+    consolidated = consolidator.consolidate_frame(full_df)
+    consolidator.export(consolidated)
+    enricher = DataEnricher(output_dir, dimension=CadastreDimension(os.path.join(output_dir, "cadastre_cache")))
+    enriched = enricher.enrich_frame(consolidated, dimension)
+    validator = DataValidator(output_dir=output_dir)
+    clean, quarantine = validator.validate_frame(enriched)
+    validator.save_quarantine(quarantine)
+    aggregator = DataAggregator(output_dir)
+    aggregator.export(aggregator.aggregate_frame(clean))
+
+def _read(output_dir, name):
+    if name.endswith('.zip'):
+        with zipfile.ZipFile(os.path.join(output_dir, name)) as z:
+            return z.read('consolidado_despesas.csv').decode('utf-8')
+    with open(os.path.join(output_dir, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+def test_outputs_match_the_in_memory_run(tmp_path, quarters):
+    partitions, dimension = quarters
+    memory_dir, partitioned_dir = tmp_path / "memory", tmp_path / "partitioned"
+    memory_dir.mkdir()
+    partitioned_dir.mkdir()
+
+    _in_memory(partitions, dimension, str(memory_dir))
+
+    # No budget left: every quarter (~380 filtered rows) is cut into slices of 100 rows
+    pipeline = PartitionedPipeline(memory_budget=1, output_dir=str(partitioned_dir),
+                                   spill_dir=str(tmp_path / "spill"), min_rows=100)
+    summary = pipeline.run(((key, df.copy()) for key, df in partitions), dimension)
+
+    assert pipeline.last_stats['slices'] >= 3 * 4
+    assert not summary.empty
+    for name in ['consolidado_despesas.zip'] + OUTPUTS:
+        assert _read(str(partitioned_dir), name) == _read(str(memory_dir), name), name
+    # The spill is removed at the end of the run
+    assert os.listdir(tmp_path / "spill") == []
+
+def test_duplicates_across_slices_are_dropped_once(tmp_path, quarters):
+    partitions, dimension = quarters
+    key, df = partitions[0]
+
+    def run(frame, output_dir):
+        output_dir.mkdir()
+        pipeline = PartitionedPipeline(memory_budget=1, output_dir=str(output_dir),
+                                       spill_dir=str(tmp_path / "spill"), min_rows=len(df))
+        pipeline.run([(key, frame)], dimension)
+        return _read(str(output_dir), 'consolidado_despesas.zip')
+
+    # The second slice is a copy of the first one: none of its rows survive
+    once = run(df.copy(), tmp_path / "once")
+    assert run(pd.concat([df, df], ignore_index=True), tmp_path / "twice") == once
+
+def test_spilled_frames_promote_dtypes_like_concat(tmp_path):
+    spill = SpilledFrames(str(tmp_path), "part")
+    spill.append(pd.DataFrame({'Ano': pd.Series([2024], dtype='int32')}))
+    spill.append(pd.DataFrame({'Ano': [float('nan')]}))
+    spill.append(pd.DataFrame({'Ano': pd.Series([], dtype='int32')}))
+
+    frames = list(spill.frames())
+    assert len(frames) == 2  # empty frames are not written
+    assert all(frame['Ano'].dtype == 'float64' for frame in frames)
+
+def test_empty_spill_yields_a_typed_empty_frame(tmp_path):
+    spill = SpilledFrames(str(tmp_path), "part")
+    spill.append(pd.DataFrame({'a': pd.Series([], dtype='int64')}))
+    [frame] = list(spill.frames())
+    assert frame.empty and list(frame.columns) == ['a']
+
+def test_budget_check_flags_a_quarter_larger_than_the_budget(tmp_path):
+    pipeline = PartitionedPipeline(memory_budget=64 * 1024 ** 3, output_dir=str(tmp_path), spill_dir=str(tmp_path / "spill"))
+    assert pipeline.check_budget({'2025Q1': 10 * 1024 ** 2, '2025Q2': None})
+
+    pipeline.memory_budget = 1
+    assert not pipeline.check_budget({'2025Q1': 10 * 1024 ** 2})
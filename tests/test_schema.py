@@ -0,0 +1,54 @@
+import pandas as pd
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.schema import compact_facts, concat_facts, expand, quarter_parts, to_dates, to_reg_ans
+
+def _raw():
+    return pd.DataFrame({
+        'DATA': ['2024-01-01', '2024-01-01', 'not a date', '2024-04-01'],
+        'REG_ANS': [' 123456', '123456', 'ABC', '654321'],
+        'CD_CONTA_CONTABIL': ['411', '411', '412', '411'],
+        'VL_SALDO_FINAL': ['1.234,56', '0,10', 'x', '-7,00'],
+    }, dtype=str)
+
+def test_compact_facts_types():
+    df = compact_facts(_raw(), thousands='.')
+
+    assert df['REG_ANS'].dtype == 'Int32'
+    assert df['REG_ANS'].tolist()[:2] == [123456, 123456] and df['REG_ANS'].isna().tolist()[2]
+    assert isinstance(df['CD_CONTA_CONTABIL'].dtype, pd.CategoricalDtype)
+    assert df['VL_SALDO_FINAL'].tolist() == [123456, 10, 0, -700]
+    assert df['DATA'].cat.categories.tolist() == [pd.Timestamp('2024-01-01'), pd.Timestamp('2024-04-01')]
+    assert df['DATA'].isna().tolist() == [False, False, True, False]
+
+def test_compact_facts_is_idempotent():
+    once = compact_facts(_raw(), thousands='.')
+    pd.testing.assert_frame_equal(compact_facts(once.copy()), once)
+
+def test_quarter_parts_are_small_integers():
+    year, quarter = quarter_parts(to_dates(pd.Series(['2024-04-01', None, '2023-10-01'], dtype=str)))
+    assert (year.dtype, quarter.dtype) == ('Int16', 'Int8')
+    assert year.tolist()[::2] == [2024, 2023] and quarter.tolist()[::2] == [2, 4]
+    assert year.isna().tolist() == [False, True, False]
+
+def test_expand_restores_the_export_text():
+    df = compact_facts(_raw(), thousands='.').rename(columns={'VL_SALDO_FINAL': 'ValorDespesas'})
+    text = expand(df).to_csv(index=False, sep=';')
+    assert text.splitlines()[1:3] == ['2024-01-01;123456;411;1234.56', '2024-01-01;123456;411;0.1']
+
+def test_concat_keeps_categories():
+    first = pd.DataFrame({'UF': pd.Series(['SP', 'RJ'], dtype='category')})
+    second = pd.DataFrame({'UF': pd.Series(['MG'], dtype='category')})
+
+    # Plain concat drops the encoding when the categories differ
+    assert not isinstance(pd.concat([first, second])['UF'].dtype, pd.CategoricalDtype)
+    combined = concat_facts([first, second])
+    assert isinstance(combined['UF'].dtype, pd.CategoricalDtype)
+    assert combined['UF'].tolist() == ['SP', 'RJ', 'MG']
+
+def test_reg_ans_from_integers_and_text():
+    assert to_reg_ans(pd.Series([1, 2], dtype='int64')).dtype == 'Int32'
+    assert to_reg_ans(pd.Series(['007', None], dtype=str)).tolist()[0] == 7
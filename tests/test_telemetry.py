@@ -0,0 +1,121 @@
+import pytest
+import pandas as pd
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils import telemetry
+from src.utils.telemetry import RunTelemetry, count_rows, instrumented
+
+class Stage:
+    @instrumented
+    def transform(self, df):
+        return df[df['v'] > 1]
+
+    @instrumented
+    def split(self, df):
+        return df.head(1), df.tail(2)
+
+    @instrumented
+    def outer(self, df):
+        return self.transform(df)
+
+    @instrumented
+    def fail(self, df):
+        raise ValueError("boom")
+
+def _frame():
+    return pd.DataFrame({'v': [1, 2, 3]})
+
+def test_hook_is_passthrough_without_a_run():
+    assert telemetry._active is None
+    assert len(Stage().transform(_frame())) == 2
+
+def test_records_rows_time_and_calls():
+    with RunTelemetry() as run:
+        Stage().transform(_frame())
+        Stage().transform(_frame())
+        Stage().split(_frame())
+
+    stage = run.stages['Stage.transform']
+    assert stage['calls'] == 2
+    assert (stage['rows_in'], stage['rows_out']) == (6, 4)
+    assert stage['wall_s'] >= 0 and stage['cpu_s'] >= 0
+    # Tuples of frames (clean + quarantine) count every frame
+    assert run.stages['Stage.split']['rows_out'] == 3
+    assert telemetry._active is None
+
+def test_failing_stage_is_still_recorded():
+    with RunTelemetry() as run:
+        with pytest.raises(ValueError):
+            Stage().fail(_frame())
+    assert run.stages['Stage.fail']['calls'] == 1
+    assert run.stages['Stage.fail']['rows_out'] == 0
+
+def test_count_rows():
+    assert count_rows(_frame()) == 3
+    assert count_rows([_frame(), None, "path.zip"]) == 3
+    assert count_rows(None) == 0
+
+def test_report_is_written_as_json(tmp_path):
+    with RunTelemetry() as run:
+        Stage().transform(_frame())
+    path = run.write_report(str(tmp_path / "run_report.json"))
+
+    with open(path, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    assert set(report) >= {'started_at', 'wall_s', 'cpu_s', 'peak_rss_bytes', 'io', 'stages'}
+    assert report['stages']['Stage.transform']['rows_out'] == 2
+    assert 'peak_rss_bytes' in report['stages']['Stage.transform']
+    assert report['stages']['Stage.transform']['frame_bytes_out'] > 0
+    assert 'profile' not in report
+
+def test_nested_stages_are_recorded_separately():
+    with RunTelemetry() as run:
+        Stage().outer(_frame())
+    assert run.stages['Stage.outer']['calls'] == 1
+    assert run.stages['Stage.transform']['calls'] == 1
+    assert run.stages['Stage.outer']['wall_s'] >= run.stages['Stage.transform']['wall_s']
+    assert not run._running
+
+def test_profile_keeps_the_slowest_outer_stage(tmp_path):
+    with RunTelemetry(profile=True) as run:
+        Stage().outer(_frame())
+        Stage().split(_frame())
+    # Nested stages are recorded but profiled through their outer stage
+    assert 'Stage.transform' in run.stages
+    assert set(run._profiles) == {'Stage.outer', 'Stage.split'}
+
+    report_path = run.write_report(str(tmp_path / "run_report.json"))
+    with open(report_path, 'r', encoding='utf-8') as f:
+        profile = json.load(f)['profile']
+    assert profile['stage'] == run.slowest_profiled_stage()
+    assert os.path.exists(profile['file'])
+    assert profile['top']
+
+def test_failed_run_still_writes_the_report(tmp_path):
+    from unittest.mock import patch
+    from src import main
+
+    report_path = str(tmp_path / "run_report.json")
+    with patch('src.main.config.RUN_REPORT_FILE', report_path), \
+            patch('src.main.run_pipeline', side_effect=RuntimeError("boom")):
+        with pytest.raises(RuntimeError):
+            main.main([])
+    assert os.path.exists(report_path)
+
+def _active_in_child():
+    return telemetry._active is None, len(Stage().transform(_frame()))
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs fork")
+def test_forked_workers_do_not_inherit_the_run():
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    with RunTelemetry() as run:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('fork')) as pool:
+            assert pool.submit(_active_in_child).result() == (True, 2)
+        assert telemetry._active is run
+    assert 'Stage.transform' not in run.stages
@@ -26,3 +26,27 @@ def test_cnpj_stripped_zeros():
     cnpj_stripped = "6990590000123"
     
     assert validate_cnpj(cnpj_stripped) is True
+
+
+def test_cnpj_series_matches_scalar_validator():
+    import random
+    import pandas as pd
+    from src.utils.validators import validate_cnpj_series
+
+    rng = random.Random(42)
+    values = [
+        "06.990.590/0001-23", "06990590000123", "6990590000123", "06.990.590/0001-24",
+        "00000000000000", "11111111111111", "123", "", None, "0001685053000156",
+        "1685053000156", "abc", "06990590000123 ", 6990590000123, "٠٦٩٩٠٥٩٠٠٠٠١٢٣",
+    ]
+    # Random digit strings around the valid lengths
+    for _ in range(200):
+        body = ''.join(rng.choice('0123456789') for _ in range(rng.randint(9, 15)))
+        values.append(body)
+    values += values[:20]  # repeated values share one check
+
+    series = pd.Series(values, dtype=object)
+    expected = [validate_cnpj(v) for v in values]
+
+    assert validate_cnpj_series(series).tolist() == expected
+    assert any(expected)
@@ -43,7 +43,7 @@ def test_process_zip_success(mock_zip_path):
     # Check value accuracy
     # If the column was renamed to ValorDespesas, check that
     col_name = 'ValorDespesas' if 'ValorDespesas' in df.columns else 'VL_SALDO_FINAL'
-    assert df.iloc[0][col_name] == 100.50
+    assert df.iloc[0][col_name] == 10050  # integer centavos
 
 def test_process_invalid_zip(tmp_path):
     """Test how the code handles a non-zip file."""
@@ -55,4 +55,33 @@ def test_process_invalid_zip(tmp_path):
     
     # Expectation: It should return None (graceful failure)
     result = processor.process_zip(str(bad_file))
-    assert result is None
\ No newline at end of file
+    assert result is None
+
+
+def test_streaming_matches_eager_reader(tmp_path):
+    """Chunked reading with filter pushdown must return the same rows as the eager reader."""
+    rows = ["DATA;REG_ANS;CD_CONTA_CONTABIL;DESCRICAO;VL_SALDO_INICIAL;VL_SALDO_FINAL;EXTRA"]
+    for i in range(25):
+        description = "  Despesas com Eventos / Sinistros " if i % 3 == 0 else "Outra Despesa"
+        rows.append(f"2025-01-01;{100000 + i};41111111{i % 10};{description};1.000,{i:02d};2.{i:03d},50;x")
+
+    zip_file = tmp_path / "big.zip"
+    with zipfile.ZipFile(zip_file, 'w') as zf:
+        zf.writestr("big.csv", "\n".join(rows).encode('utf-8'))
+
+    eager = ZipProcessor(streaming=False).process_zip(str(zip_file))
+    streamed = ZipProcessor(streaming=True, chunksize=4).process_zip(str(zip_file))
+
+    # Only the configured columns are read in streaming mode
+    assert 'EXTRA' not in streamed.columns
+    pd.testing.assert_frame_equal(streamed, eager.drop(columns=['EXTRA']))
+    assert len(streamed) == 9
+    assert streamed.iloc[0]['DESCRICAO'] == "Despesas com Eventos / Sinistros"
+
+def test_streaming_without_matches(tmp_path):
+    zip_file = tmp_path / "empty.zip"
+    with zipfile.ZipFile(zip_file, 'w') as zf:
+        zf.writestr("data.csv", "DATA;REG_ANS;DESCRICAO;VL_SALDO_FINAL\n2025-01-01;1;Outra;1,00".encode('utf-8'))
+
+    df = ZipProcessor(streaming=True).process_zip(str(zip_file))
+    assert df is not None and df.empty